@@ -1,6 +1,6 @@
 from fastapi import APIRouter
 
-from app.api.endpoints import auth, events, spiritual_events, team, darshan
+from app.api.endpoints import auth, events, spiritual_events, team, darshan, profiling
 
 api_router = APIRouter()
 
@@ -9,3 +9,4 @@ api_router.include_router(events.router, prefix="/events", tags=["Events"])
 api_router.include_router(spiritual_events.router, prefix="/spiritual-events", tags=["Spiritual Events"])
 api_router.include_router(team.router, prefix="/team", tags=["Team"])
 api_router.include_router(darshan.router, prefix="/darshan", tags=["Darshan Requests"])
+api_router.include_router(profiling.router, prefix="/profiling", tags=["Profiling"])
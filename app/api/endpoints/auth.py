@@ -7,6 +7,16 @@ from app.core.models.User import User
 from app.core.schemas.User import UserCreate, UserResponse, TokenPayload, Token, UserLogin
 from app.config import settings
 from app.utils.authorization import signJWT
+from app.utils.passwords import passwordHasher, PasswordHasherBusy
+from app.utils.leads import leadDirectory
+
+
+def loginBusy() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        detail="Too many login attempts in progress, please retry",
+        headers={"Retry-After": str(settings.PASSWORD_HASH_RETRY_AFTER)}
+    )
 
 router = APIRouter()
 
@@ -23,6 +33,11 @@ async def register(user_in: UserCreate, request: Request) -> UserResponse:
             detail="Username already registered"
         )
 
+    try:
+        hashedPassword = await passwordHasher.hash(user_in.password)
+    except PasswordHasherBusy:
+        raise loginBusy()
+
     # Create new user
     user = User(
         id=str(uuid4()),
@@ -30,11 +45,12 @@ async def register(user_in: UserCreate, request: Request) -> UserResponse:
         userName=user_in.userName,
         role=user_in.role,
         phoneNumber=user_in.phoneNumber,
-        password=user_in.password,
+        password=hashedPassword,
         createdAt=datetime.utcnow(),
         updatedAt=datetime.utcnow()
     )
     await user.insert()
+    leadDirectory.apply(user)
     return user
 
 @router.get("/users", response_model=List[UserResponse])
@@ -47,12 +63,7 @@ async def getUsers():
 
 @router.get("/leads", response_model=list[dict])
 async def getLeads():
-    leads = await User.find(User.role == "lead").to_list()
-    leadIds = []
-    for lead in leads:
-        lead = lead.dict()
-        leadIds.append({'id':lead['userName'],'name':lead['name']})
-    return leadIds
+    return leadDirectory.list()
 
 @router.post("/login", response_model=Token)
 async def login(user_in: UserLogin) -> Token:
@@ -60,11 +71,23 @@ async def login(user_in: UserLogin) -> Token:
     OAuth2 compatible token login, get an access token for future requests.
     """
     user = await User.find_one(User.userName == user_in.userName)
-    if not user or user.password != user_in.password:
+    if not user:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Incorrect username or password",
+        )
+    try:
+        valid, newHash = await passwordHasher.verify(user_in.password, user.password)
+    except PasswordHasherBusy:
+        raise loginBusy()
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect username or password",
         )
+    if newHash:
+        # Plaintext or outdated cost factor: migrate the stored hash
+        await user.set({"password": newHash, "updatedAt": datetime.utcnow()})
     token = signJWT(userId=user.userName, userRole=user.role)
 
     return token
\ No newline at end of file
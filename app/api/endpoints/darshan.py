@@ -1,18 +1,37 @@
-from datetime import datetime
+from datetime import date, datetime, timedelta
 from typing import Optional
-from fastapi import APIRouter, HTTPException, status, Request, Query
+from fastapi import APIRouter, HTTPException, status, Request, Query, Header
+from fastapi.responses import JSONResponse, StreamingResponse
 from starlette.authentication import requires
 
 from app.core.models.Darshan import Darshan
+from app.core.models.DarshanArchive import DarshanArchive
 from app.core.models.User import User
+from app.utils.leads import leadDirectory
+from app.utils.workflow import transitionDarshan, bulkTransitionDarshan, LEAD_DECISIONS, PA_DECISIONS
+from app.utils.duplicates import submitOnce, recentSubmissions
+from app.utils.ingest import darshanIngest
+from app.utils.export import exportDarshans, exportQuery, EXPORT_FORMATS
+from app.utils.notifications import darshanEvents, streamDarshanEvents, CREATED
+from app.utils.authorization import verifyJWT
+from app.utils.constants import AuthConstants
+from app.utils.stats import getStats, recordCreate, recordDelete
+from app.utils.scheduling import getAvailability, reserveSlot, releaseSlot, reserveSlots, releaseSlots
+from app.utils.database import findPublic, countPublic
 from app.core.schemas.Darshan import (
     DarshanCreate,
     DarshanUpdate,
     DarshanResponse,
     DarshanListResponse,
     DarshanStatus,
-    DarshanLeadApprovalUpdate
+    DarshanLeadApprovalUpdate,
+    DarshanBulkLeadAction,
+    DarshanBulkPaAction,
+    DarshanBulkResponse,
+    DarshanAvailabilityResponse,
+    DarshanStatsResponse
 )
+from app.config import settings
 
 router = APIRouter()
 
@@ -22,21 +41,42 @@ async def create_darshan_request(
     darshan_request: DarshanCreate
 ) -> DarshanResponse:
     """
-    Create a new darshan request.
+    Create a new darshan request. A re-submission for a phone number with an
+    open request returns only that request's id and status (this route is
+    public, so the stored details are never echoed back).
     """
     # Verify if the lead exists and is actually a lead
-    lead = await User.find_one(User.userName == darshan_request.leadId, User.role == "lead")
-    if not lead:
+    if not leadDirectory.contains(darshan_request.leadId):
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
             detail="Selected lead not found"
         )
 
-    darshan = Darshan(
-        **darshan_request.dict(),
-        status=DarshanStatus.PENDING_LEAD
-    )
-    await darshan.insert()
+    async def insertDarshan() -> Darshan:
+        darshan = Darshan(
+            **darshan_request.dict(),
+            status=DarshanStatus.PENDING_LEAD
+        )
+        if settings.DARSHAN_INGEST_MODE == "batched":
+            # Returns once the insert_many batch holding this request has committed
+            return await darshanIngest.submit(darshan)
+        await darshan.insert()
+        await recordCreate(darshan)
+        darshanEvents.publish(CREATED, darshan)
+        return darshan
+
+    # Collapse re-submissions of the same phone number into the open request
+    darshan, created = await submitOnce(darshan_request.phoneNumber, insertDarshan)
+    if not created and settings.DARSHAN_DUPLICATE_MODE == "reject":
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail={
+                "message": "A darshan request for this phone number is already pending",
+                "existingRequestId": darshan.id
+            }
+        )
+    if not created:
+        return JSONResponse({"id": darshan.id, "status": darshan.status.value, "duplicate": True})
     return darshan
 
 
@@ -52,8 +92,8 @@ async def get_darshan_requests(
     query = {}
     query["status"] = "A3"
 
-    total = await Darshan.find(query).count()
-    requests = await Darshan.find(query).to_list()
+    total = await countPublic(Darshan, query)
+    requests = await findPublic(Darshan, query)
     
     return DarshanListResponse(total=total, items=requests)
 
@@ -61,13 +101,15 @@ async def get_darshan_requests(
 @requires("authenticated")
 async def get_darshan_requests(
     request: Request,
-    status: Optional[DarshanStatus] = None
+    status: Optional[DarshanStatus] = None,
+    archived: bool = False
 ) -> DarshanListResponse:
     """
     Get darshan requests based on user role:
     - Leads: see requests assigned to them
     - PAs: see requests approved by leads
     - Admins: see all requests
+    Closed requests moved to the archive are listed with archived=true.
     """
     query = {}
     
@@ -79,11 +121,124 @@ async def get_darshan_requests(
     if status:
         query["status"] = status
 
-    total = await Darshan.find(query).count()
-    requests = await Darshan.find(query).to_list()
+    model = DarshanArchive if archived else Darshan
+    total = await model.find(query).count()
+    requests = await model.find(query).to_list()
     
     return DarshanListResponse(total=total, items=requests)
 
+@router.get("/availability", response_model=DarshanAvailabilityResponse)
+@requires("authenticated")
+async def get_availability(
+    request: Request,
+    location: str,
+    start: datetime,
+    end: datetime
+) -> DarshanAvailabilityResponse:
+    """
+    Free capacity per slot for a location between start and end.
+    """
+    if end <= start:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="end must be after start"
+        )
+    if end - start > timedelta(days=settings.DARSHAN_AVAILABILITY_MAX_DAYS):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Availability can be requested for at most {settings.DARSHAN_AVAILABILITY_MAX_DAYS} days"
+        )
+
+    slots = await getAvailability(location, start, end)
+    return DarshanAvailabilityResponse(location=location, slots=slots)
+
+@router.get("/stats", response_model=DarshanStatsResponse)
+@requires("authenticated")
+async def get_darshan_stats(
+    request: Request,
+    start: Optional[date] = None,
+    end: Optional[date] = None
+) -> DarshanStatsResponse:
+    """
+    Dashboard counts by status, by lead and status, per day (created, approved,
+    rejected) and people per location, served from pre-aggregated counters.
+    """
+    if request.user.role != "admin":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can view darshan statistics"
+        )
+
+    stats = await getStats(
+        start.isoformat() if start else None,
+        end.isoformat() if end else None
+    )
+    return DarshanStatsResponse(**stats)
+
+@router.get("/stream")
+async def stream_darshan_requests(
+    request: Request,
+    token: Optional[str] = None,
+    last_event_id: Optional[str] = Header(None)
+) -> StreamingResponse:
+    """
+    Server-Sent Events feed of darshan queue changes for the caller's role:
+    leads get their own requests, PAs requests entering or leaving A2, admins
+    everything. Browsers' EventSource cannot send headers, so the access token
+    may also be passed as ?token=. Reconnects resume from Last-Event-ID; a
+    `reset` event means the client must reload its queue.
+    """
+    user = request.user
+    if user.is_authenticated:
+        role, userId = user.role, user.userId
+    else:
+        payload = verifyJWT(token or "")
+        if payload is None:
+            raise HTTPException(
+                status_code=status.HTTP_403_FORBIDDEN,
+                detail="Not authenticated"
+            )
+        role = payload.get(AuthConstants.USER_ROLE, "")
+        userId = payload.get(AuthConstants.USER_ID, "")
+    if role not in ("lead", "pa", "admin"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only leads, PAs and admins can subscribe to darshan updates"
+        )
+
+    return StreamingResponse(
+        streamDarshanEvents(role, userId, last_event_id or request.query_params.get("lastEventId")),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@router.get("/export")
+@requires("authenticated")
+async def export_darshan_requests(
+    request: Request,
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    status_filter: Optional[DarshanStatus] = Query(DarshanStatus.APPROVED, alias="status"),
+    date: Optional[date] = None,
+    location: Optional[str] = None
+) -> StreamingResponse:
+    """
+    Stream darshan requests as CSV or NDJSON, filtered by status (default A3),
+    scheduled date and location, e.g. the gate list for one day and location.
+    """
+    if request.user.role not in ("admin", "pa"):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins and PAs can export darshan requests"
+        )
+
+    query = exportQuery(status_filter.value if status_filter else None, date, location)
+    filename = f"darshan-{date.isoformat() if date else 'all'}.{format}"
+    return StreamingResponse(
+        exportDarshans(query, format),
+        media_type=EXPORT_FORMATS[format],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'}
+    )
+
 @router.get("/{request_id}", response_model=DarshanResponse)
 @requires("authenticated")
 async def get_darshan_request(
@@ -94,6 +249,9 @@ async def get_darshan_request(
     Get a specific darshan request.
     """
     darshan_request = await Darshan.find_one(Darshan.id == request_id)
+    if not darshan_request:
+        # Closed requests may have been archived
+        darshan_request = await DarshanArchive.find_one(DarshanArchive.id == request_id)
     if not darshan_request:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -109,46 +267,160 @@ async def get_darshan_request(
     
     return darshan_request
 
-@router.put("/{request_id}/lead-action", status_code=204)
+async def transitionError(request_id: str, leadId: Optional[str] = None) -> HTTPException:
+    """
+    Explain why a conditional transition matched nothing. Only runs on the
+    failure path, so successful actions stay a single round trip.
+    """
+    query = [Darshan.id == request_id]
+    if leadId is not None:
+        query.append(Darshan.leadId == leadId)
+    darshan_request = await Darshan.find_one(*query)
+    if not darshan_request:
+        return HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Darshan request not found"
+        )
+    return HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Cannot perform action on request with status {darshan_request.status}"
+    )
+
+def checkBulkSize(count: int) -> None:
+    if count > settings.DARSHAN_BULK_MAX_ITEMS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"At most {settings.DARSHAN_BULK_MAX_ITEMS} requests can be processed at once"
+        )
+
+def bulkResponse(results: list) -> DarshanBulkResponse:
+    succeeded = sum(1 for result in results if result["success"])
+    return DarshanBulkResponse(succeeded=succeeded, failed=len(results) - succeeded, results=results)
+
+@router.put("/bulk/lead-action", response_model=DarshanBulkResponse)
 @requires("authenticated")
-async def lead_action(
+async def bulk_lead_action(
     request: Request,
-    request_id: str,
-    action: DarshanLeadApprovalUpdate
-):
+    action: DarshanBulkLeadAction
+) -> DarshanBulkResponse:
     """
-    Lead can approve or reject the darshan request.
+    Lead can approve or reject many of their pending darshan requests at once.
+    Returns the outcome for every request ID.
     """
     if request.user.role != "lead":
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="Only leads can perform this action"
         )
+    checkBulkSize(len(action.requestIds))
 
-    darshan_request = await Darshan.find_one(Darshan.id == request_id, Darshan.leadId == request.user.userId)
-    if not darshan_request:
+    results = await bulkTransitionDarshan(
+        {request_id: {"reason": action.reason} for request_id in action.requestIds},
+        DarshanStatus.PENDING_LEAD,
+        LEAD_DECISIONS[action.status],
+        leadId=request.user.userId
+    )
+    return bulkResponse(results)
+
+@router.put("/bulk/pa-action", response_model=DarshanBulkResponse)
+@requires("authenticated")
+async def bulk_pa_action(
+    request: Request,
+    action: DarshanBulkPaAction
+) -> DarshanBulkResponse:
+    """
+    PA can approve or reject many darshan requests at once. Approvals use the
+    top-level schedule for `requestIds`, and each entry of `items` can carry
+    its own schedule. Returns the outcome for every request ID.
+    """
+    if request.user.role != "pa":
         raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Darshan request not found"
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only PAs can perform this action"
         )
+    checkBulkSize(len(action.requestIds) + len(action.items))
 
-    if darshan_request.status != DarshanStatus.PENDING_LEAD:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Cannot perform action on request with status {darshan_request.status}"
+    schedules = {
+        request_id: (action.scheduledDateTime, action.scheduledLocation)
+        for request_id in action.requestIds
+    }
+    for item in action.items:
+        schedules[item.requestId] = (
+            item.scheduledDateTime or action.scheduledDateTime,
+            item.scheduledLocation or action.scheduledLocation
         )
-    if action.status == True:
-        status = "A2"
-    else:
-        status = "A4"
 
-    update_data = {
-        "status": status,
-        "updatedAt": datetime.utcnow(),
-        "reason": action.reason
+    updates = {}
+    rejected = {}
+    for request_id, (scheduledDateTime, scheduledLocation) in schedules.items():
+        update_data = {"reason": action.reason}
+        if action.status == True:
+            if not scheduledDateTime:
+                rejected[request_id] = "Scheduled date and time is required for approval"
+                continue
+            if not scheduledLocation:
+                rejected[request_id] = "Scheduled location is required for approval"
+                continue
+            update_data["scheduledDateTime"] = scheduledDateTime
+            update_data["scheduledLocation"] = scheduledLocation
+        updates[request_id] = update_data
+
+    reservations = {}
+    if action.status == True and updates:
+        people = {
+            document["_id"]: document["numberOfPeople"]
+            async for document in Darshan.get_motor_collection().find(
+                {"_id": {"$in": list(updates)}, "status": DarshanStatus.PENDING_PA.value},
+                {"numberOfPeople": 1}
+            )
+        }
+        reservations = {
+            request_id: (updates[request_id]["scheduledLocation"], updates[request_id]["scheduledDateTime"], count)
+            for request_id, count in people.items()
+        }
+        for request_id, reserved in (await reserveSlots(reservations)).items():
+            if not reserved:
+                rejected[request_id] = "Not enough free capacity at this location and time"
+                del updates[request_id]
+                del reservations[request_id]
+
+    results = {
+        result["id"]: result
+        for result in await bulkTransitionDarshan(updates, DarshanStatus.PENDING_PA, PA_DECISIONS[action.status])
     }
+    await releaseSlots([
+        reservation for request_id, reservation in reservations.items()
+        if not results[request_id]["success"]
+    ])
+    for request_id, detail in rejected.items():
+        results[request_id] = {"id": request_id, "success": False, "detail": detail}
+    return bulkResponse([results[request_id] for request_id in schedules])
 
-    await darshan_request.set(update_data)
+@router.put("/{request_id}/lead-action", status_code=204)
+@requires("authenticated")
+async def lead_action(
+    request: Request,
+    request_id: str,
+    action: DarshanLeadApprovalUpdate
+):
+    """
+    Lead can approve or reject the darshan request.
+    """
+    if request.user.role != "lead":
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only leads can perform this action"
+        )
+
+    updated = await transitionDarshan(
+        request_id,
+        DarshanStatus.PENDING_LEAD,
+        LEAD_DECISIONS[action.status],
+        {"reason": action.reason},
+        leadId=request.user.userId
+    )
+    if updated is None:
+        raise await transitionError(request_id, request.user.userId)
 
 @router.put("/{request_id}/pa-action", status_code=204)
 @requires("authenticated")
@@ -166,30 +438,8 @@ async def pa_action(
             detail="Only PAs can perform this action"
         )
 
-    darshan_request = await Darshan.find_one(Darshan.id == request_id)
-    if not darshan_request:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail="Darshan request not found"
-        )
+    update_data = {"reason": action.reason}
 
-    if darshan_request.status != "A2":
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail=f"Cannot perform action on request with status {darshan_request.status}"
-        )
-    
-    if action.status == True:
-        status = "A3"
-    else:
-        status = "A4"
-
-    update_data = {
-        "status": status,
-        "updatedAt": datetime.utcnow(),
-        "reason": action.reason
-    }
-    
     if action.status == True:
         if not action.scheduledDateTime:
             raise HTTPException(
@@ -204,7 +454,30 @@ async def pa_action(
         update_data["scheduledDateTime"] = action.scheduledDateTime
         update_data["scheduledLocation"] = action.scheduledLocation
 
-    await darshan_request.set(update_data)
+    if action.status != True:
+        updated = await transitionDarshan(request_id, DarshanStatus.PENDING_PA, DarshanStatus.REJECTED, update_data)
+        if updated is None:
+            raise await transitionError(request_id)
+        return
+
+    # Approval: reserve the slot for the request's party first, so a full slot never
+    # touches the request; release it again if the conditional transition misses
+    document = await Darshan.get_motor_collection().find_one(
+        {"_id": request_id, "status": DarshanStatus.PENDING_PA.value},
+        {"numberOfPeople": 1}
+    )
+    if document is None:
+        raise await transitionError(request_id)
+    people = document["numberOfPeople"]
+    if not await reserveSlot(action.scheduledLocation, action.scheduledDateTime, people):
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Not enough free capacity at this location and time"
+        )
+    updated = await transitionDarshan(request_id, DarshanStatus.PENDING_PA, DarshanStatus.APPROVED, update_data)
+    if updated is None:
+        await releaseSlot(action.scheduledLocation, action.scheduledDateTime, people)
+        raise await transitionError(request_id)
 
 @router.delete("/{request_id}")
 @requires("authenticated")
@@ -229,4 +502,9 @@ async def delete_darshan_request(
         )
 
     await darshan_request.delete()
+    recentSubmissions.forget(darshan_request.phoneNumber, darshan_request.id)
+    await recordDelete(darshan_request)
+    darshanEvents.publishDeleted(darshan_request)
+    if darshan_request.status == DarshanStatus.APPROVED and darshan_request.scheduledDateTime and darshan_request.scheduledLocation:
+        await releaseSlot(darshan_request.scheduledLocation, darshan_request.scheduledDateTime, darshan_request.numberOfPeople)
     return {"message": "Darshan request deleted successfully"}
@@ -4,7 +4,9 @@ from uuid import uuid4
 from bson import ObjectId
 from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form, Request
 from starlette.authentication import requires
-from app.utils.s3 import upload_file, delete_file, get_presigned_url
+from app.utils.s3 import upload_file, delete_files_later, get_presigned_url
+from app.utils.documents import findOneAndSet, updateFailure, matchesUpdatedAt, conflictError
+from app.utils.database import findPublic, findOnePublic, countPublic
 
 from app.core.models.Event import Event
 from app.core.schemas.Event import (
@@ -67,10 +69,10 @@ async def getEvents(
 ) -> EventListResponse:
     query = {}
     if eventType:
-        query["eventType"] = eventType
+        query["eventType"] = eventType.value
 
-    total = await Event.find(query).count()
-    events = await Event.find(query).to_list()
+    total = await countPublic(Event, query)
+    events = await findPublic(Event, query)
     
     # Add presigned URLs for response
     response_events = []
@@ -84,7 +86,7 @@ async def getEvents(
 
 @router.get("/{event_id}", response_model=EventResponse)
 async def getEvent(event_id: str) -> EventResponse:
-    event = await Event.find_one(Event.id == event_id)
+    event = await findOnePublic(Event, {"_id": event_id})
     if not event:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -110,15 +112,9 @@ async def updateEvent(
     eventDate: Optional[datetime] = Form(None),
     mainImage: UploadFile = File(None),
     additionalImages: List[UploadFile] = File(None),
-    videos: List[str] = Form(None)
+    videos: List[str] = Form(None),
+    expectedUpdatedAt: Optional[datetime] = Form(None, description="updatedAt the edit is based on; a concurrent edit returns 409")
 ) -> EventResponse:
-    event = await Event.find_one(Event.id == event_id)
-    if not event:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Event with ID {event_id} not found"
-        )
-
     update_data = {}
     if eventTitle is not None:
         update_data["eventTitle"] = eventTitle
@@ -132,37 +128,61 @@ async def updateEvent(
         update_data["eventDate"] = eventDate
     if videos is not None:
         update_data['videos'] = videos
-    eventTitle = event.eventTitle
-    # Handle main image update
-    if mainImage:
-        # Delete old image
-        delete_file(event.mainImage)
-        
-        # Upload new image
-        mainImageKey = f"events/{event.eventType.value}/{eventTitle}"
-        mainImageKey = await upload_file(mainImage, mainImageKey)
-        update_data["mainImage"] = mainImageKey
-
-    # Handle additional images update
-    if additionalImages:
-        # Delete old images
-        for key in event.additionalImages:
-            delete_file(key)
-        
-        # Upload new images
-        additionalImageKeys = []
-        for image in additionalImages:
-            imageKey = f"events/{event.eventType.value}/{eventTitle}/images"
-            imageKey = await upload_file(image, imageKey)
-            additionalImageKeys.append(imageKey)
-        update_data["additionalImages"] = additionalImageKeys
 
-    update_data["updatedAt"] = datetime.utcnow()
-    await event.update({"$set": update_data})
-    
-    # Get updated event
-    updated_event = await Event.find_one(Event.id == event_id)
-    
+    # Image changes need the current keys and upload path; text-only edits skip this read
+    event = None
+    uploadedKeys = []
+    try:
+        if mainImage or additionalImages:
+            event = await Event.find_one(Event.id == event_id)
+            if not event:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Event with ID {event_id} not found"
+                )
+            if expectedUpdatedAt is None:
+                expectedUpdatedAt = event.updatedAt
+            elif not matchesUpdatedAt(event.updatedAt, expectedUpdatedAt):
+                # Stale edit: fail before uploading anything
+                raise conflictError()
+            eventTitle = event.eventTitle
+
+            # Handle main image update
+            if mainImage:
+                mainImageKey = f"events/{event.eventType.value}/{eventTitle}"
+                mainImageKey = await upload_file(mainImage, mainImageKey, unique=True)
+                uploadedKeys.append(mainImageKey)
+                update_data["mainImage"] = mainImageKey
+
+            # Handle additional images update
+            if additionalImages:
+                additionalImageKeys = []
+                for image in additionalImages:
+                    imageKey = f"events/{event.eventType.value}/{eventTitle}/images"
+                    imageKey = await upload_file(image, imageKey, unique=True)
+                    uploadedKeys.append(imageKey)
+                    additionalImageKeys.append(imageKey)
+                update_data["additionalImages"] = additionalImageKeys
+
+        update_data["updatedAt"] = datetime.utcnow()
+        updated_event = await findOneAndSet(Event, event_id, update_data, expectedUpdatedAt)
+        if not updated_event:
+            raise await updateFailure(Event, event_id, f"Event with ID {event_id} not found")
+    except Exception:
+        # Unless the write went through, nothing references the new uploads
+        await delete_files_later(uploadedKeys)
+        raise
+
+    # Delete replaced images only once the update has committed
+    if event is not None:
+        newKeys = {updated_event.mainImage, *updated_event.additionalImages}
+        replacedKeys = []
+        if mainImage and event.mainImage not in newKeys:
+            replacedKeys.append(event.mainImage)
+        if additionalImages:
+            replacedKeys.extend(key for key in event.additionalImages if key not in newKeys)
+        await delete_files_later(replacedKeys)
+
     # Add presigned URLs for response
     response_event = updated_event.dict()
     response_event["mainImage"] = get_presigned_url(updated_event.mainImage)
@@ -183,12 +203,8 @@ async def deleteEvent(
             detail=f"Event with ID {event_id} not found"
         )
 
-    # Delete main image
-    delete_file(event.mainImage)
-
-    # Delete additional images
-    for key in event.additionalImages:
-        delete_file(key)
-
     await event.delete()
+
+    # Delete the main and additional images in the background
+    await delete_files_later([event.mainImage, *event.additionalImages])
     return {"message": "Event deleted successfully"}
@@ -0,0 +1,25 @@
+from fastapi import APIRouter, HTTPException, status, Request
+from fastapi.responses import PlainTextResponse
+
+from app.config import settings
+from app.utils.constants import AuthConstants
+from app.utils.metrics import registry
+
+router = APIRouter()
+
+@router.get("/metrics", include_in_schema=False)
+async def getMetrics(request: Request) -> PlainTextResponse:
+    """
+    Prometheus scrape endpoint. Scrapers send METRICS_TOKEN as a bearer
+    token; without one configured, an admin JWT is required.
+    """
+    if settings.METRICS_TOKEN:
+        allowed = request.headers.get(AuthConstants.AUTHORIZATION) == f"Bearer {settings.METRICS_TOKEN}"
+    else:
+        allowed = request.user.is_authenticated and request.user.role == AuthConstants.ADMIN
+    if not allowed:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Metrics are only available to admins and the configured scraper"
+        )
+    return PlainTextResponse(registry.render(), media_type="text/plain; version=0.0.4")
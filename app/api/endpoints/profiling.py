@@ -0,0 +1,76 @@
+from fastapi import APIRouter, HTTPException, status, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
+from starlette.authentication import requires
+
+from app.config import settings
+from app.utils.constants import AuthConstants
+from app.utils.profiling import backgroundSampler, SPEEDSCOPE
+from app.utils.loop_monitor import loopMonitor
+from app.utils.slow_queries import slowQueryLog
+
+router = APIRouter()
+
+
+def requireAdmin(request: Request) -> None:
+    if request.user.role != AuthConstants.ADMIN:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only admins can read profiling data"
+        )
+
+def requireSampler(request: Request):
+    requireAdmin(request)
+    if not backgroundSampler.running:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="The background sampler is disabled, set PROFILING_BACKGROUND_SAMPLER=true"
+        )
+    return backgroundSampler.sampler
+
+@router.get("/hot-stacks")
+@requires("authenticated")
+async def getHotStacks(request: Request, format: str = "collapsed"):
+    """
+    Event-loop stacks aggregated by the background sampler since startup or
+    the last reset: `collapsed` for flamegraph tools, `speedscope` for
+    https://www.speedscope.app.
+    """
+    sampler = requireSampler(request)
+    if format == SPEEDSCOPE:
+        return JSONResponse(
+            sampler.speedscope("background sampler"),
+            headers={"Content-Disposition": 'attachment; filename="hot-stacks.speedscope.json"'}
+        )
+    return PlainTextResponse(sampler.collapsed())
+
+@router.delete("/hot-stacks")
+@requires("authenticated")
+async def resetHotStacks(request: Request) -> dict:
+    requireSampler(request)
+    backgroundSampler.reset()
+    return {"message": "Background sampler reset"}
+
+@router.get("/blocking")
+@requires("authenticated")
+async def getBlockingReports(request: Request) -> dict:
+    """Most recent event-loop stalls with the stack and route that caused them."""
+    requireAdmin(request)
+    return {"enabled": loopMonitor.running, "items": list(reversed(loopMonitor.reports))}
+
+@router.get("/slow-queries")
+@requires("authenticated")
+async def getSlowQueries(request: Request) -> dict:
+    """
+    MongoDB commands slower than SLOW_QUERY_THRESHOLD_MS grouped by shape,
+    slowest total first, with the explain summary of each shape's first
+    slow run (COLLSCAN, indexes, docs examined per doc returned).
+    """
+    requireAdmin(request)
+    return {"enabled": settings.SLOW_QUERY_ENABLED, "thresholdMs": settings.SLOW_QUERY_THRESHOLD_MS, "items": slowQueryLog.list()}
+
+@router.delete("/slow-queries")
+@requires("authenticated")
+async def resetSlowQueries(request: Request) -> dict:
+    requireAdmin(request)
+    slowQueryLog.reset()
+    return {"message": "Slow query log reset"}
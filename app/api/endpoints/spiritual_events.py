@@ -4,7 +4,9 @@ from uuid import uuid4
 from bson import ObjectId
 from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form, Request
 from starlette.authentication import requires
-from app.utils.s3 import upload_file, delete_file, get_presigned_url
+from app.utils.s3 import upload_file, delete_files_later, get_presigned_url
+from app.utils.documents import findOneAndSet, updateFailure, matchesUpdatedAt, conflictError
+from app.utils.database import findPublic, findOnePublic, countPublic
 
 from app.core.models.SpiritualEvent import SpiritualEvent
 from app.core.schemas.SpiritualEvent import (
@@ -64,8 +66,8 @@ async def getSpiritualEvents(
     skip: int = 0,
     limit: int = 10
 ) -> SpiritualEventListResponse:
-    total = await SpiritualEvent.find().count()
-    events = await SpiritualEvent.find().to_list()
+    total = await countPublic(SpiritualEvent)
+    events = await findPublic(SpiritualEvent)
     
     # Add presigned URLs for response
     response_events = []
@@ -79,7 +81,7 @@ async def getSpiritualEvents(
 
 @router.get("/{event_id}", response_model=SpiritualEventResponse)
 async def getSpiritualEvent(event_id: str) -> SpiritualEventResponse:
-    event = await SpiritualEvent.find_one(SpiritualEvent.id == event_id)
+    event = await findOnePublic(SpiritualEvent, {"_id": event_id})
     if not event:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -104,15 +106,9 @@ async def updateSpiritualEvent(
     eventDate: Optional[datetime] = Form(None),
     mainImage: Optional[UploadFile] = File(None),
     additionalImages: Optional[List[UploadFile]] = File(None),
-    videos: Optional[List[str]] = Form(None)
+    videos: Optional[List[str]] = Form(None),
+    expectedUpdatedAt: Optional[datetime] = Form(None, description="updatedAt the edit is based on; a concurrent edit returns 409")
 ) -> SpiritualEventResponse:
-    event = await SpiritualEvent.find_one(SpiritualEvent.id == event_id)
-    if not event:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Spiritual Event with ID {event_id} not found"
-        )
-
     update_data = {}
     if eventTitle is not None:
         update_data["eventTitle"] = eventTitle
@@ -125,35 +121,58 @@ async def updateSpiritualEvent(
     if videos is not None:
         update_data["videos"] = videos
 
-    # Handle main image update
-    if mainImage:
-        # Delete old image
-        await delete_file(event.mainImage)
-        
-        # Upload new image
-        mainImageKey = "spiritual_events"
-        mainImageKey = await upload_file(mainImage, mainImageKey)
-        update_data["mainImage"] = mainImageKey
-
-    # Handle additional images update
-    if additionalImages:
-        # Delete old images
-        for key in event.additionalImages:
-            await delete_file(key)
-        
-        # Upload new images
-        additionalImageKeys = []
-        for image in additionalImages:
-            imageKey = "spiritual_events/images"
-            imageKey = await upload_file(image, imageKey)
-            additionalImageKeys.append(imageKey)
-        update_data["additionalImages"] = additionalImageKeys
-
-    update_data["updatedAt"] = datetime.utcnow()
-    await event.update({"$set": update_data})
-    
-    # Get updated event
-    updated_event = await SpiritualEvent.find_one(SpiritualEvent.id == event_id)
+    # Image changes need the current keys; text-only edits skip this read
+    event = None
+    uploadedKeys = []
+    try:
+        if mainImage or additionalImages:
+            event = await SpiritualEvent.find_one(SpiritualEvent.id == event_id)
+            if not event:
+                raise HTTPException(
+                    status_code=status.HTTP_404_NOT_FOUND,
+                    detail=f"Spiritual Event with ID {event_id} not found"
+                )
+            if expectedUpdatedAt is None:
+                expectedUpdatedAt = event.updatedAt
+            elif not matchesUpdatedAt(event.updatedAt, expectedUpdatedAt):
+                # Stale edit: fail before uploading anything
+                raise conflictError()
+
+            # Handle main image update
+            if mainImage:
+                mainImageKey = "spiritual_events"
+                mainImageKey = await upload_file(mainImage, mainImageKey, unique=True)
+                uploadedKeys.append(mainImageKey)
+                update_data["mainImage"] = mainImageKey
+
+            # Handle additional images update
+            if additionalImages:
+                additionalImageKeys = []
+                for image in additionalImages:
+                    imageKey = "spiritual_events/images"
+                    imageKey = await upload_file(image, imageKey, unique=True)
+                    uploadedKeys.append(imageKey)
+                    additionalImageKeys.append(imageKey)
+                update_data["additionalImages"] = additionalImageKeys
+
+        update_data["updatedAt"] = datetime.utcnow()
+        updated_event = await findOneAndSet(SpiritualEvent, event_id, update_data, expectedUpdatedAt)
+        if not updated_event:
+            raise await updateFailure(SpiritualEvent, event_id, f"Spiritual Event with ID {event_id} not found")
+    except Exception:
+        # Unless the write went through, nothing references the new uploads
+        await delete_files_later(uploadedKeys)
+        raise
+
+    # Delete replaced images only once the update has committed
+    if event is not None:
+        newKeys = {updated_event.mainImage, *updated_event.additionalImages}
+        replacedKeys = []
+        if mainImage and event.mainImage not in newKeys:
+            replacedKeys.append(event.mainImage)
+        if additionalImages:
+            replacedKeys.extend(key for key in event.additionalImages if key not in newKeys)
+        await delete_files_later(replacedKeys)
     
     # Add presigned URLs for response
     response_event = updated_event.dict()
@@ -176,12 +195,8 @@ async def deleteSpiritualEvent(
             detail=f"Spiritual Event with ID {event_id} not found"
         )
 
-    # Delete main image
-    delete_file(event.mainImage)
-
-    # Delete additional images
-    for key in event.additionalImages:
-        delete_file(key)
-
     await event.delete()
+
+    # Delete the main and additional images in the background
+    await delete_files_later([event.mainImage, *event.additionalImages])
     return {"message": "Spiritual Event deleted successfully"}
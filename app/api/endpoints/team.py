@@ -4,7 +4,9 @@ from uuid import uuid4
 from bson import ObjectId
 from fastapi import APIRouter, HTTPException, status, UploadFile, File, Form, Request
 from starlette.authentication import requires
-from app.utils.s3 import upload_file, delete_file, get_presigned_url
+from app.utils.s3 import upload_file, delete_files_later, get_presigned_url
+from app.utils.documents import findOneAndSet, updateFailure, matchesUpdatedAt, conflictError
+from app.utils.database import findPublic, findOnePublic, countPublic
 from fastapi.openapi.models import Response
 
 from app.core.models.TeamMember import TeamMember
@@ -61,8 +63,8 @@ async def getTeamMembers() -> TeamMemberListResponse:
     """
     Get a list of team members with pagination support.
     """
-    total = await TeamMember.find().count()
-    team_members = await TeamMember.find().to_list()
+    total = await countPublic(TeamMember)
+    team_members = await findPublic(TeamMember)
     
     # Add presigned URLs for response
     response_members = []
@@ -78,7 +80,7 @@ async def getTeamMember(member_id: str) -> TeamMemberResponse:
     """
     Get a specific team member by their ID.
     """
-    team_member = await TeamMember.find_one(TeamMember.id == member_id)
+    team_member = await findOnePublic(TeamMember, {"_id": member_id})
     if not team_member:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -99,7 +101,8 @@ async def updateTeamMember(
     name: Optional[str] = Form(None, description="Updated name of the team member"),
     role: Optional[str] = Form(None, description="Updated role of the team member"),
     description: Optional[str] = Form(None, description="Updated description of the team member"),
-    image: UploadFile = File(None, description="Updated profile image file (JPG, PNG)")
+    image: UploadFile = File(None, description="Updated profile image file (JPG, PNG)"),
+    expectedUpdatedAt: Optional[datetime] = Form(None, description="updatedAt the edit is based on; a concurrent edit returns 409")
 ) -> TeamMemberResponse:
     """
     Update an existing team member. All fields are optional:
@@ -107,15 +110,9 @@ async def updateTeamMember(
     - role: Updated role/position
     - description: Updated description
     - image: New profile image file (supported formats: JPG, PNG)
+    - expectedUpdatedAt: updatedAt of the version being edited; returns 409 if it changed meanwhile
     """
     try:
-        team_member = await TeamMember.find_one(TeamMember.id == member_id)
-        if not team_member:
-            raise HTTPException(
-                status_code=status.HTTP_404_NOT_FOUND,
-                detail=f"Team member with ID {member_id} not found"
-            )
-
         update_data = {}
         if name is not None:
             update_data["name"] = name
@@ -124,27 +121,47 @@ async def updateTeamMember(
         if description is not None:
             update_data["description"] = description
 
-        # Handle image update
-        if image and image.filename:
-            # Delete old image if it exists
-            if team_member.image:
-                await delete_file(team_member.image)
-            
-            # Upload new image
-            imageKey = await upload_file(image, "team")
-            update_data["image"] = imageKey
+        # Handle image update; only then is the current document needed
+        team_member = None
+        imageKey = None
+        try:
+            if image and image.filename:
+                team_member = await TeamMember.find_one(TeamMember.id == member_id)
+                if not team_member:
+                    raise HTTPException(
+                        status_code=status.HTTP_404_NOT_FOUND,
+                        detail=f"Team member with ID {member_id} not found"
+                    )
+                if expectedUpdatedAt is None:
+                    expectedUpdatedAt = team_member.updatedAt
+                elif not matchesUpdatedAt(team_member.updatedAt, expectedUpdatedAt):
+                    # Stale edit: fail before uploading anything
+                    raise conflictError()
 
-        update_data["updatedAt"] = datetime.utcnow()
-        await team_member.update({"$set": update_data})
-        
-        # Get updated member
-        updated_member = await TeamMember.find_one(TeamMember.id == member_id)
+                # Upload new image under a fresh key, so the current one stays intact
+                imageKey = await upload_file(image, "team", unique=True)
+                update_data["image"] = imageKey
+
+            update_data["updatedAt"] = datetime.utcnow()
+            updated_member = await findOneAndSet(TeamMember, member_id, update_data, expectedUpdatedAt)
+            if not updated_member:
+                raise await updateFailure(TeamMember, member_id, f"Team member with ID {member_id} not found")
+        except Exception:
+            # Unless the write went through, nothing references the new upload
+            await delete_files_later([imageKey])
+            raise
+
+        # Delete old image once the update has committed
+        if team_member is not None and team_member.image != updated_member.image:
+            await delete_files_later([team_member.image])
         
         # Add presigned URL for response
         response_member = updated_member.dict()
         response_member["image"] = get_presigned_url(updated_member.image)
         
         return response_member
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -167,9 +184,8 @@ async def deleteTeamMember(
             detail=f"Team member with ID {member_id} not found"
         )
 
-    # Delete image if it exists
-    if team_member.image:
-        delete_file(team_member.image)
-
     await team_member.delete()
+
+    # Delete the image in the background
+    await delete_files_later([team_member.image])
     return {"message": "Team member deleted successfully"}
@@ -1,14 +1,29 @@
-from fastapi import FastAPI
-from fastapi.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-from beanie import init_beanie
-from mangum import Mangum
-from starlette.middleware.authentication import AuthenticationMiddleware
-
-from app.api.api import api_router
-from app.core.models.models import __all__
-from app.utils.authentication import ApiAuthBackend
-from app.config import settings
+from app.utils.startup import startupTimings
+
+with startupTimings.phase("settings"):
+    from app.config import settings
+
+with startupTimings.phase("import"):
+    from fastapi import FastAPI
+    from fastapi.middleware.cors import CORSMiddleware
+    from mangum import Mangum
+
+    from app.api.api import api_router
+    from app.core.models.models import __all__
+    from app.utils.authentication import ApiAuthMiddleware, ApiAuthBackend
+    from app.utils.rate_limit import RateLimitMiddleware
+    from app.utils.idempotency import IdempotencyMiddleware
+    from app.utils.passwords import passwordHasher
+    from app.utils.leads import leadDirectory
+    from app.utils.notifications import darshanEvents
+    from app.utils.archive import darshanArchiver
+    from app.utils.ingest import darshanIngest
+    from app.utils.database import mongo
+    from app.utils.jobs import jobRunner
+    from app.utils.metrics import MetricsMiddleware
+    from app.utils.profiling import ProfilingMiddleware, backgroundSampler
+    from app.utils.loop_monitor import LoopMonitorMiddleware, loopMonitor
+    from app.api.endpoints import metrics
 
 app = FastAPI(
     title=settings.API_TITLE,
@@ -17,6 +32,14 @@ app = FastAPI(
     openapi_url=f"{settings.VERSION}/{settings.OPEN_API_JSON_FILENAME}",
 )
 
+# Add Idempotency-Key support for the create endpoints (innermost, so only
+# requests that passed authentication and rate limiting claim a key)
+app.add_middleware(IdempotencyMiddleware)
+
+# Add rate limiting / admission control middleware (runs after authentication,
+# inside CORS so throttled responses still carry CORS headers)
+app.add_middleware(RateLimitMiddleware)
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -26,20 +49,61 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Add on-demand profiling for admins (inside authentication and metrics)
+if settings.PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+
+# Track which request each task serves, for event-loop blocking reports
+if settings.LOOP_MONITOR_ENABLED:
+    app.add_middleware(LoopMonitorMiddleware)
+
 # Add Authentication middleware
-app.add_middleware(AuthenticationMiddleware, backend=ApiAuthBackend())
+app.add_middleware(ApiAuthMiddleware, backend=ApiAuthBackend())
+
+# Add request metrics middleware (outermost, so the recorded latency covers every other middleware)
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
 
 @app.on_event("startup")
 async def startup_event():
-    # Initialize MongoDB connection
-    client = AsyncIOMotorClient(settings.MONGODB_URL)
-    
-    # Initialize Beanie with the MongoDB client
-    await init_beanie(
-        database=client[settings.DB_NAME],
-        document_models=__all__
-    )
+    # Initialize the MongoDB client and Beanie (reused across warm Lambda invocations)
+    await mongo.connect(__all__)
+
+    # Load the lead directory used by darshan submission and /auth/leads
+    await leadDirectory.start()
+
+    # Start the change-stream feed of darshan queue notifications, if configured
+    await darshanEvents.start()
+
+    # Move closed darshan requests to the archive in the background, if enabled
+    await darshanArchiver.start()
+
+    # Run background jobs (S3 deletes, ...) in this process, unless on Lambda
+    await jobRunner.startInApp()
+
+    # Sample event-loop stacks at a low rate, if enabled
+    backgroundSampler.start()
+
+    # Measure event-loop lag and report callbacks that block it
+    await loopMonitor.start()
+
+    startupTimings.report()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    await darshanIngest.close()
+    await leadDirectory.stop()
+    await darshanEvents.stop()
+    await darshanArchiver.stop()
+    await jobRunner.stop()
+    backgroundSampler.stop()
+    await loopMonitor.stop()
+    passwordHasher.shutdown()
+    mongo.close()
 
 # Include API router
 app.include_router(api_router, prefix="/v1")
+if settings.METRICS_ENABLED:
+    app.include_router(metrics.router, tags=["Metrics"])
+app.state.startupTimings = startupTimings
 # handler = Mangum(app)
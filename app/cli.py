@@ -0,0 +1,101 @@
+"""
+Maintenance commands, run against the database configured in Settings:
+
+    python -m app.cli rebuild-slots
+    python -m app.cli rebuild-stats [--verify-only]
+    python -m app.cli archive-darshans [--older-than-days N]
+    python -m app.cli sync-indexes
+    python -m app.cli jobs-worker [--job-types TYPE,TYPE]
+"""
+import argparse
+import asyncio
+import signal
+
+from app.core.models.models import __all__
+from app.utils.database import mongo
+from app.utils.scheduling import rebuildSlots
+from app.utils.stats import rebuildStats
+from app.utils.archive import archiveClosedDarshans
+from app.utils.jobs import jobRunner, jobTypes
+import app.utils.s3  # registers the S3 job handlers
+
+
+async def connect() -> None:
+    await mongo.connect(__all__)
+
+
+async def rebuildSlotsCommand(args) -> None:
+    count = await rebuildSlots()
+    print(f"Rebuilt {count} darshan slots")
+
+
+async def rebuildStatsCommand(args) -> None:
+    mismatches = await rebuildStats(verifyOnly=args.verify_only)
+    for mismatch in mismatches:
+        print(mismatch)
+    if args.verify_only:
+        print(f"Darshan stats verified: {len(mismatches)} mismatched counters")
+        if mismatches:
+            raise SystemExit(1)
+    else:
+        print(f"Darshan stats rebuilt, {len(mismatches)} counters corrected")
+
+
+async def archiveDarshansCommand(args) -> None:
+    archived = await archiveClosedDarshans(args.older_than_days)
+    print(f"Archived {archived} closed darshan requests")
+
+
+async def syncIndexesCommand(args) -> None:
+    await mongo.syncIndexes(__all__)
+    for model in __all__:
+        indexes = await model.get_motor_collection().index_information()
+        print(f"{model.get_collection_name()}: {', '.join(sorted(indexes))}")
+    print(f"Synced indexes for {len(__all__)} document models")
+
+
+async def jobsWorkerCommand(args) -> None:
+    names = args.job_types.split(",") if args.job_types else sorted(jobTypes)
+    unknown = [name for name in names if name not in jobTypes]
+    if unknown:
+        raise SystemExit(f"Unknown job types: {', '.join(unknown)}")
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signalNumber in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signalNumber, stopping.set)
+    await jobRunner.start(names)
+    print(f"Processing jobs: {', '.join(names)}")
+    await stopping.wait()
+    # Running jobs go back to the queue without spending an attempt
+    await jobRunner.stop()
+
+
+commands = {
+    "rebuild-slots": rebuildSlotsCommand,
+    "rebuild-stats": rebuildStatsCommand,
+    "archive-darshans": archiveDarshansCommand,
+    "sync-indexes": syncIndexesCommand,
+    "jobs-worker": jobsWorkerCommand,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog="python -m app.cli")
+    parser.add_argument("command", choices=sorted(commands))
+    parser.add_argument("--verify-only", action="store_true", help="rebuild-stats: only report mismatches")
+    parser.add_argument("--older-than-days", type=int, default=None, help="archive-darshans: override DARSHAN_ARCHIVE_AFTER_DAYS")
+    parser.add_argument("--job-types", default="", help="jobs-worker: comma-separated job types, default all")
+    args = parser.parse_args()
+
+    async def run():
+        await connect()
+        try:
+            await commands[args.command](args)
+        finally:
+            mongo.close(force=True)
+
+    asyncio.run(run())
+
+
+if __name__ == "__main__":
+    main()
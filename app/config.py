@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings
-from typing import Optional
+from typing import Dict, Optional
 
 class Settings(BaseSettings):
     # Application Settings
@@ -13,11 +13,123 @@ class Settings(BaseSettings):
     # MongoDB Settings
     MONGODB_URL: str = "mongodb://localhost:27017/shrimahatapasvi"
     DB_NAME: str
+    MONGODB_MAX_POOL_SIZE: int = 50
+    MONGODB_MIN_POOL_SIZE: int = 0
+    MONGODB_MAX_IDLE_TIME_MS: int = 60000  # drop pooled connections idle longer than this
+    MONGODB_SERVER_SELECTION_TIMEOUT_MS: int = 5000
+    MONGODB_CONNECT_TIMEOUT_MS: int = 5000
+    MONGODB_SOCKET_TIMEOUT_MS: int = 0  # 0 means no socket timeout
+    MONGODB_COMPRESSORS: str = ""  # e.g. "zstd,snappy,zlib"; empty disables compression
+    MONGODB_PUBLIC_READ_PREFERENCE: str = "secondaryPreferred"  # read preference for public GET routes
+    MONGODB_CLOSE_ON_SHUTDOWN: Optional[bool] = None  # default: close, except on Lambda where warm invocations reuse the client
+    MONGODB_SYNC_INDEXES: bool = True  # False skips index creation at boot; run `python -m app.cli sync-indexes` on deploy instead
+
+    # Metrics Settings
+    METRICS_ENABLED: bool = True
+    METRICS_MAX_SERIES: int = 500  # label sets per metric before folding into "other"
+    METRICS_TOKEN: str = ""  # bearer token for scrapers; empty means admin JWT only
+
+    # Profiling Settings
+    PROFILING_ENABLED: bool = True  # admins can profile a request with X-Profile: pstats|speedscope
+    PROFILING_SAMPLE_INTERVAL_MS: float = 1.0  # speedscope sampling interval for a profiled request
+    PROFILING_OUTPUT_DIR: str = ""  # also keep profile artifacts here, e.g. /tmp/profiles
+    PROFILING_MAX_STACKS: int = 5000  # distinct stacks kept by a sampler
+    PROFILING_BACKGROUND_SAMPLER: bool = False
+    PROFILING_BACKGROUND_INTERVAL_MS: int = 100
+
+    # Event Loop Monitor Settings
+    LOOP_MONITOR_ENABLED: bool = True
+    LOOP_MONITOR_INTERVAL_MS: int = 100  # how often scheduling delay is sampled
+    LOOP_MONITOR_BLOCK_THRESHOLD_MS: int = 100  # a stall longer than this captures the loop's stack
+    LOOP_MONITOR_STACK_DEPTH: int = 25
+    LOOP_MONITOR_MAX_REPORTS: int = 50  # recent blocking reports kept for /v1/profiling/blocking
+    LOOP_MONITOR_FAIL_ON_BLOCK: bool = False  # dev/tests: the request that blocked raises EventLoopBlocked
+
+    # Slow Query Log Settings
+    SLOW_QUERY_ENABLED: bool = True
+    SLOW_QUERY_THRESHOLD_MS: int = 100  # commands slower than this are logged by shape
+    SLOW_QUERY_EXPLAIN: bool = True  # explain (executionStats) the first slow occurrence of each shape
+    SLOW_QUERY_MAX_SHAPES: int = 200  # shapes kept for /v1/profiling/slow-queries, least recent evicted
+    SLOW_QUERY_EXAMINED_RATIO_WARN: int = 100  # docs examined per doc returned that logs at WARNING
+
+    # Request Coalescing Settings
+    SINGLE_FLIGHT_ENABLED: bool = True  # concurrent identical public reads share one MongoDB query
+    PRESIGNED_URL_REUSE_SECONDS: int = 300  # identical presign requests reuse a URL signed within this window, 0 disables
+    PRESIGNED_URL_CACHE_SIZE: int = 10000
+
+    # Rate Limiting / Admission Control Settings
+    RATE_LIMIT_ENABLED: bool = True
+    RATE_LIMIT_LOGIN_PER_MINUTE: int = 10
+    RATE_LIMIT_LOGIN_BURST: int = 5
+    RATE_LIMIT_DARSHAN_PER_MINUTE: int = 6
+    RATE_LIMIT_DARSHAN_BURST: int = 3
+    RATE_LIMIT_MAX_CLIENTS: int = 10000  # buckets kept per route group
+    RATE_LIMIT_TRUST_FORWARDED_FOR: bool = False  # enable behind a proxy / API Gateway
+    RATE_LIMIT_TRUSTED_PROXY_HOPS: int = 1  # proxies appending to X-Forwarded-For; the client is this many entries from the right
+    MAX_CONCURRENT_REQUESTS: int = 64
+    MAX_QUEUED_REQUESTS: int = 128
+    REQUEST_QUEUE_TIMEOUT_SECONDS: float = 5.0
+    REQUEST_RETRY_AFTER_SECONDS: int = 2
+
+    # Darshan Settings
+    DARSHAN_BULK_MAX_ITEMS: int = 200
+    DARSHAN_SLOT_MINUTES: int = 30
+    DARSHAN_DEFAULT_SLOT_CAPACITY: int = 50  # people per slot and location
+    DARSHAN_LOCATION_CAPACITIES: Dict[str, int] = {}  # per-location override, JSON in env
+    DARSHAN_DAY_START_HOUR: int = 6  # hours listed by the availability endpoint
+    DARSHAN_DAY_END_HOUR: int = 20
+    DARSHAN_AVAILABILITY_MAX_DAYS: int = 31
+    DARSHAN_DUPLICATE_WINDOW_MINUTES: int = 60  # 0 disables duplicate detection
+    DARSHAN_DUPLICATE_MODE: str = "collapse"  # "collapse" returns the existing request, "reject" answers 409
+    DARSHAN_DUPLICATE_CACHE_SIZE: int = 10000
+    DARSHAN_EXPORT_BATCH_SIZE: int = 500
+    DARSHAN_INGEST_MODE: str = "direct"  # "batched" buffers public submissions into insert_many batches
+    DARSHAN_INGEST_BATCH_SIZE: int = 100
+    DARSHAN_INGEST_MAX_DELAY_MS: int = 20
+    DARSHAN_ARCHIVE_ENABLED: bool = False  # run the archival job inside the app process
+    DARSHAN_ARCHIVE_AFTER_DAYS: int = 30  # closed requests older than this are archived
+    DARSHAN_ARCHIVE_BATCH_SIZE: int = 500
+    DARSHAN_ARCHIVE_INTERVAL_MINUTES: int = 60
+    DARSHAN_ARCHIVE_TTL_DAYS: int = 730  # archived requests are purged after this, 0 keeps them forever
+    DARSHAN_STREAM_SOURCE: str = "local"  # "changestream" for multi-worker setups (requires a replica set)
+    DARSHAN_STREAM_HEARTBEAT_SECONDS: float = 15.0
+    DARSHAN_STREAM_RETRY_MILLISECONDS: int = 3000
+    DARSHAN_STREAM_BUFFER_SIZE: int = 1000  # events kept for Last-Event-ID resume
+    DARSHAN_STREAM_QUEUE_SIZE: int = 100  # per client, slower clients are disconnected
+
+    # Idempotency Settings
+    IDEMPOTENCY_TTL_HOURS: int = 24  # how long stored responses can be replayed
+    IDEMPOTENCY_LOCK_SECONDS: int = 120  # an unfinished attempt can be taken over after this
+    IDEMPOTENCY_WAIT_SECONDS: float = 30.0  # how long a duplicate waits for the first attempt
+    IDEMPOTENCY_MAX_BODY_BYTES: int = 1024 * 1024  # larger responses are not stored
+    IDEMPOTENCY_MAX_REQUEST_BYTES: int = 50 * 1024 * 1024  # larger requests with an Idempotency-Key get a 413
+
+    # Background Job Settings
+    JOBS_RUN_IN_APP: Optional[bool] = None  # default: run workers in the app process, except on Lambda (use `python -m app.cli jobs-worker`)
+    JOBS_CONCURRENCY: int = 4  # workers per job type and process, unless the type sets its own
+    JOBS_MAX_ATTEMPTS: int = 5
+    JOBS_VISIBILITY_TIMEOUT_SECONDS: int = 300  # a run is cancelled after this
+    JOBS_LOCK_GRACE_SECONDS: int = 60  # a running job is reclaimed this long after its timeout, leaving time to record the outcome
+    JOBS_BACKOFF_BASE_SECONDS: float = 5.0  # retry n waits base * 2^(n-1), with jitter
+    JOBS_BACKOFF_MAX_SECONDS: float = 3600.0
+    JOBS_POLL_INTERVAL_SECONDS: float = 5.0  # idle workers poll this often for jobs enqueued by other processes
+    JOBS_RETENTION_DAYS: int = 7  # finished jobs are purged after this
+
+    # Lead Directory Settings
+    LEAD_DIRECTORY_CHANGE_STREAM: bool = False  # requires a replica set
+    LEAD_DIRECTORY_REFRESH_SECONDS: int = 300  # 0 disables the periodic reload
 
     # JWT Settings
     JWT_SECRET_KEY: str = "your-secret-key"
     JWT_ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    JWT_CACHE_SIZE: int = 4096  # verified tokens kept in memory
+
+    # Password Hashing Settings
+    PASSWORD_HASH_ROUNDS: int = 12  # bcrypt cost factor
+    PASSWORD_HASH_WORKERS: int = 2
+    PASSWORD_HASH_MAX_PENDING: int = 32  # logins beyond this get a 503
+    PASSWORD_HASH_RETRY_AFTER: int = 1  # seconds
 
     # Token URL
     TOKEN_URL: str = "/api/auth/login"
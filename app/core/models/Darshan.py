@@ -3,6 +3,7 @@ from uuid import uuid4
 from typing import Optional
 from beanie import Document, Indexed, Link
 from pydantic import Field
+import pymongo
 from app.core.schemas.Darshan import DarshanStatus
 from app.core.models.User import User
 
@@ -18,11 +19,16 @@ class Darshan(Document):
     scheduledLocation: Optional[str] = None
     reason: Optional[str] = None
     leadId: str  # Reference to the lead user
+    lastActionId: Optional[str] = None  # Tags the bulk action that last moved this request
     createdAt: datetime = Field(default_factory=datetime.utcnow)
     updatedAt: datetime = Field(default_factory=datetime.utcnow)
 
     class Settings:
         name = "darshan_requests"
+        indexes = [
+            # status lists and day/location exports sorted by schedule
+            [("status", pymongo.ASCENDING), ("scheduledDateTime", pymongo.ASCENDING)],
+        ]
 
     class Config:
         json_schema_extra = {
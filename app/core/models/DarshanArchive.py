@@ -0,0 +1,20 @@
+from datetime import datetime
+from typing import ClassVar, Optional, Tuple
+from pydantic import Field
+import pymongo
+
+from app.config import settings
+from app.core.models.Darshan import Darshan
+
+class DarshanArchive(Darshan):
+    archivedAt: datetime = Field(default_factory=datetime.utcnow)
+
+    # Purge archived requests once they are older than the retention period; applied by syncTtlIndexes
+    ttlIndex: ClassVar[Optional[Tuple[str, int]]] = ("archivedAt", settings.DARSHAN_ARCHIVE_TTL_DAYS * 24 * 60 * 60)
+
+    class Settings:
+        name = "darshan_requests_archive"
+        indexes = [
+            [("status", pymongo.ASCENDING), ("scheduledDateTime", pymongo.ASCENDING)],
+            [("phoneNumber", pymongo.ASCENDING)],
+        ]
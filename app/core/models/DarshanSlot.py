@@ -0,0 +1,20 @@
+from datetime import datetime
+from beanie import Document
+from pydantic import Field
+import pymongo
+
+class DarshanSlot(Document):
+    id: str = Field(alias="_id")  # "<location>|<slotStart ISO>"
+    location: str
+    slotStart: datetime
+    reserved: int = 0  # numberOfPeople already scheduled in this slot
+    updatedAt: datetime = Field(default_factory=datetime.utcnow)
+
+    def __repr__(self) -> str:
+        return f"<DarshanSlot {self.id}>"
+
+    class Settings:
+        name = "darshan_slots"
+        indexes = [
+            [("location", pymongo.ASCENDING), ("slotStart", pymongo.ASCENDING)],
+        ]
@@ -0,0 +1,20 @@
+from typing import Optional
+from beanie import Document
+from pydantic import Field
+
+class DarshanStat(Document):
+    id: str = Field(alias="_id")  # e.g. "status|A1", "lead|<leadId>|A2", "day|2024-01-31|created"
+    kind: str  # status, lead, day or location
+    status: Optional[str] = None
+    leadId: Optional[str] = None
+    day: Optional[str] = None
+    event: Optional[str] = None
+    location: Optional[str] = None
+    requests: int = 0  # darshan requests counted under this key
+    people: int = 0
+
+    def __repr__(self) -> str:
+        return f"<DarshanStat {self.id}>"
+
+    class Settings:
+        name = "darshan_stats"
@@ -0,0 +1,25 @@
+from datetime import datetime
+from typing import ClassVar, Optional, Tuple
+from beanie import Document
+from pydantic import Field
+
+from app.config import settings
+
+class IdempotencyKey(Document):
+    id: str = Field(alias="_id")  # "<method> <path>|<userId or anonymous:<fingerprint>>|<Idempotency-Key>"
+    status: str = "in_progress"  # in_progress or completed
+    fingerprint: Optional[str] = None  # SHA-256 of method, path and body
+    lockedUntil: datetime
+    statusCode: Optional[int] = None
+    contentType: Optional[str] = None
+    body: Optional[bytes] = None
+    createdAt: datetime = Field(default_factory=datetime.utcnow)
+
+    # Applied by syncTtlIndexes, so changing IDEMPOTENCY_TTL_HOURS doesn't conflict with the existing index
+    ttlIndex: ClassVar[Optional[Tuple[str, int]]] = ("createdAt", settings.IDEMPOTENCY_TTL_HOURS * 60 * 60)
+
+    def __repr__(self) -> str:
+        return f"<IdempotencyKey {self.id}>"
+
+    class Settings:
+        name = "idempotency_keys"
@@ -0,0 +1,33 @@
+from datetime import datetime
+from typing import ClassVar, Optional, Tuple
+from beanie import Document
+from pydantic import Field
+import pymongo
+
+from app.config import settings
+
+class Job(Document):
+    type: str
+    payload: dict = Field(default_factory=dict)
+    status: str = "queued"  # queued, running, succeeded or failed
+    attempts: int = 0  # claims so far, including the running one
+    maxAttempts: int
+    runAt: datetime = Field(default_factory=datetime.utcnow)  # not claimed before this (retry backoff)
+    lockedUntil: Optional[datetime] = None  # a running job past this is reclaimed
+    lockedBy: Optional[str] = None  # "<host>:<pid>:<nonce>" of the claiming worker
+    lastError: Optional[str] = None
+    createdAt: datetime = Field(default_factory=datetime.utcnow)
+    finishedAt: Optional[datetime] = None
+
+    # Applied by syncTtlIndexes, so changing JOBS_RETENTION_DAYS doesn't conflict with the existing index
+    ttlIndex: ClassVar[Optional[Tuple[str, int]]] = ("finishedAt", settings.JOBS_RETENTION_DAYS * 24 * 60 * 60)
+
+    def __repr__(self) -> str:
+        return f"<Job {self.type} {self.id}>"
+
+    class Settings:
+        name = "jobs"
+        indexes = [
+            [("type", pymongo.ASCENDING), ("status", pymongo.ASCENDING), ("runAt", pymongo.ASCENDING)],
+            [("type", pymongo.ASCENDING), ("status", pymongo.ASCENDING), ("lockedUntil", pymongo.ASCENDING)],
+        ]
@@ -3,5 +3,10 @@ from app.core.models.Event import Event
 from app.core.models.SpiritualEvent import SpiritualEvent
 from app.core.models.TeamMember import TeamMember
 from app.core.models.Darshan import Darshan
+from app.core.models.DarshanArchive import DarshanArchive
+from app.core.models.DarshanSlot import DarshanSlot
+from app.core.models.DarshanStat import DarshanStat
+from app.core.models.IdempotencyKey import IdempotencyKey
+from app.core.models.Job import Job
 
-__all__ = [User, Event, SpiritualEvent, TeamMember, Darshan]
\ No newline at end of file
+__all__ = [User, Event, SpiritualEvent, TeamMember, Darshan, DarshanArchive, DarshanSlot, DarshanStat, IdempotencyKey, Job]
\ No newline at end of file
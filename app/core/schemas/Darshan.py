@@ -1,6 +1,6 @@
 from datetime import datetime
 from enum import Enum
-from typing import Optional
+from typing import List, Optional
 from pydantic import BaseModel, Field, validator
 
 class DarshanStatus(str, Enum):
@@ -46,6 +46,52 @@ class DarshanUpdate(BaseModel):
     scheduledLocation: Optional[str] = None
     reason: str = None
 
+class DarshanBulkLeadAction(BaseModel):
+    requestIds: List[str] = Field(..., min_length=1, description="Darshan request IDs to act on")
+    status: bool
+    reason: str
+
+class DarshanBulkScheduleItem(BaseModel):
+    requestId: str
+    scheduledDateTime: Optional[datetime] = None
+    scheduledLocation: Optional[str] = None
+
+class DarshanBulkPaAction(BaseModel):
+    requestIds: List[str] = Field(default_factory=list, description="Requests sharing the default schedule below")
+    items: List[DarshanBulkScheduleItem] = Field(default_factory=list, description="Requests with their own schedule")
+    status: bool
+    scheduledDateTime: Optional[datetime] = None
+    scheduledLocation: Optional[str] = None
+    reason: str = None
+
+class DarshanBulkResult(BaseModel):
+    id: str
+    success: bool
+    status: Optional[DarshanStatus] = None
+    detail: Optional[str] = None
+
+class DarshanBulkResponse(BaseModel):
+    succeeded: int
+    failed: int
+    results: list[DarshanBulkResult]
+
+class DarshanAvailabilitySlot(BaseModel):
+    slotStart: datetime
+    slotEnd: datetime
+    capacity: int
+    reserved: int
+    free: int
+
+class DarshanAvailabilityResponse(BaseModel):
+    location: str
+    slots: list[DarshanAvailabilitySlot]
+
+class DarshanStatsResponse(BaseModel):
+    byStatus: dict[str, int]
+    byLead: dict[str, dict[str, int]]
+    byDay: dict[str, dict[str, int]]
+    byLocation: dict[str, dict[str, int]]
+
 class DarshanResponse(DarshanBase):
     id: str
     status: DarshanStatus
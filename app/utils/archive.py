@@ -0,0 +1,100 @@
+import asyncio
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo.errors import BulkWriteError
+
+from app.config import settings
+from app.core.models.Darshan import Darshan
+from app.core.models.DarshanArchive import DarshanArchive
+from app.core.models.DarshanSlot import DarshanSlot
+from app.core.schemas.Darshan import DarshanStatus
+
+logger = logging.getLogger(__name__)
+
+DUPLICATE_KEY = 11000
+
+
+def closedFilter(cutoff: datetime) -> dict:
+    """Requests that are finished: rejected before `cutoff`, or approved for a darshan before it."""
+    return {"$or": [
+        {"status": DarshanStatus.REJECTED.value, "updatedAt": {"$lt": cutoff}},
+        {"status": DarshanStatus.APPROVED.value, "scheduledDateTime": {"$lt": cutoff}},
+    ]}
+
+
+async def archiveBatch(cutoff: datetime, batchSize: int) -> int:
+    """
+    Copy one batch of closed requests into the archive, then delete them from
+    the hot collection. Safe to repeat or run from several workers: documents
+    that are already archived are skipped, and the delete only removes
+    documents that are still closed.
+    """
+    query = closedFilter(cutoff)
+    documents = await Darshan.get_motor_collection().find(query).limit(batchSize).to_list(batchSize)
+    if not documents:
+        return 0
+    archivedAt = datetime.utcnow()
+    for document in documents:
+        document["archivedAt"] = archivedAt
+    try:
+        await DarshanArchive.get_motor_collection().insert_many(documents, ordered=False)
+    except BulkWriteError as error:
+        if any(writeError["code"] != DUPLICATE_KEY for writeError in error.details.get("writeErrors", [])):
+            raise
+    await Darshan.get_motor_collection().delete_many({**query, "_id": {"$in": [document["_id"] for document in documents]}})
+    return len(documents)
+
+
+async def archiveClosedDarshans(olderThanDays: Optional[int] = None) -> int:
+    """
+    Move every closed request older than `olderThanDays` (default
+    DARSHAN_ARCHIVE_AFTER_DAYS) to the archive, in batches, and drop the slot
+    occupancy of past slots. Returns the number of requests archived.
+    """
+    days = settings.DARSHAN_ARCHIVE_AFTER_DAYS if olderThanDays is None else olderThanDays
+    cutoff = datetime.utcnow() - timedelta(days=days)
+    total = 0
+    while True:
+        archived = await archiveBatch(cutoff, settings.DARSHAN_ARCHIVE_BATCH_SIZE)
+        total += archived
+        if archived < settings.DARSHAN_ARCHIVE_BATCH_SIZE:
+            break
+    await DarshanSlot.get_motor_collection().delete_many({"slotStart": {"$lt": cutoff}})
+    return total
+
+
+class DarshanArchiver:
+    """Runs archiveClosedDarshans every DARSHAN_ARCHIVE_INTERVAL_MINUTES inside the app process."""
+
+    def __init__(self) -> None:
+        self.task: Optional[asyncio.Task] = None
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                archived = await archiveClosedDarshans()
+                if archived:
+                    logger.info("Archived %d closed darshan requests", archived)
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Darshan archival failed")
+            await asyncio.sleep(settings.DARSHAN_ARCHIVE_INTERVAL_MINUTES * 60)
+
+    async def start(self) -> None:
+        if settings.DARSHAN_ARCHIVE_ENABLED and self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+darshanArchiver = DarshanArchiver()
@@ -1,14 +1,10 @@
-from typing import Optional, Tuple
-from starlette.authentication import AuthenticationBackend, AuthenticationError, AuthCredentials, BaseUser
-from starlette.middleware.authentication import AuthenticationMiddleware
-from starlette.requests import Request
-from jose import JWTError, jwt
-
-from app.core.models.User import User
-from app.utils.constants import USER_NOT_FOUND, INVALID_CREDENTIALS
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+from starlette.authentication import AuthenticationBackend, AuthCredentials, UnauthenticatedUser
+
 from app.config import settings
 from app.utils.constants import AuthConstants
-from app.utils.authorization import decodeJWT
+from app.utils.authorization import verifyJWT
 import re
 
 rules = {
@@ -29,7 +25,81 @@ rules = {
     }
 }
 
+# Routes that never look at request.user; no token work is done for them.
+publicRoutes = {
+    "GET": [
+        "/docs",
+        "/docs/oauth2-redirect",
+        "/redoc",
+        re.escape(f"{settings.VERSION}/{settings.OPEN_API_JSON_FILENAME}"),
+        "/v1/auth/users",
+        "/v1/auth/leads",
+        "/v1/darshan/accepted-darshan",
+        "/v1/events",
+        "/v1/events/[^/]+",
+        "/v1/spiritual-events",
+        "/v1/spiritual-events/[^/]+",
+        "/v1/team",
+        "/v1/team/[^/]+",
+    ],
+    "POST": [
+        "/v1/auth/login",
+        "/v1/darshan",
+    ],
+    "OPTIONS": [
+        ".*",
+    ],
+}
+
+REGEX_CHARACTERS = frozenset(".*+?[](){}|^$\\")
+
+
+class RouteTable:
+    """
+    Method-and-path lookup compiled once from a `{method: {path: roles}}` dict.
+    Literal paths are resolved with a dict lookup, the remaining patterns are
+    precompiled and only scanned when no literal path matched.
+    """
+
+    def __init__(self, table: Dict[str, Dict[str, List[str]]], cacheSize: int = 1024) -> None:
+        self.exact: Dict[str, Dict[str, Tuple[str, ...]]] = {}
+        self.patterns: Dict[str, List[Tuple[re.Pattern, Tuple[str, ...]]]] = {}
+        for method, paths in table.items():
+            exact = self.exact.setdefault(method, {})
+            patterns = self.patterns.setdefault(method, [])
+            for path, roles in paths.items():
+                if REGEX_CHARACTERS.isdisjoint(path):
+                    exact[path] = exact.get(path, ()) + tuple(roles)
+                else:
+                    patterns.append((re.compile(path), tuple(roles)))
+        self.lookup = lru_cache(maxsize=cacheSize)(self._lookup)
+
+    @classmethod
+    def fromPaths(cls, table: Dict[str, Iterable[str]]) -> "RouteTable":
+        return cls({method: {path: [] for path in paths} for method, paths in table.items()})
+
+    def _lookup(self, method: str, path: str) -> Optional[Tuple[str, ...]]:
+        """Roles for the route, or None when no rule matches it."""
+        matched = None
+        roles = self.exact.get(method, {}).get(path)
+        if roles is not None:
+            matched = roles
+        for pattern, patternRoles in self.patterns.get(method, ()):
+            if pattern.fullmatch(path):
+                matched = (matched or ()) + patternRoles
+        return matched
+
+    def matches(self, method: str, path: str) -> bool:
+        return self.lookup(method, path) is not None
+
+
+compiledRules = RouteTable(rules)
+compiledPublicRoutes = RouteTable.fromPaths(publicRoutes)
+
+
 class AuthenticatedUser:
+    __slots__ = ("userId", "role")
+
     userId: str
     role: str
 
@@ -37,42 +107,80 @@ class AuthenticatedUser:
         self.userId = userId
         self.role = role
 
+    @property
+    def is_authenticated(self) -> bool:
+        return True
+
+    @property
+    def display_name(self) -> str:
+        return self.userId
+
+    @property
+    def identity(self) -> str:
+        return self.userId
+
+
+# Shared, never mutated: anonymous requests allocate nothing.
+AUTHENTICATED_CREDENTIALS = AuthCredentials([AuthConstants.AUTHENTICATED])
+ANONYMOUS = (AuthCredentials(), UnauthenticatedUser())
+AUTHORIZATION_HEADER = AuthConstants.AUTHORIZATION.lower().encode()
+
 
 def getRoleForMatchingRule(method, apiPath):
-    methodRules = rules.get(method, {})
-    roles = []
-    for path, role in methodRules.items():
-        if re.fullmatch(path, apiPath):
-            roles.extend(role)
-    return roles
-
-
-def userAuthentication(conn):
-    token = conn.headers.get(AuthConstants.AUTHORIZATION, AuthConstants.EMPTY_STRING)
-    method = conn.__dict__.get(AuthConstants.SCOPE, {}).get(AuthConstants.METHOD, {})
-    path = conn.__dict__.get(AuthConstants.SCOPE, {}).get(AuthConstants.PATH, {})
-    decodedToken = decodeJWT(token)
-    if decodedToken != {} or decodedToken is not None:
-        userId = decodedToken.get(AuthConstants.USER_ID, AuthConstants.EMPTY_STRING)
-        userRole = decodedToken.get(AuthConstants.USER_ROLE, AuthConstants.EMPTY_STRING)
-        return AuthCredentials([AuthConstants.AUTHENTICATED]), AuthenticatedUser(
-            userId, userRole
-        )
-    else:
-        return AuthCredentials([]), None
+    return list(compiledRules.lookup(method, apiPath) or ())
+
+
+def getAuthorizationHeader(scope) -> str:
+    for name, value in scope.get(AuthConstants.HEADERS, ()):
+        if name == AUTHORIZATION_HEADER:
+            return value.decode("latin-1")
+    return AuthConstants.EMPTY_STRING
+
+
+def userAuthentication(token: str):
+    decodedToken = verifyJWT(token)
+    if decodedToken is None:
+        return ANONYMOUS
+    userId = decodedToken.get(AuthConstants.USER_ID, AuthConstants.EMPTY_STRING)
+    userRole = decodedToken.get(AuthConstants.USER_ROLE, AuthConstants.EMPTY_STRING)
+    return AUTHENTICATED_CREDENTIALS, AuthenticatedUser(userId, userRole)
 
 class ApiAuthBackend(AuthenticationBackend):
     skipAuthentication: bool
     skipTestAuthentication: bool
+    publicRoutes: RouteTable
 
-    def __init__(self, skipAuthentication=False, skipTestAuthentication=True) -> None:
+    def __init__(self, skipAuthentication=False, skipTestAuthentication=True, publicRoutes=compiledPublicRoutes) -> None:
         self.skipAuthentication = skipAuthentication
         self.skipTestAuthentication = skipTestAuthentication
+        self.publicRoutes = publicRoutes
 
-    async def authenticate(self, conn):
+    def authenticateScope(self, scope):
         if self.skipAuthentication:
-            return AuthCredentials([AuthConstants.AUTHENTICATED]), AuthenticatedUser(
+            return AUTHENTICATED_CREDENTIALS, AuthenticatedUser(
                 AuthConstants.ADMIN, AuthConstants.ADMIN
             )
-        else:
-            return userAuthentication(conn)
+        if self.publicRoutes.matches(scope.get(AuthConstants.METHOD, AuthConstants.EMPTY_STRING), scope[AuthConstants.PATH]):
+            return ANONYMOUS
+        return userAuthentication(getAuthorizationHeader(scope))
+
+    async def authenticate(self, conn):
+        return self.authenticateScope(conn.scope)
+
+
+class ApiAuthMiddleware:
+    """
+    Pure ASGI replacement for Starlette's AuthenticationMiddleware. It fills
+    scope["auth"] and scope["user"] straight from the raw scope, so
+    `@requires("authenticated")` and `request.user` behave as before without
+    building an HTTPConnection per request.
+    """
+
+    def __init__(self, app, backend: Optional[ApiAuthBackend] = None) -> None:
+        self.app = app
+        self.backend = backend or ApiAuthBackend()
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] == "http" or scope["type"] == "websocket":
+            scope["auth"], scope["user"] = self.backend.authenticateScope(scope)
+        await self.app(scope, receive, send)
@@ -1,5 +1,7 @@
+import hashlib
 import time
-from typing import Dict
+from collections import OrderedDict
+from typing import Dict, Optional
 from app.config import settings
 import jwt
 
@@ -25,4 +27,62 @@ def decodeJWT(token: str) -> dict:
         decodedToken = jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
         return decodedToken if decodedToken["expires"] >= time.time() else None
     except Exception as error:
-        return {}
\ No newline at end of file
+        return {}
+
+
+class TokenCache:
+    """
+    Bounded LRU of already verified tokens, keyed by the SHA-256 digest of the
+    raw token so the tokens themselves are never held in memory. Entries are
+    dropped as soon as the token's `expires` claim has passed.
+    """
+
+    def __init__(self, maxSize: int) -> None:
+        self.maxSize = maxSize
+        self.entries: "OrderedDict[bytes, dict]" = OrderedDict()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, key: bytes) -> Optional[dict]:
+        payload = self.entries.get(key)
+        if payload is None:
+            return None
+        if payload["expires"] < time.time():
+            del self.entries[key]
+            return None
+        self.entries.move_to_end(key)
+        return payload
+
+    def put(self, key: bytes, payload: dict) -> None:
+        if self.maxSize <= 0:
+            return
+        self.entries[key] = payload
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+
+tokenCache = TokenCache(settings.JWT_CACHE_SIZE)
+
+
+def verifyJWT(token: str) -> Optional[dict]:
+    """
+    Return the payload of a valid, unexpired token or None. Successful
+    verifications are served from `tokenCache` until the token expires.
+    """
+    if not token:
+        return None
+    key = TokenCache.digest(token)
+    payload = tokenCache.get(key)
+    if payload is not None:
+        return payload
+    payload = decodeJWT(token)
+    if not payload or not isinstance(payload.get("expires"), (int, float)):
+        return None
+    tokenCache.put(key, payload)
+    return payload
@@ -17,6 +17,7 @@ class AuthConstants:
     AUTHENTICATED: str = "authenticated"
     AUTHORIZATION: str = "Authorization"
     EMPTY_STRING: str = ""
+    HEADERS: str = "headers"
     HOST: str = "host"
     METHOD: str = "method"
     PATH: str = "path"
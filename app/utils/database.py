@@ -0,0 +1,183 @@
+import asyncio
+import json
+import os
+from typing import Dict, List, Optional, Tuple, Type
+
+from beanie import Document, init_beanie
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorCollection
+from pymongo import ReadPreference
+
+from app.config import settings
+from app.utils.startup import startupTimings
+from app.utils.metrics import mongoEventListeners
+from app.utils.slow_queries import slowQueryListeners, slowQueryLog
+from app.utils.singleflight import SingleFlight
+
+READ_PREFERENCES = {
+    "primary": ReadPreference.PRIMARY,
+    "primaryPreferred": ReadPreference.PRIMARY_PREFERRED,
+    "secondary": ReadPreference.SECONDARY,
+    "secondaryPreferred": ReadPreference.SECONDARY_PREFERRED,
+    "nearest": ReadPreference.NEAREST,
+}
+
+
+def clientOptions() -> dict:
+    """Pool, timeout and compression options for the MongoDB client, from Settings."""
+    options = {
+        "maxPoolSize": settings.MONGODB_MAX_POOL_SIZE,
+        "minPoolSize": settings.MONGODB_MIN_POOL_SIZE,
+        "maxIdleTimeMS": settings.MONGODB_MAX_IDLE_TIME_MS,
+        "serverSelectionTimeoutMS": settings.MONGODB_SERVER_SELECTION_TIMEOUT_MS,
+        "connectTimeoutMS": settings.MONGODB_CONNECT_TIMEOUT_MS,
+        "socketTimeoutMS": settings.MONGODB_SOCKET_TIMEOUT_MS or None,
+        "appname": settings.API_TITLE,
+        "event_listeners": mongoEventListeners() + slowQueryListeners(),
+    }
+    if settings.MONGODB_COMPRESSORS:
+        options["compressors"] = settings.MONGODB_COMPRESSORS
+    return options
+
+
+async def syncTtlIndexes(documentModels: List[Type[Document]]) -> None:
+    """
+    Create, retune or drop the TTL index each model declares as
+    `ttlIndex = (field, seconds)`, with 0 seconds meaning no expiry. Beanie
+    can't change the expiry of an existing index (IndexOptionsConflict), so
+    these are kept out of Settings.indexes and updated with collMod instead.
+    """
+    for model in documentModels:
+        ttlIndex = getattr(model, "ttlIndex", None)
+        if ttlIndex is None:
+            continue
+        field, seconds = ttlIndex
+        collection = model.get_motor_collection()
+        existing = next(
+            (index for index in (await collection.index_information()).values() if list(index["key"]) == [(field, 1)]),
+            None
+        )
+        if existing is None:
+            if seconds > 0:
+                await collection.create_index([(field, 1)], expireAfterSeconds=seconds)
+        elif seconds <= 0:
+            if "expireAfterSeconds" in existing:
+                await collection.drop_index([(field, 1)])
+        elif existing.get("expireAfterSeconds") != seconds:
+            await collection.database.command(
+                "collMod", collection.name, index={"keyPattern": {field: 1}, "expireAfterSeconds": seconds}
+            )
+
+
+def runningOnLambda() -> bool:
+    return "AWS_LAMBDA_FUNCTION_NAME" in os.environ
+
+
+class MongoConnection:
+    """
+    Process-wide MongoDB client.
+
+    connect() is idempotent: under Mangum the startup hook runs on every
+    invocation, so a warm Lambda container keeps its client, pool and Beanie
+    initialisation instead of reconnecting. A client is only rebuilt when the
+    event loop it was created on is gone. close() is skipped on Lambda
+    (unless MONGODB_CLOSE_ON_SHUTDOWN says otherwise) for the same reason.
+    """
+
+    def __init__(self) -> None:
+        self.client: Optional[AsyncIOMotorClient] = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.publicCollections: Dict[str, Tuple[AsyncIOMotorCollection, AsyncIOMotorCollection]] = {}
+
+    @property
+    def connected(self) -> bool:
+        return self.client is not None and self.loop is asyncio.get_running_loop() and not self.loop.is_closed()
+
+    async def connect(self, documentModels: List[Type[Document]], syncIndexes: Optional[bool] = None) -> AsyncIOMotorClient:
+        if self.connected:
+            return self.client
+        if self.client is not None:
+            self.client.close()
+        with startupTimings.phase("mongo_connect"):
+            self.client = AsyncIOMotorClient(settings.MONGODB_URL, **clientOptions())
+            self.loop = asyncio.get_running_loop()
+            self.publicCollections = {}
+            slowQueryLog.attach(self.client)
+            # Open the first connection here so the phase measures it, not Beanie's first command
+            await self.client.admin.command("ping")
+        syncIndexes = settings.MONGODB_SYNC_INDEXES if syncIndexes is None else syncIndexes
+        with startupTimings.phase("beanie_init"):
+            await init_beanie(
+                database=self.client[settings.DB_NAME],
+                document_models=documentModels,
+                skip_indexes=not syncIndexes
+            )
+            if syncIndexes:
+                await syncTtlIndexes(documentModels)
+        return self.client
+
+    async def syncIndexes(self, documentModels: List[Type[Document]]) -> None:
+        """Create the declared indexes and TTL indexes on the connected database; errors propagate."""
+        await init_beanie(
+            database=self.client[settings.DB_NAME],
+            document_models=documentModels,
+            skip_indexes=False
+        )
+        await syncTtlIndexes(documentModels)
+
+    def close(self, force: bool = False) -> None:
+        closeOnShutdown = settings.MONGODB_CLOSE_ON_SHUTDOWN
+        if closeOnShutdown is None:
+            closeOnShutdown = not runningOnLambda()
+        if self.client is None or not (force or closeOnShutdown):
+            return
+        self.client.close()
+        self.client = None
+        self.loop = None
+        self.publicCollections = {}
+
+    def publicCollection(self, model: Type[Document]) -> AsyncIOMotorCollection:
+        """
+        Collection handle for public, read-only routes. These tolerate
+        replication lag, so they read with MONGODB_PUBLIC_READ_PREFERENCE
+        (secondaryPreferred by default) and keep load off the primary.
+        """
+        base = model.get_motor_collection()
+        cached = self.publicCollections.get(base.name)
+        if cached is None or cached[0] is not base:
+            cached = (base, base.with_options(
+                read_preference=READ_PREFERENCES[settings.MONGODB_PUBLIC_READ_PREFERENCE]
+            ))
+            self.publicCollections[base.name] = cached
+        return cached[1]
+
+
+mongo = MongoConnection()
+
+
+publicReads = SingleFlight("mongo_public_read")
+
+
+def publicReadKey(model: Type[Document], operation: str, query: Optional[dict]) -> tuple:
+    return (model.__name__, operation, json.dumps(query or {}, sort_keys=True, default=str))
+
+
+async def findPublic(model: Type[Document], query: Optional[dict] = None) -> List[Document]:
+    """Concurrent identical public reads share one query (see app.utils.singleflight); don't mutate the result."""
+    async def find() -> List[Document]:
+        cursor = mongo.publicCollection(model).find(query or {})
+        return [model.model_validate(document) async for document in cursor]
+    return await publicReads.do(publicReadKey(model, "find", query), find)
+
+
+async def findOnePublic(model: Type[Document], query: dict) -> Optional[Document]:
+    async def findOne() -> Optional[Document]:
+        document = await mongo.publicCollection(model).find_one(query)
+        return model.model_validate(document) if document is not None else None
+    return await publicReads.do(publicReadKey(model, "find_one", query), findOne)
+
+
+async def countPublic(model: Type[Document], query: Optional[dict] = None) -> int:
+    return await publicReads.do(
+        publicReadKey(model, "count", query),
+        lambda: mongo.publicCollection(model).count_documents(query or {})
+    )
@@ -0,0 +1,63 @@
+from datetime import datetime, timedelta, timezone
+from typing import Optional, Type
+
+from beanie import Document
+from fastapi import HTTPException, status
+from pymongo import ReturnDocument
+
+
+def updatedAtFilter(expectedUpdatedAt: datetime) -> dict:
+    """
+    Match an updatedAt as clients saw it. MongoDB keeps milliseconds, while
+    responses built before a round trip carry microseconds, so compare at
+    millisecond precision.
+    """
+    if expectedUpdatedAt.tzinfo is not None:
+        expectedUpdatedAt = expectedUpdatedAt.astimezone(timezone.utc).replace(tzinfo=None)
+    start = expectedUpdatedAt.replace(microsecond=expectedUpdatedAt.microsecond // 1000 * 1000)
+    return {"$gte": start, "$lt": start + timedelta(milliseconds=1)}
+
+
+def matchesUpdatedAt(updatedAt: datetime, expectedUpdatedAt: datetime) -> bool:
+    """In-memory counterpart of updatedAtFilter, to reject a stale edit before doing any work."""
+    bounds = updatedAtFilter(expectedUpdatedAt)
+    return bounds["$gte"] <= updatedAt < bounds["$lt"]
+
+
+def conflictError() -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_409_CONFLICT,
+        detail="The document was modified by someone else, reload it and try again"
+    )
+
+
+async def findOneAndSet(
+    model: Type[Document],
+    documentId: str,
+    updateData: dict,
+    expectedUpdatedAt: Optional[datetime] = None
+) -> Optional[Document]:
+    """
+    Apply `$set: updateData` and return the updated document in one round
+    trip. With `expectedUpdatedAt` the write only happens if nobody else has
+    modified the document since; None means no document matched.
+    """
+    query = {"_id": documentId}
+    if expectedUpdatedAt is not None:
+        query["updatedAt"] = updatedAtFilter(expectedUpdatedAt)
+    document = await model.get_motor_collection().find_one_and_update(
+        query,
+        {"$set": updateData},
+        return_document=ReturnDocument.AFTER
+    )
+    return model.model_validate(document) if document is not None else None
+
+
+async def updateFailure(model: Type[Document], documentId: str, notFoundDetail: str) -> HTTPException:
+    """Tell a missing document (404) from a concurrent edit (409) after findOneAndSet matched nothing."""
+    if await model.get_motor_collection().count_documents({"_id": documentId}, limit=1):
+        return conflictError()
+    return HTTPException(
+        status_code=status.HTTP_404_NOT_FOUND,
+        detail=notFoundDetail
+    )
@@ -0,0 +1,115 @@
+import asyncio
+import time
+from collections import OrderedDict
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from beanie.operators import In
+
+from app.config import settings
+from app.core.models.Darshan import Darshan
+from app.core.schemas.Darshan import DarshanStatus
+
+# Only requests still waiting on a decision absorb re-submissions
+OPEN_STATUSES = [DarshanStatus.PENDING_LEAD.value, DarshanStatus.PENDING_PA.value]
+
+
+class RecentSubmissions:
+    """
+    Short-lived map of phone number -> darshan request created by this process,
+    plus the submissions for a phone number that are still in flight. The
+    map is an LRU capped at `maxSize` whose entries expire after `ttl` seconds.
+    """
+
+    def __init__(self, ttl: float, maxSize: int) -> None:
+        self.ttl = ttl
+        self.maxSize = maxSize
+        self.entries: "OrderedDict[str, Tuple[float, Darshan]]" = OrderedDict()
+        self.pending: Dict[str, asyncio.Future] = {}
+
+    def get(self, phoneNumber: str) -> Optional[Darshan]:
+        entry = self.entries.get(phoneNumber)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self.entries[phoneNumber]
+            return None
+        return entry[1]
+
+    def forget(self, phoneNumber: str, requestId: str) -> None:
+        """Drop the entry for a request that was decided or deleted, so it stops absorbing submissions."""
+        entry = self.entries.get(phoneNumber)
+        if entry is not None and entry[1].id == requestId:
+            del self.entries[phoneNumber]
+
+    def add(self, darshan: Darshan) -> None:
+        self.entries[darshan.phoneNumber] = (time.monotonic() + self.ttl, darshan)
+        self.entries.move_to_end(darshan.phoneNumber)
+        while len(self.entries) > self.maxSize:
+            self.entries.popitem(last=False)
+
+
+recentSubmissions = RecentSubmissions(
+    ttl=settings.DARSHAN_DUPLICATE_WINDOW_MINUTES * 60,
+    maxSize=settings.DARSHAN_DUPLICATE_CACHE_SIZE,
+)
+
+
+async def findRecentDarshan(phoneNumber: str) -> Optional[Darshan]:
+    """Open request for this phone number created within the window, via the phoneNumber index."""
+    since = datetime.utcnow() - timedelta(minutes=settings.DARSHAN_DUPLICATE_WINDOW_MINUTES)
+    return await Darshan.find_one(
+        Darshan.phoneNumber == phoneNumber,
+        Darshan.createdAt >= since,
+        In(Darshan.status, OPEN_STATUSES)
+    )
+
+
+async def openStatus(requestId: str) -> Optional[str]:
+    """Current status of a request if it is still open, by _id; another worker may have decided it."""
+    document = await Darshan.get_motor_collection().find_one(
+        {"_id": requestId, "status": {"$in": OPEN_STATUSES}},
+        {"status": 1}
+    )
+    return document["status"] if document is not None else None
+
+
+async def submitOnce(phoneNumber: str, create: Callable[[], Awaitable[Darshan]]) -> Tuple[Darshan, bool]:
+    """
+    Return (darshan, created). Calls `create` only when no open request for
+    the phone number exists within DARSHAN_DUPLICATE_WINDOW_MINUTES; otherwise
+    returns the existing one. Concurrent submissions for the same phone number
+    in this process wait for the first one instead of racing it.
+    """
+    if settings.DARSHAN_DUPLICATE_WINDOW_MINUTES <= 0:
+        return await create(), True
+
+    recent = recentSubmissions.get(phoneNumber)
+    if recent is not None:
+        currentStatus = await openStatus(recent.id)
+        if currentStatus is not None:
+            return recent.model_copy(update={"status": DarshanStatus(currentStatus)}), False
+        recentSubmissions.forget(phoneNumber, recent.id)
+    pending = recentSubmissions.pending.get(phoneNumber)
+    if pending is not None:
+        existing = await asyncio.shield(pending)
+        if existing is not None:
+            return existing, False
+
+    future = asyncio.get_running_loop().create_future()
+    recentSubmissions.pending[phoneNumber] = future
+    darshan = None
+    try:
+        existing = await findRecentDarshan(phoneNumber)
+        if existing is not None:
+            # Loaded documents keep status as the stored string; callers get the enum either way
+            existing.status = DarshanStatus(existing.status)
+            darshan = existing
+            recentSubmissions.add(existing)
+            return existing, False
+        darshan = await create()
+        recentSubmissions.add(darshan)
+        return darshan, True
+    finally:
+        recentSubmissions.pending.pop(phoneNumber, None)
+        future.set_result(darshan)
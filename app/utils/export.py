@@ -0,0 +1,97 @@
+import csv
+import io
+import json
+from datetime import date, datetime, time, timedelta
+from typing import AsyncIterator, Optional
+
+from app.config import settings
+from app.core.models.Darshan import Darshan
+
+EXPORT_COLUMNS = [
+    "id",
+    "name",
+    "phoneNumber",
+    "address",
+    "numberOfPeople",
+    "reasonToVisit",
+    "status",
+    "leadId",
+    "scheduledDateTime",
+    "scheduledLocation",
+    "reason",
+    "createdAt",
+]
+
+EXPORT_FORMATS = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+}
+
+
+def exportQuery(status: Optional[str], day: Optional[date], location: Optional[str]) -> dict:
+    query = {}
+    if status:
+        query["status"] = status
+    if day:
+        start = datetime.combine(day, time.min)
+        query["scheduledDateTime"] = {"$gte": start, "$lt": start + timedelta(days=1)}
+    if location:
+        query["scheduledLocation"] = location
+    return query
+
+
+# Spreadsheets evaluate cells starting with these as formulas
+FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+
+def _csvSafe(row: dict) -> dict:
+    """Prefix text that a spreadsheet would run as a formula with a quote (public fields are user input)."""
+    return {
+        column: f"'{value}" if isinstance(value, str) and value.startswith(FORMULA_PREFIXES) else value
+        for column, value in row.items()
+    }
+
+
+def _row(document: dict) -> dict:
+    row = {column: document.get(column) for column in EXPORT_COLUMNS}
+    row["id"] = document["_id"]
+    for column in ("scheduledDateTime", "createdAt"):
+        if isinstance(row[column], datetime):
+            row[column] = row[column].isoformat()
+    return row
+
+
+async def exportDarshans(query: dict, format: str) -> AsyncIterator[str]:
+    """
+    Stream matching darshan requests as CSV or NDJSON straight off a Mongo
+    cursor. Rows are encoded and yielded one batch at a time, so memory stays
+    flat regardless of how many documents match.
+    """
+    batchSize = settings.DARSHAN_EXPORT_BATCH_SIZE
+    cursor = Darshan.get_motor_collection().find(
+        query,
+        {column: 1 for column in EXPORT_COLUMNS if column != "id"},
+        batch_size=batchSize
+    ).sort([("scheduledDateTime", 1), ("_id", 1)])
+
+    buffer = io.StringIO()
+    writer = None
+    if format == "csv":
+        writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+        writer.writeheader()
+
+    rows = 0
+    async for document in cursor:
+        row = _row(document)
+        if writer is not None:
+            writer.writerow(_csvSafe(row))
+        else:
+            buffer.write(json.dumps(row))
+            buffer.write("\n")
+        rows += 1
+        if rows % batchSize == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
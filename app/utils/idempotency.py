@@ -0,0 +1,287 @@
+import asyncio
+import hashlib
+import tempfile
+from datetime import datetime, timedelta
+from typing import Dict, Optional
+
+from pymongo.errors import DuplicateKeyError
+from starlette.responses import JSONResponse, Response
+
+from app.config import settings
+from app.core.models.IdempotencyKey import IdempotencyKey
+
+# Create endpoints that honour the Idempotency-Key header
+idempotentRoutes = {
+    ("POST", "/v1/events"),
+    ("POST", "/v1/spiritual-events"),
+    ("POST", "/v1/team"),
+    ("POST", "/v1/darshan"),
+}
+
+IDEMPOTENCY_KEY_HEADER = b"idempotency-key"
+MAX_KEY_LENGTH = 255
+SPOOL_MEMORY_BYTES = 1024 * 1024  # larger request bodies are spooled to disk
+REPLAY_CHUNK_BYTES = 64 * 1024
+COMPLETED = "completed"
+IN_PROGRESS = "in_progress"
+
+
+def getIdempotencyKey(scope) -> str:
+    for name, value in scope.get("headers", ()):
+        if name == IDEMPOTENCY_KEY_HEADER:
+            return value.decode("latin-1").strip()
+    return ""
+
+
+class FingerprintHasher:
+    """
+    SHA-256 of method, path and body, fed chunk by chunk as the body is read.
+    Multipart boundaries are random per send, so they are removed first;
+    otherwise a retried upload would never match its first attempt. The last
+    len(boundary) - 1 bytes of each chunk are held back, so a boundary split
+    across two chunks is still removed.
+    """
+
+    def __init__(self, scope) -> None:
+        self.boundary = b""
+        for name, value in scope.get("headers", ()):
+            if name == b"content-type" and b"boundary=" in value:
+                self.boundary = value.split(b"boundary=", 1)[1].split(b";", 1)[0].strip(b'" ')
+        self.digest = hashlib.sha256()
+        for part in (scope["method"].encode(), scope["path"].encode()):
+            self.digest.update(len(part).to_bytes(8, "big"))
+            self.digest.update(part)
+        self.pending = b""
+
+    def update(self, chunk: bytes) -> None:
+        if not self.boundary:
+            self.digest.update(chunk)
+            return
+        data = self.pending + chunk
+        lastEnd = data.rfind(self.boundary)
+        lastEnd = 0 if lastEnd < 0 else lastEnd + len(self.boundary)
+        cut = max(lastEnd, len(data) - len(self.boundary) + 1)
+        self.digest.update(data[:cut].replace(self.boundary, b""))
+        self.pending = data[cut:]
+
+    def hexdigest(self) -> str:
+        self.digest.update(self.pending)
+        self.pending = b""
+        return self.digest.hexdigest()
+
+
+def contentLength(scope) -> Optional[int]:
+    for name, value in scope.get("headers", ()):
+        if name == b"content-length":
+            try:
+                return int(value)
+            except ValueError:
+                return None
+    return None
+
+
+async def spoolBody(scope, receive, spool) -> Optional[str]:
+    """
+    Copy the request body into `spool` while fingerprinting it. Returns the
+    fingerprint, None if the client disconnected first, or "" when the body
+    is larger than IDEMPOTENCY_MAX_REQUEST_BYTES.
+    """
+    hasher = FingerprintHasher(scope)
+    size = 0
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return None
+        chunk = message.get("body", b"")
+        size += len(chunk)
+        if size > settings.IDEMPOTENCY_MAX_REQUEST_BYTES:
+            return ""
+        hasher.update(chunk)
+        spool.write(chunk)
+        if not message.get("more_body", False):
+            spool.seek(0)
+            return hasher.hexdigest()
+
+
+def bufferedReceive(spool, receive):
+    """Replay a spooled body to the app in chunks, then hand over to the real receive (for disconnects)."""
+    delivered = False
+
+    async def replayBody():
+        nonlocal delivered
+        if not delivered:
+            chunk = spool.read(REPLAY_CHUNK_BYTES)
+            delivered = len(chunk) < REPLAY_CHUNK_BYTES
+            return {"type": "http.request", "body": chunk, "more_body": not delivered}
+        return await receive()
+
+    return replayBody
+
+
+def tooLargeResponse() -> JSONResponse:
+    return JSONResponse(
+        {"detail": f"Requests with an Idempotency-Key are limited to {settings.IDEMPOTENCY_MAX_REQUEST_BYTES} bytes"},
+        status_code=413
+    )
+
+
+def mismatchResponse() -> JSONResponse:
+    return JSONResponse(
+        {"detail": "Idempotency-Key was already used for a different request"},
+        status_code=422
+    )
+
+
+class IdempotencyMiddleware:
+    """
+    Runs a create request at most once per Idempotency-Key, keyed together
+    with the route and the caller. The first attempt claims the key in the
+    TTL-indexed idempotency_keys collection and stores its response once done.
+    Replays get the stored response without re-running uploads or inserts.
+    Duplicates that arrive while the first attempt is still running wait for
+    it: in-process via an asyncio.Event, across workers by polling. Responses
+    with a 5xx status are not stored, so those requests can be retried. If an
+    attempt dies without finishing, another one can take the key over after
+    IDEMPOTENCY_LOCK_SECONDS.
+
+    Each record stores a fingerprint of the request (method, path, body);
+    reusing a key for a different request is answered with 422 instead of a
+    replay. Anonymous callers (public darshan submissions) share no user ID,
+    so their records are also keyed by the fingerprint: only a byte-identical
+    request can ever replay an anonymous response. The body is fingerprinted
+    as it streams into a spool file (on disk past SPOOL_MEMORY_BYTES) and
+    replayed to the app from there; bodies over IDEMPOTENCY_MAX_REQUEST_BYTES
+    get a 413.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self.inFlight: Dict[str, asyncio.Event] = {}
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or (scope["method"], scope["path"]) not in idempotentRoutes:
+            await self.app(scope, receive, send)
+            return
+        key = getIdempotencyKey(scope)
+        if not key:
+            await self.app(scope, receive, send)
+            return
+        if len(key) > MAX_KEY_LENGTH:
+            await JSONResponse({"detail": "Idempotency-Key is too long"}, status_code=400)(scope, receive, send)
+            return
+
+        length = contentLength(scope)
+        if length is not None and length > settings.IDEMPOTENCY_MAX_REQUEST_BYTES:
+            await tooLargeResponse()(scope, receive, send)
+            return
+        # Uploads can be large: the body goes through a spool file, not one bytes object
+        with tempfile.SpooledTemporaryFile(max_size=SPOOL_MEMORY_BYTES) as spool:
+            fingerprint = await spoolBody(scope, receive, spool)
+            if fingerprint is None:
+                return
+            if not fingerprint:
+                await tooLargeResponse()(scope, receive, send)
+                return
+            await self.handle(scope, bufferedReceive(spool, receive), send, key, fingerprint)
+
+    async def handle(self, scope, receive, send, key: str, fingerprint: str) -> None:
+        user = scope.get("user")
+        caller = user.userId if user is not None and user.is_authenticated else f"anonymous:{fingerprint}"
+        recordId = f"{scope['method']} {scope['path']}|{caller}|{key}"
+
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + settings.IDEMPOTENCY_WAIT_SECONDS
+        while not await self.claim(recordId, fingerprint):
+            record = await IdempotencyKey.get_motor_collection().find_one({"_id": recordId})
+            if record is not None and record.get("fingerprint") not in (None, fingerprint):
+                await mismatchResponse()(scope, receive, send)
+                return
+            if record is not None and record["status"] == COMPLETED:
+                await self.replay(record)(scope, receive, send)
+                return
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                await JSONResponse(
+                    {"detail": "A request with this Idempotency-Key is still in progress"},
+                    status_code=409,
+                    headers={"Retry-After": "1"}
+                )(scope, receive, send)
+                return
+            event = self.inFlight.get(recordId)
+            try:
+                if event is not None:
+                    await asyncio.wait_for(event.wait(), remaining)
+                else:
+                    await asyncio.sleep(min(0.25, remaining))
+            except asyncio.TimeoutError:
+                pass
+
+        await self.run(recordId, scope, receive, send)
+
+    async def claim(self, recordId: str, fingerprint: str) -> bool:
+        now = datetime.utcnow()
+        lockedUntil = now + timedelta(seconds=settings.IDEMPOTENCY_LOCK_SECONDS)
+        collection = IdempotencyKey.get_motor_collection()
+        try:
+            await collection.insert_one({
+                "_id": recordId,
+                "status": IN_PROGRESS,
+                "fingerprint": fingerprint,
+                "lockedUntil": lockedUntil,
+                "createdAt": now
+            })
+            return True
+        except DuplicateKeyError:
+            # Take over an attempt that stopped without finishing
+            abandoned = await collection.find_one_and_update(
+                {"_id": recordId, "status": IN_PROGRESS, "fingerprint": {"$in": [fingerprint, None]}, "lockedUntil": {"$lt": now}},
+                {"$set": {"lockedUntil": lockedUntil}}
+            )
+            return abandoned is not None
+
+    async def run(self, recordId: str, scope, receive, send) -> None:
+        event = asyncio.Event()
+        self.inFlight[recordId] = event
+        response = {"status": 500, "contentType": None, "body": []}
+
+        async def capture(message) -> None:
+            if message["type"] == "http.response.start":
+                response["status"] = message["status"]
+                for name, value in message.get("headers", ()):
+                    if name == b"content-type":
+                        response["contentType"] = value.decode("latin-1")
+            elif message["type"] == "http.response.body":
+                response["body"].append(message.get("body", b""))
+            await send(message)
+
+        collection = IdempotencyKey.get_motor_collection()
+        try:
+            await self.app(scope, receive, capture)
+            body = b"".join(response["body"])
+            if response["status"] < 500 and len(body) <= settings.IDEMPOTENCY_MAX_BODY_BYTES:
+                await collection.update_one(
+                    {"_id": recordId},
+                    {"$set": {
+                        "status": COMPLETED,
+                        "statusCode": response["status"],
+                        "contentType": response["contentType"],
+                        "body": body
+                    }}
+                )
+            else:
+                await collection.delete_one({"_id": recordId})
+        except BaseException:
+            await asyncio.shield(collection.delete_one({"_id": recordId}))
+            raise
+        finally:
+            self.inFlight.pop(recordId, None)
+            event.set()
+
+    @staticmethod
+    def replay(record: dict) -> Response:
+        return Response(
+            content=bytes(record.get("body") or b""),
+            status_code=record["statusCode"],
+            media_type=record.get("contentType"),
+            headers={"Idempotent-Replayed": "true"}
+        )
@@ -0,0 +1,89 @@
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from pymongo.errors import BulkWriteError
+
+from app.config import settings
+from app.core.models.Darshan import Darshan
+from app.utils.notifications import darshanEvents, CREATED
+from app.utils.stats import recordCreates
+
+logger = logging.getLogger(__name__)
+
+
+class DarshanIngestBuffer:
+    """
+    Write-behind buffer for public darshan submissions. Submissions are
+    collected and written with one unordered insert_many once
+    DARSHAN_INGEST_BATCH_SIZE are waiting or the oldest has waited
+    DARSHAN_INGEST_MAX_DELAY_MS. Each caller awaits its own submission, so it
+    only gets its ID once the batch holding it has committed; a document that
+    fails inside the batch fails only its own caller.
+    """
+
+    def __init__(self, batchSize: int, maxDelay: float) -> None:
+        self.batchSize = batchSize
+        self.maxDelay = maxDelay
+        self.pending: List[Tuple[Darshan, asyncio.Future]] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+        self.flushes = set()
+
+    async def submit(self, darshan: Darshan) -> Darshan:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self.pending.append((darshan, future))
+        if len(self.pending) >= self.batchSize:
+            self._flushPending()
+        elif self.timer is None:
+            self.timer = loop.call_later(self.maxDelay, self._flushPending)
+        return await future
+
+    def _flushPending(self) -> None:
+        if self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        batch, self.pending = self.pending, []
+        if batch:
+            task = asyncio.get_running_loop().create_task(self._flush(batch))
+            self.flushes.add(task)
+            task.add_done_callback(self.flushes.discard)
+
+    async def _flush(self, batch: List[Tuple[Darshan, asyncio.Future]]) -> None:
+        failed = {}
+        try:
+            await Darshan.insert_many([darshan for darshan, _ in batch], ordered=False)
+        except BulkWriteError as error:
+            for writeError in error.details.get("writeErrors", []):
+                failed[writeError["index"]] = error
+        except Exception as error:
+            failed = {index: error for index in range(len(batch))}
+
+        inserted = [darshan for index, (darshan, _) in enumerate(batch) if index not in failed]
+        if inserted:
+            try:
+                await recordCreates(inserted)
+            except Exception:
+                logger.exception("Recording darshan stats for an ingest batch failed")
+            for darshan in inserted:
+                darshanEvents.publish(CREATED, darshan)
+
+        for index, (darshan, future) in enumerate(batch):
+            if future.done():
+                continue
+            if index in failed:
+                future.set_exception(failed[index])
+            else:
+                future.set_result(darshan)
+
+    async def close(self) -> None:
+        """Flush whatever is buffered and wait for in-flight batches."""
+        self._flushPending()
+        if self.flushes:
+            await asyncio.gather(*self.flushes, return_exceptions=True)
+
+
+darshanIngest = DarshanIngestBuffer(
+    batchSize=settings.DARSHAN_INGEST_BATCH_SIZE,
+    maxDelay=settings.DARSHAN_INGEST_MAX_DELAY_MS / 1000,
+)
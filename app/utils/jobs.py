@@ -0,0 +1,245 @@
+"""
+Durable background jobs stored in the `jobs` collection.
+
+Handlers enqueue work with `await enqueueJob(type, payload)` and return;
+the insert is the only cost on the request path. Workers are coroutines
+that run in the app process (JOBS_RUN_IN_APP) or in
+`python -m app.cli jobs-worker`. Both claim jobs the same way, so any mix
+of processes can share one queue:
+
+- A claim is one find_one_and_update that moves a due job to "running",
+  stamps the worker and sets lockedUntil, so two workers never run the same
+  claim.
+- A failed run is retried with exponential backoff until its type's
+  maxAttempts, then kept as "failed" with the last error.
+- A run is cancelled after its visibility timeout. A job still "running"
+  after lockedUntil (the timeout plus JOBS_LOCK_GRACE_SECONDS, so its
+  worker crashed) is claimed again, so nothing enqueued is lost.
+- Each type has its own worker count, so a burst of one type cannot starve
+  the others.
+
+Completion is fenced on lockedBy and attempts: a worker whose claim was
+taken over cannot overwrite the newer run's outcome. Handlers should be
+idempotent, since a crash after the side effect runs the job again.
+"""
+import asyncio
+import logging
+import os
+import random
+import socket
+import uuid
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from pymongo import ReturnDocument
+
+from app.config import settings
+from app.core.models.Job import Job
+from app.utils.database import runningOnLambda
+from app.utils.metrics import registry, Counter, Histogram
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+jobsProcessed = registry.register(Counter(
+    "jobs_processed_total", "Background job runs by type and outcome (succeeded, retried, failed).", ("type", "outcome")
+))
+jobDuration = registry.register(Histogram(
+    "job_duration_seconds", "Background job run time by type and outcome.", ("type", "outcome")
+))
+
+
+@dataclass
+class JobType:
+    name: str
+    handler: Callable[[dict], Awaitable[None]]
+    concurrency: int
+    maxAttempts: int
+    timeoutSeconds: int
+
+
+jobTypes: Dict[str, JobType] = {}
+
+
+def jobHandler(
+    name: str,
+    concurrency: Optional[int] = None,
+    maxAttempts: Optional[int] = None,
+    timeoutSeconds: Optional[int] = None
+):
+    """Register `async def handler(payload: dict)` for jobs of type `name`; defaults come from the JOBS_* settings."""
+    def register(handler):
+        jobTypes[name] = JobType(
+            name=name,
+            handler=handler,
+            concurrency=concurrency or settings.JOBS_CONCURRENCY,
+            maxAttempts=maxAttempts or settings.JOBS_MAX_ATTEMPTS,
+            timeoutSeconds=timeoutSeconds or settings.JOBS_VISIBILITY_TIMEOUT_SECONDS,
+        )
+        return handler
+    return register
+
+
+async def enqueueJob(name: str, payload: dict, delaySeconds: float = 0) -> Job:
+    jobType = jobTypes.get(name)
+    if jobType is None:
+        raise ValueError(f"Unknown job type {name!r}")
+    job = Job(
+        type=name,
+        payload=payload,
+        maxAttempts=jobType.maxAttempts,
+        runAt=datetime.utcnow() + timedelta(seconds=delaySeconds),
+    )
+    await job.insert()
+    if delaySeconds <= 0:
+        jobRunner.notify(name)
+    return job
+
+
+def retryDelay(attempts: int) -> float:
+    """Exponential backoff with full jitter over the upper half, so retries of a burst spread out."""
+    delay = min(settings.JOBS_BACKOFF_MAX_SECONDS, settings.JOBS_BACKOFF_BASE_SECONDS * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+async def claimJob(jobType: JobType, workerId: str) -> Optional[Job]:
+    now = datetime.utcnow()
+    document = await Job.get_motor_collection().find_one_and_update(
+        {
+            "type": jobType.name,
+            "$or": [
+                {"status": QUEUED, "runAt": {"$lte": now}},
+                {"status": RUNNING, "lockedUntil": {"$lte": now}},
+            ],
+        },
+        {
+            "$set": {
+                "status": RUNNING,
+                "lockedBy": workerId,
+                # Past the timeout, so a cancelled run can record its outcome before anyone reclaims it
+                "lockedUntil": now + timedelta(seconds=jobType.timeoutSeconds + settings.JOBS_LOCK_GRACE_SECONDS),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=[("runAt", 1)],
+        return_document=ReturnDocument.AFTER,
+    )
+    return Job.model_validate(document) if document is not None else None
+
+
+async def finishJob(job: Job, update: dict) -> bool:
+    """Write a run's outcome, unless another worker has claimed the job since."""
+    result = await Job.get_motor_collection().update_one(
+        {"_id": job.id, "lockedBy": job.lockedBy, "attempts": job.attempts},
+        {"$set": {**update, "lockedBy": None, "lockedUntil": None}},
+    )
+    return result.modified_count == 1
+
+
+async def runJob(jobType: JobType, job: Job) -> None:
+    if job.attempts > job.maxAttempts:
+        # Reclaimed after its worker died on the last attempt
+        await finishJob(job, {"status": FAILED, "finishedAt": datetime.utcnow(), "lastError": job.lastError or "Visibility timeout expired"})
+        jobsProcessed.inc(jobType.name, FAILED)
+        return
+
+    started = asyncio.get_running_loop().time()
+    try:
+        await asyncio.wait_for(jobType.handler(job.payload), jobType.timeoutSeconds)
+    except asyncio.CancelledError:
+        # Shutting down: hand the job back without spending an attempt
+        await asyncio.shield(Job.get_motor_collection().update_one(
+            {"_id": job.id, "lockedBy": job.lockedBy, "attempts": job.attempts},
+            {"$set": {"status": QUEUED, "lockedBy": None, "lockedUntil": None}, "$inc": {"attempts": -1}},
+        ))
+        raise
+    except Exception as error:
+        elapsed = asyncio.get_running_loop().time() - started
+        lastError = f"{type(error).__name__}: {error}" if str(error) else type(error).__name__
+        if job.attempts >= job.maxAttempts:
+            outcome = FAILED
+            await finishJob(job, {"status": FAILED, "finishedAt": datetime.utcnow(), "lastError": lastError})
+            logger.error("Job %s %s failed after %d attempts: %s", jobType.name, job.id, job.attempts, lastError)
+        else:
+            outcome = "retried"
+            delay = retryDelay(job.attempts)
+            await finishJob(job, {"status": QUEUED, "runAt": datetime.utcnow() + timedelta(seconds=delay), "lastError": lastError})
+            logger.warning("Job %s %s attempt %d failed, retrying in %.0f s: %s", jobType.name, job.id, job.attempts, delay, lastError)
+    else:
+        elapsed = asyncio.get_running_loop().time() - started
+        outcome = SUCCEEDED
+        await finishJob(job, {"status": SUCCEEDED, "finishedAt": datetime.utcnow()})
+    jobsProcessed.inc(jobType.name, outcome)
+    jobDuration.observe(elapsed, jobType.name, outcome)
+
+
+class JobRunner:
+    """
+    `concurrency` worker coroutines per registered job type. An idle worker
+    sleeps until a job of its type is enqueued in this process, or for
+    JOBS_POLL_INTERVAL_SECONDS to pick up retries and other processes' jobs.
+    """
+
+    def __init__(self) -> None:
+        self.workerId = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:6]}"
+        self.tasks: List[asyncio.Task] = []
+        self.wakeups: Dict[str, asyncio.Event] = {}
+
+    @property
+    def running(self) -> bool:
+        return bool(self.tasks)
+
+    def notify(self, name: str) -> None:
+        wakeup = self.wakeups.get(name)
+        if wakeup is not None:
+            wakeup.set()
+
+    async def _work(self, jobType: JobType) -> None:
+        wakeup = self.wakeups[jobType.name]
+        while True:
+            try:
+                job = await claimJob(jobType, self.workerId)
+                if job is not None:
+                    await runJob(jobType, job)
+                    continue
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Job worker for %s failed, retrying", jobType.name)
+            wakeup.clear()
+            try:
+                await asyncio.wait_for(wakeup.wait(), settings.JOBS_POLL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self, names: Optional[List[str]] = None) -> None:
+        """Start workers for `names` (default every registered type)."""
+        if self.tasks:
+            return
+        for name in names or list(jobTypes):
+            jobType = jobTypes[name]
+            self.wakeups[name] = asyncio.Event()
+            self.tasks.extend(asyncio.create_task(self._work(jobType)) for _ in range(jobType.concurrency))
+
+    async def startInApp(self) -> None:
+        runInApp = settings.JOBS_RUN_IN_APP
+        if runInApp is None:
+            # A frozen Lambda container would hold claims until they time out
+            runInApp = not runningOnLambda()
+        if runInApp:
+            await self.start()
+
+    async def stop(self) -> None:
+        for task in self.tasks:
+            task.cancel()
+        await asyncio.gather(*self.tasks, return_exceptions=True)
+        self.tasks = []
+        self.wakeups = {}
+
+
+jobRunner = JobRunner()
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+from app.config import settings
+from app.core.models.User import User
+from app.core.schemas.User import UserRole
+
+logger = logging.getLogger(__name__)
+
+
+class LeadDirectory:
+    """
+    In-process copy of every lead user, keyed by userName. Leads change a few
+    times a year, so darshan submission and `/auth/leads` are answered from
+    here without touching MongoDB. The copy is loaded at startup, patched on
+    writes made through this process and kept in sync with other workers by
+    a change stream or, failing that, a periodic reload.
+    """
+
+    def __init__(self) -> None:
+        self.leads: Dict[str, dict] = {}
+        self.listing: List[dict] = []
+        self.task: Optional[asyncio.Task] = None
+
+    def _rebuild(self) -> None:
+        self.listing = list(self.leads.values())
+
+    async def load(self) -> None:
+        leads = await User.find(User.role == UserRole.LEAD).to_list()
+        self.leads = {lead.userName: {"id": lead.userName, "name": lead.name} for lead in leads}
+        self._rebuild()
+
+    def apply(self, user: User) -> None:
+        """Reflect a user that was just written by this process."""
+        if user.role == UserRole.LEAD:
+            self.leads[user.userName] = {"id": user.userName, "name": user.name}
+        else:
+            self.leads.pop(user.userName, None)
+        self._rebuild()
+
+    def contains(self, userName: str) -> bool:
+        return userName in self.leads
+
+    def list(self) -> List[dict]:
+        return self.listing
+
+    async def _watch(self) -> None:
+        collection = User.get_motor_collection()
+        # Logins rewrite password hashes; only changes that can affect the lead list trigger a reload
+        pipeline = [{"$match": {"$or": [
+            {"operationType": {"$in": ["insert", "replace", "delete"]}},
+            {"operationType": "update", "$or": [
+                {"updateDescription.updatedFields.role": {"$exists": True}},
+                {"updateDescription.updatedFields.name": {"$exists": True}},
+            ]},
+        ]}}]
+        async with collection.watch(pipeline) as stream:
+            async for _ in stream:
+                await self.load()
+
+    async def _refresh(self, interval: int) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.load()
+            except Exception:
+                logger.exception("Lead directory refresh failed")
+
+    async def _run(self) -> None:
+        if settings.LEAD_DIRECTORY_CHANGE_STREAM:
+            try:
+                await self._watch()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                # Change streams need a replica set; fall back to polling
+                logger.exception("Lead directory change stream stopped, falling back to periodic refresh")
+        if settings.LEAD_DIRECTORY_REFRESH_SECONDS > 0:
+            await self._refresh(settings.LEAD_DIRECTORY_REFRESH_SECONDS)
+
+    async def start(self) -> None:
+        await self.load()
+        if self.task is None and (settings.LEAD_DIRECTORY_CHANGE_STREAM or settings.LEAD_DIRECTORY_REFRESH_SECONDS > 0):
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+leadDirectory = LeadDirectory()
@@ -0,0 +1,174 @@
+import asyncio
+import logging
+import sys
+import threading
+import time
+import traceback
+from collections import deque
+from typing import Dict, Optional
+
+from app.config import settings
+from app.utils.metrics import eventLoopLag, eventLoopBlocks, routeTemplate
+
+logger = logging.getLogger(__name__)
+
+# A tick this late means the process was suspended (a frozen Lambda container), not blocked
+SUSPENDED_SECONDS = 30.0
+NO_REQUEST = "(no request)"
+UNKNOWN_REQUEST = "(unknown)"
+
+
+class EventLoopBlocked(RuntimeError):
+    """Raised at the end of a request that blocked the loop when LOOP_MONITOR_FAIL_ON_BLOCK is on."""
+
+    def __init__(self, report: dict) -> None:
+        super().__init__(
+            f"{report['route']} blocked the event loop for at least {report['blockedMs']} ms:\n" + "".join(report["stack"])
+        )
+        self.report = report
+
+
+def currentTask(loop: asyncio.AbstractEventLoop) -> Optional[asyncio.Task]:
+    """The task running on `loop`, read from another thread (CPython keeps a per-loop map)."""
+    currentTasks = getattr(asyncio.tasks, "_current_tasks", None)
+    return currentTasks.get(loop) if currentTasks is not None else None
+
+
+class LoopMonitor:
+    """
+    A task on the loop wakes every LOOP_MONITOR_INTERVAL_MS and records how
+    late it was, which is the scheduling delay every other coroutine sees. A
+    watchdog thread checks that heartbeat. When the loop has not ticked for
+    LOOP_MONITOR_BLOCK_THRESHOLD_MS past its interval, the watchdog grabs the
+    loop thread's stack while it is still blocked and attributes it to the
+    request whose task is running. It reports once per stall.
+    """
+
+    def __init__(self) -> None:
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+        self.threadId: Optional[int] = None
+        self.task: Optional[asyncio.Task] = None
+        self.watchdog: Optional[threading.Thread] = None
+        self.stopped = threading.Event()
+        self.heartbeat = 0.0
+        self.interval = settings.LOOP_MONITOR_INTERVAL_MS / 1000
+        self.threshold = settings.LOOP_MONITOR_BLOCK_THRESHOLD_MS / 1000
+        # task -> ASGI scope of the request it serves, for attribution. Both maps are
+        # changed on the loop and read by the watchdog thread, so they are guarded by `lock`
+        self.requests: Dict[asyncio.Task, dict] = {}
+        self.blockedRequests: Dict[asyncio.Task, dict] = {}
+        self.lock = threading.Lock()
+        self.reports = deque(maxlen=settings.LOOP_MONITOR_MAX_REPORTS)
+
+    @property
+    def running(self) -> bool:
+        return self.task is not None
+
+    async def start(self) -> None:
+        if not settings.LOOP_MONITOR_ENABLED or self.task is not None:
+            return
+        self.loop = asyncio.get_running_loop()
+        self.threadId = threading.get_ident()
+        self.heartbeat = time.monotonic()
+        self.stopped = threading.Event()
+        self.task = asyncio.create_task(self._measure())
+        self.watchdog = threading.Thread(target=self._watch, args=(self.stopped,), name="loop-monitor", daemon=True)
+        self.watchdog.start()
+
+    async def stop(self) -> None:
+        self.stopped.set()
+        self.watchdog = None
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+    async def _measure(self) -> None:
+        while True:
+            started = time.monotonic()
+            await asyncio.sleep(self.interval)
+            self.heartbeat = now = time.monotonic()
+            lag = now - started - self.interval
+            if lag < SUSPENDED_SECONDS:
+                eventLoopLag.observe(max(lag, 0.0))
+
+    def _watch(self, stopped: threading.Event) -> None:
+        checkEvery = max(self.threshold / 2, 0.005)
+        lastCheck = time.monotonic()
+        reportedHeartbeat = None
+        while not stopped.wait(checkEvery):
+            now = time.monotonic()
+            suspended = now - lastCheck > max(checkEvery * 4, 1.0)
+            lastCheck = now
+            heartbeat = self.heartbeat
+            if suspended or heartbeat == reportedHeartbeat:
+                continue
+            blockedFor = now - heartbeat - self.interval
+            if blockedFor > self.threshold:
+                reportedHeartbeat = heartbeat
+                try:
+                    self._capture(blockedFor)
+                except Exception:
+                    # Keep watching; a dead watchdog would silently stop all reports
+                    logger.exception("Event loop monitor failed to capture a blocking report")
+
+    def _capture(self, blockedFor: float) -> None:
+        frame = sys._current_frames().get(self.threadId)
+        stack = traceback.format_list(traceback.extract_stack(frame)[-settings.LOOP_MONITOR_STACK_DEPTH:]) if frame is not None else []
+        del frame
+        task = currentTask(self.loop)
+        with self.lock:
+            requests = dict(self.requests)
+        scope = requests.get(task)
+        if scope is None and len(requests) == 1:
+            task, scope = next(iter(requests.items()))
+        if scope is not None:
+            route = f"{scope['method']} {routeTemplate(scope)}"
+        else:
+            route = UNKNOWN_REQUEST if requests else NO_REQUEST
+        report = {
+            "detectedAt": time.time(),
+            "route": route,
+            "blockedMs": round(blockedFor * 1000),
+            "stack": stack,
+        }
+        self.reports.append(report)
+        eventLoopBlocks.inc(route)
+        logger.warning("Event loop blocked for at least %d ms in %s\n%s", report["blockedMs"], route, "".join(stack))
+        if settings.LOOP_MONITOR_FAIL_ON_BLOCK and scope is not None:
+            with self.lock:
+                self.blockedRequests[task] = report
+
+
+loopMonitor = LoopMonitor()
+
+
+class LoopMonitorMiddleware:
+    """
+    Records which task serves which request so blocking can be attributed to
+    a route. With LOOP_MONITOR_FAIL_ON_BLOCK (dev and tests) the request that
+    blocked raises EventLoopBlocked once it finishes, which fails the test
+    that made it.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not loopMonitor.running:
+            await self.app(scope, receive, send)
+            return
+        task = asyncio.current_task()
+        with loopMonitor.lock:
+            loopMonitor.requests[task] = scope
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            with loopMonitor.lock:
+                loopMonitor.requests.pop(task, None)
+                report = loopMonitor.blockedRequests.pop(task, None)
+        if report is not None:
+            raise EventLoopBlocked(report)
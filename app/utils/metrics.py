@@ -0,0 +1,370 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+Every series is created on first use and then updated in place. Histograms
+preallocate their bucket counters, and each metric caps its number of label
+sets at METRICS_MAX_SERIES. Anything beyond the cap is folded into a single
+"other" series, so an unexpected label value cannot grow memory or slow
+down the scrape.
+"""
+import abc
+import bisect
+import math
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Dict, List, Sequence, Tuple
+
+from pymongo import monitoring
+
+from app.config import settings
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+OTHER = "other"
+UNMATCHED_ROUTE = "unmatched"
+
+
+def escapeLabel(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def formatLabels(names: Sequence[str], values: Sequence[str], extra: str = "") -> str:
+    pairs = [f'{name}="{escapeLabel(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def formatValue(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if value != value:
+        return "NaN"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(abc.ABC):
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, labelNames: Sequence[str] = ()) -> None:
+        self.name = name
+        self.documentation = documentation
+        self.labelNames = tuple(labelNames)
+        self.maxSeries = settings.METRICS_MAX_SERIES
+        self.series: Dict[Tuple[str, ...], object] = {}
+        self.lock = threading.Lock()
+
+    @abc.abstractmethod
+    def newSeries(self):
+        """A fresh series for one label set."""
+
+    def labels(self, *values: str):
+        series = self.series.get(values)
+        if series is None:
+            with self.lock:
+                series = self.series.get(values)
+                if series is None:
+                    if len(self.series) >= self.maxSeries:
+                        values = (OTHER,) * len(self.labelNames)
+                        series = self.series.get(values)
+                    if series is None:
+                        series = self.newSeries()
+                        self.series[values] = series
+        return series
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for values, series in list(self.series.items()):
+            lines.extend(self.renderSeries(values, series))
+        return lines
+
+    def renderSeries(self, values, series) -> List[str]:
+        return [f"{self.name}{formatLabels(self.labelNames, values)} {formatValue(series[0])}"]
+
+
+class Counter(Metric):
+    """
+    Series are one-element lists updated under the metric's lock, since
+    `[0] += amount` is not atomic and counters are also bumped from Motor's
+    worker threads and the loop monitor's watchdog thread.
+    """
+    kind = "counter"
+
+    def newSeries(self):
+        return [0]
+
+    def inc(self, *values: str, amount: float = 1) -> None:
+        series = self.labels(*values)
+        with self.lock:
+            series[0] += amount
+
+
+class Gauge(Counter):
+    kind = "gauge"
+
+    def dec(self, *values: str, amount: float = 1) -> None:
+        self.inc(*values, amount=-amount)
+
+
+class HistogramSeries:
+    __slots__ = ("counts", "sum", "lock")
+
+    def __init__(self, size: int) -> None:
+        self.counts = [0] * size
+        self.sum = 0.0
+        self.lock = threading.Lock()
+
+
+class Histogram(Metric):
+    """
+    Non-cumulative bucket counts in a preallocated list, turned cumulative
+    only when scraped. Observing is a bisect plus two adds under an
+    uncontended lock (Motor's listeners run on its worker threads).
+    """
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelNames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> None:
+        super().__init__(name, documentation, labelNames)
+        self.buckets = tuple(sorted(buckets))
+
+    def newSeries(self):
+        return HistogramSeries(len(self.buckets) + 1)
+
+    def observe(self, value: float, *values: str) -> None:
+        series = self.labels(*values)
+        index = bisect.bisect_left(self.buckets, value)
+        with series.lock:
+            series.counts[index] += 1
+            series.sum += value
+
+    def renderSeries(self, values, series) -> List[str]:
+        with series.lock:
+            counts = list(series.counts)
+            total = series.sum
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (math.inf,), counts):
+            cumulative += count
+            bucketLabel = f'le="{formatValue(bound)}"'
+            lines.append(f"{self.name}_bucket{formatLabels(self.labelNames, values, bucketLabel)} {cumulative}")
+        labels = formatLabels(self.labelNames, values)
+        lines.append(f"{self.name}_sum{labels} {formatValue(total)}")
+        lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+class SummarySeries:
+    __slots__ = ("window", "count", "sum")
+
+    def __init__(self, size: int) -> None:
+        self.window = deque(maxlen=size)
+        self.count = 0
+        self.sum = 0.0
+
+
+class Summary(Metric):
+    """
+    Quantiles over the last `windowSize` observations, computed only when
+    scraped. _count and _sum are cumulative, as Prometheus expects.
+    """
+    kind = "summary"
+
+    def __init__(self, name: str, documentation: str, labelNames: Sequence[str] = (), quantiles: Sequence[float] = (0.5, 0.9, 0.99), windowSize: int = 1024) -> None:
+        super().__init__(name, documentation, labelNames)
+        self.quantiles = tuple(quantiles)
+        self.windowSize = windowSize
+
+    def newSeries(self):
+        return SummarySeries(self.windowSize)
+
+    def observe(self, value: float, *values: str) -> None:
+        series = self.labels(*values)
+        series.window.append(value)
+        series.count += 1
+        series.sum += value
+
+    def renderSeries(self, values, series) -> List[str]:
+        window = sorted(series.window)
+        lines = []
+        for quantile in self.quantiles:
+            value = window[min(len(window) - 1, int(quantile * len(window)))] if window else math.nan
+            quantileLabel = f'quantile="{quantile}"'
+            lines.append(f"{self.name}{formatLabels(self.labelNames, values, quantileLabel)} {formatValue(value)}")
+        labels = formatLabels(self.labelNames, values)
+        lines.append(f"{self.name}_sum{labels} {formatValue(series.sum)}")
+        lines.append(f"{self.name}_count{labels} {series.count}")
+        return lines
+
+
+class Registry:
+    def __init__(self) -> None:
+        self.metrics: List[Metric] = []
+
+    def register(self, metric):
+        self.metrics.append(metric)
+        return metric
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+httpRequests = registry.register(Counter(
+    "http_requests_total", "HTTP requests by route template, method and status.", ("route", "method", "status")
+))
+httpLatency = registry.register(Histogram(
+    "http_request_duration_seconds", "HTTP request latency by route template, method and status.", ("route", "method", "status")
+))
+httpInFlight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP requests currently being served, by method.", ("method",)
+))
+mongoCommandLatency = registry.register(Histogram(
+    "mongodb_command_duration_seconds", "MongoDB command latency by collection, command and outcome.", ("collection", "command", "outcome")
+))
+mongoCheckoutWait = registry.register(Histogram(
+    "mongodb_pool_checkout_wait_seconds", "Time spent waiting to check a connection out of the pool.", ("outcome",)
+))
+mongoPoolCheckedOut = registry.register(Gauge(
+    "mongodb_pool_connections_checked_out", "Connections currently checked out of the pool."
+))
+s3Latency = registry.register(Histogram(
+    "s3_request_duration_seconds", "S3 call latency by operation and outcome.", ("operation", "outcome")
+))
+eventLoopLag = registry.register(Summary(
+    "event_loop_lag_seconds", "Event-loop scheduling delay over recent samples (quantile 1 is the window maximum).",
+    quantiles=(0.5, 0.9, 0.99, 1.0)
+))
+eventLoopBlocks = registry.register(Counter(
+    "event_loop_blocked_total", "Callbacks that blocked the event loop past the threshold, by route.", ("route",)
+))
+
+
+@contextmanager
+def timeDependency(histogram: Histogram, operation: str):
+    started = time.perf_counter()
+    outcome = "error"
+    try:
+        yield
+        outcome = "ok"
+    finally:
+        histogram.observe(time.perf_counter() - started, operation, outcome)
+
+
+def routeTemplate(scope) -> str:
+    route = scope.get("route")
+    if route is None:
+        return UNMATCHED_ROUTE
+    # FastAPI releases that keep included routers nested record the prefixed path here
+    context = scope.get("fastapi", {}).get("effective_route_context")
+    return getattr(context, "path", None) or route.path
+
+
+class MetricsMiddleware:
+    """
+    Outermost pure ASGI middleware. The route label is the matched route's
+    template (FastAPI stores the route in the shared scope while routing), so
+    IDs in paths never become label values; requests that match no route
+    are counted as "unmatched".
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        statusCode = [500]
+
+        async def sendWithStatus(message) -> None:
+            if message["type"] == "http.response.start":
+                statusCode[0] = message["status"]
+            await send(message)
+
+        httpInFlight.inc(method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, sendWithStatus)
+        finally:
+            elapsed = time.perf_counter() - started
+            httpInFlight.dec(method)
+            labels = (routeTemplate(scope), method, str(statusCode[0]))
+            httpRequests.inc(*labels)
+            httpLatency.observe(elapsed, *labels)
+
+
+class CommandMetrics(monitoring.CommandListener):
+    """Per collection/command latency. Commands without a collection (ping, buildInfo) use the database name."""
+
+    def __init__(self) -> None:
+        self.collections: Dict[Tuple[int, int], str] = {}
+
+    def started(self, event) -> None:
+        target = event.command.get(event.command_name)
+        self.collections[(event.request_id, event.operation_id or 0)] = target if isinstance(target, str) else event.database_name
+
+    def finish(self, event, outcome: str) -> None:
+        collection = self.collections.pop((event.request_id, event.operation_id or 0), event.database_name)
+        mongoCommandLatency.observe(event.duration_micros / 1e6, collection, event.command_name, outcome)
+
+    def succeeded(self, event) -> None:
+        self.finish(event, "ok")
+
+    def failed(self, event) -> None:
+        self.finish(event, "error")
+
+
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Checkout wait comes from the event's duration (PyMongo 4.7+); older drivers only report the gauge."""
+
+    def connection_check_out_started(self, event) -> None:
+        pass
+
+    def connection_checked_out(self, event) -> None:
+        mongoPoolCheckedOut.inc()
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            mongoCheckoutWait.observe(duration, "ok")
+
+    def connection_check_out_failed(self, event) -> None:
+        duration = getattr(event, "duration", None)
+        if duration is not None:
+            mongoCheckoutWait.observe(duration, "error")
+
+    def connection_checked_in(self, event) -> None:
+        mongoPoolCheckedOut.dec()
+
+    def pool_created(self, event) -> None:
+        pass
+
+    def pool_ready(self, event) -> None:
+        pass
+
+    def pool_cleared(self, event) -> None:
+        pass
+
+    def pool_closed(self, event) -> None:
+        pass
+
+    def connection_created(self, event) -> None:
+        pass
+
+    def connection_ready(self, event) -> None:
+        pass
+
+    def connection_closed(self, event) -> None:
+        pass
+
+
+def mongoEventListeners() -> list:
+    if not settings.METRICS_ENABLED:
+        return []
+    return [CommandMetrics(), PoolMetrics()]
+
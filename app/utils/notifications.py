@@ -0,0 +1,241 @@
+import asyncio
+import json
+import logging
+from collections import OrderedDict, deque
+from typing import Optional, Set, Tuple
+from uuid import uuid4
+
+from fastapi.encoders import jsonable_encoder
+
+from app.config import settings
+from app.core.models.Darshan import Darshan
+from app.core.schemas.Darshan import DarshanStatus
+
+logger = logging.getLogger(__name__)
+
+CREATED = "created"
+TRANSITION = "transition"
+DELETED = "deleted"
+RESET = "reset"
+
+DECIDED_STATUSES = (DarshanStatus.APPROVED.value, DarshanStatus.REJECTED.value)
+
+
+def serializeDarshan(darshan) -> dict:
+    """JSON-ready darshan request from a model instance or a raw Mongo document."""
+    document = dict(darshan) if isinstance(darshan, dict) else darshan.dict()
+    if "_id" in document:
+        document["id"] = document.pop("_id")
+    document.pop("lastActionId", None)
+    return jsonable_encoder(document)
+
+
+class DarshanEvent:
+    __slots__ = ("id", "sequence", "type", "requestId", "status", "previousStatus", "leadId", "request")
+
+    def __init__(self, sequence, epoch, type, requestId, status=None, previousStatus=None, leadId=None, request=None) -> None:
+        self.sequence = sequence
+        self.id = f"{epoch}-{sequence}"
+        self.type = type
+        self.requestId = requestId
+        self.status = status
+        self.previousStatus = previousStatus
+        self.leadId = leadId
+        self.request = request
+
+    def visibleTo(self, role: str, userId: str) -> bool:
+        """Deletions carry the request's last leadId and status, so they follow the same rules."""
+        if role == "admin":
+            return True
+        if role == "lead":
+            return self.leadId is not None and self.leadId == userId
+        if role == "pa":
+            if DarshanStatus.PENDING_PA.value in (self.status, self.previousStatus):
+                return True
+            # Change streams don't report the previous status: any decision may leave the PA queue
+            return self.type == TRANSITION and self.previousStatus is None and self.status in DECIDED_STATUSES
+        return False
+
+    def encode(self) -> str:
+        data = {
+            "type": self.type,
+            "id": self.requestId,
+            "status": self.status,
+            "previousStatus": self.previousStatus,
+            "request": self.request,
+        }
+        return f"id: {self.id}\nevent: {self.type}\ndata: {json.dumps(data)}\n\n"
+
+
+class Subscription:
+    __slots__ = ("role", "userId", "queue", "closed")
+
+    def __init__(self, role: str, userId: str, size: int) -> None:
+        self.role = role
+        self.userId = userId
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=size)
+        self.closed = False
+
+
+class DarshanEventBus:
+    """
+    In-process pub/sub of darshan queue changes. Events get IDs of the form
+    "<epoch>-<sequence>", where the epoch is unique per process, and the last
+    DARSHAN_STREAM_BUFFER_SIZE events are kept so a reconnecting client can
+    resume from its Last-Event-ID. A subscriber whose queue overflows is
+    dropped and resumes the same way when it reconnects.
+
+    With DARSHAN_STREAM_SOURCE=changestream every worker feeds its bus from a
+    MongoDB change stream on darshan_requests instead of from its own writes,
+    so clients see changes made by any worker.
+    """
+
+    def __init__(self, bufferSize: int, queueSize: int, source: str) -> None:
+        self.epoch = uuid4().hex[:8]
+        self.sequence = 0
+        self.buffer: deque = deque(maxlen=bufferSize)
+        self.queueSize = queueSize
+        self.source = source
+        self.subscriptions: Set[Subscription] = set()
+        self.task: Optional[asyncio.Task] = None
+        # requestId -> (leadId, status) of recently seen requests, since a change-stream delete only has the _id
+        self.recentRequests: "OrderedDict[str, Tuple[Optional[str], Optional[str]]]" = OrderedDict()
+        self.recentRequestsSize = bufferSize * 10
+
+    def _publish(self, type, requestId, status=None, previousStatus=None, leadId=None, request=None) -> None:
+        self.sequence += 1
+        event = DarshanEvent(self.sequence, self.epoch, type, requestId, status, previousStatus, leadId, request)
+        self.buffer.append(event)
+        if type == DELETED:
+            self.recentRequests.pop(requestId, None)
+        else:
+            self.recentRequests[requestId] = (leadId, status)
+            self.recentRequests.move_to_end(requestId)
+            while len(self.recentRequests) > self.recentRequestsSize:
+                self.recentRequests.popitem(last=False)
+        for subscription in list(self.subscriptions):
+            if not event.visibleTo(subscription.role, subscription.userId):
+                continue
+            try:
+                subscription.queue.put_nowait(event)
+            except asyncio.QueueFull:
+                subscription.closed = True
+                self.subscriptions.discard(subscription)
+
+    def publish(self, type, document: dict, previousStatus: Optional[str] = None) -> None:
+        """Publish a change made by this process (ignored when the change stream is the source)."""
+        if self.source != "local":
+            return
+        request = serializeDarshan(document)
+        self._publish(type, request["id"], request.get("status"), previousStatus, request.get("leadId"), request)
+
+    def publishDeleted(self, darshan) -> None:
+        if self.source == "local":
+            request = serializeDarshan(darshan)
+            self._publish(DELETED, request["id"], request.get("status"), leadId=request.get("leadId"))
+
+    def _publishWatchedDelete(self, requestId: str) -> None:
+        # Requests this worker never saw reach admins only
+        leadId, status = self.recentRequests.get(requestId, (None, None))
+        self._publish(DELETED, requestId, status, leadId=leadId)
+
+    def subscribe(self, role: str, userId: str) -> Subscription:
+        subscription = Subscription(role, userId, self.queueSize)
+        self.subscriptions.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self.subscriptions.discard(subscription)
+
+    def replay(self, lastEventId: str, subscription: Subscription):
+        """
+        Buffered events after `lastEventId` visible to the subscriber, or None
+        when the ID is from another process or has already left the buffer.
+        """
+        epoch, _, sequence = lastEventId.partition("-")
+        if epoch != self.epoch or not sequence.isdigit():
+            return None
+        sequence = int(sequence)
+        if self.buffer and sequence < self.buffer[0].sequence - 1:
+            return None
+        return [
+            event for event in self.buffer
+            if event.sequence > sequence and event.visibleTo(subscription.role, subscription.userId)
+        ]
+
+    async def _watch(self) -> None:
+        collection = Darshan.get_motor_collection()
+        async with collection.watch(full_document="updateLookup") as stream:
+            async for change in stream:
+                operation = change["operationType"]
+                if operation == "delete":
+                    self._publishWatchedDelete(change["documentKey"]["_id"])
+                    continue
+                document = change.get("fullDocument")
+                if document is None:
+                    continue
+                if operation == "update" and "status" not in change.get("updateDescription", {}).get("updatedFields", {}):
+                    continue
+                request = serializeDarshan(document)
+                self._publish(
+                    CREATED if operation == "insert" else TRANSITION,
+                    request["id"], request.get("status"), None, request.get("leadId"), request
+                )
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._watch()
+            except asyncio.CancelledError:
+                raise
+            except Exception:
+                logger.exception("Darshan change stream failed, restarting")
+                await asyncio.sleep(5)
+
+    async def start(self) -> None:
+        if self.source == "changestream" and self.task is None:
+            self.task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self.task is not None:
+            self.task.cancel()
+            try:
+                await self.task
+            except asyncio.CancelledError:
+                pass
+            self.task = None
+
+
+darshanEvents = DarshanEventBus(
+    bufferSize=settings.DARSHAN_STREAM_BUFFER_SIZE,
+    queueSize=settings.DARSHAN_STREAM_QUEUE_SIZE,
+    source=settings.DARSHAN_STREAM_SOURCE,
+)
+
+
+async def streamDarshanEvents(role: str, userId: str, lastEventId: Optional[str]):
+    """Server-Sent Events body for one client, with heartbeats and resume."""
+    subscription = darshanEvents.subscribe(role, userId)
+    try:
+        yield f"retry: {settings.DARSHAN_STREAM_RETRY_MILLISECONDS}\n\n"
+        lastSequence = 0
+        if lastEventId:
+            replayed = darshanEvents.replay(lastEventId, subscription)
+            if replayed is None:
+                # Cannot resume here: tell the client to reload its queue
+                yield f"id: {darshanEvents.epoch}-{darshanEvents.sequence}\nevent: {RESET}\ndata: {{}}\n\n"
+                lastSequence = darshanEvents.sequence
+            else:
+                for event in replayed:
+                    lastSequence = event.sequence
+                    yield event.encode()
+        while not subscription.closed:
+            try:
+                event = await asyncio.wait_for(subscription.queue.get(), settings.DARSHAN_STREAM_HEARTBEAT_SECONDS)
+            except asyncio.TimeoutError:
+                yield ": keepalive\n\n"
+                continue
+            if event.sequence > lastSequence:
+                yield event.encode()
+    finally:
+        darshanEvents.unsubscribe(subscription)
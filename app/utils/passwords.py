@@ -0,0 +1,95 @@
+import asyncio
+import hmac
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+import bcrypt
+
+from app.config import settings
+
+BCRYPT_PREFIXES = ("$2a$", "$2b$", "$2y$")
+BCRYPT_MAX_BYTES = 72
+
+
+class PasswordHasherBusy(Exception):
+    """Raised when more hashing work is pending than PASSWORD_HASH_MAX_PENDING allows."""
+
+
+def isPasswordHash(value: str) -> bool:
+    return value.startswith(BCRYPT_PREFIXES)
+
+
+def _secret(password: str) -> bytes:
+    # bcrypt only looks at the first 72 bytes; newer bcrypt releases raise instead of truncating
+    return password.encode("utf-8")[:BCRYPT_MAX_BYTES]
+
+
+class PasswordHasher:
+    """
+    bcrypt hashing and verification on a bounded thread pool so the ~100 ms of
+    CPU per call never runs on the event loop. bcrypt releases the GIL, so the
+    workers hash in parallel. Once `maxPending` calls are queued or running,
+    new calls fail fast with PasswordHasherBusy instead of queueing forever.
+    """
+
+    def __init__(self, rounds: int, workers: int, maxPending: int) -> None:
+        self.rounds = rounds
+        self.workers = workers
+        self.maxPending = maxPending
+        self.pending = 0
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+    def _hash(self, password: str) -> str:
+        return bcrypt.hashpw(_secret(password), bcrypt.gensalt(self.rounds)).decode()
+
+    def _verify(self, password: str, storedPassword: str) -> Tuple[bool, Optional[str]]:
+        if not isPasswordHash(storedPassword):
+            # Legacy plaintext record: compare in constant time, migrate on success
+            if hmac.compare_digest(password.encode("utf-8"), storedPassword.encode("utf-8")):
+                return True, self._hash(password)
+            return False, None
+        if not bcrypt.checkpw(_secret(password), storedPassword.encode()):
+            return False, None
+        if self.needsRehash(storedPassword):
+            return True, self._hash(password)
+        return True, None
+
+    def needsRehash(self, storedPassword: str) -> bool:
+        try:
+            return int(storedPassword[4:6]) != self.rounds
+        except ValueError:
+            return True
+
+    async def _run(self, func, *args):
+        if self.pending >= self.maxPending:
+            raise PasswordHasherBusy()
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="password-hasher")
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+        finally:
+            self.pending -= 1
+
+    async def hash(self, password: str) -> str:
+        return await self._run(self._hash, password)
+
+    async def verify(self, password: str, storedPassword: str) -> Tuple[bool, Optional[str]]:
+        """
+        Returns (valid, newHash). newHash is set when the stored value is
+        plaintext or was hashed with a different cost factor and should be
+        written back.
+        """
+        return await self._run(self._verify, password, storedPassword)
+
+    def shutdown(self) -> None:
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.executor = None
+
+
+passwordHasher = PasswordHasher(
+    rounds=settings.PASSWORD_HASH_ROUNDS,
+    workers=settings.PASSWORD_HASH_WORKERS,
+    maxPending=settings.PASSWORD_HASH_MAX_PENDING,
+)
@@ -0,0 +1,268 @@
+"""
+On-demand profiling of single requests, plus an optional background sampler.
+
+An admin adds `X-Profile: pstats` or `X-Profile: speedscope` (or the query
+parameter `profile=...`) to any request. The response body is then replaced
+by the profile as a download, the original status moves to the
+X-Profiled-Status header, and a copy is written to PROFILING_OUTPUT_DIR when
+that is set.
+
+- pstats: a deterministic cProfile run, for `python -m pstats` or snakeviz.
+- speedscope: event-loop thread stacks sampled every
+  PROFILING_SAMPLE_INTERVAL_MS, for https://www.speedscope.app.
+
+Both record everything running on the event loop during the request, so
+profile on a quiet instance for a clean picture.
+"""
+import asyncio
+import cProfile
+import json
+import marshal
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs
+
+from app.config import settings
+from app.utils.constants import AuthConstants
+from app.utils.authentication import getAuthorizationHeader, userAuthentication
+
+PROFILE_HEADER = b"x-profile"
+PROFILE_QUERY = "profile"
+PSTATS = "pstats"
+SPEEDSCOPE = "speedscope"
+PROFILE_FORMATS = (PSTATS, SPEEDSCOPE)
+
+Frame = Tuple[str, str, int]
+Stack = Tuple[Frame, ...]
+TRUNCATED_STACK: Stack = (("(other stacks)", "", 0),)
+
+
+def captureStack(frame, maxDepth: int = 128) -> Stack:
+    """Root-to-leaf (function, file, first line) tuples, so samples aggregate per function."""
+    stack = []
+    while frame is not None and len(stack) < maxDepth:
+        code = frame.f_code
+        stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+        frame = frame.f_back
+    stack.reverse()
+    return tuple(stack)
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack from a helper thread. Stacks are
+    counted in a Counter capped at `maxStacks` distinct entries, and overflow
+    lands in a single "(other stacks)" bucket. The background sampler is read
+    while it runs, so readers work on a snapshot taken under `lock`.
+    """
+
+    def __init__(self, threadId: int, intervalSeconds: float, maxStacks: int) -> None:
+        self.threadId = threadId
+        self.interval = intervalSeconds
+        self.maxStacks = maxStacks
+        self.counts: Counter = Counter()
+        self.samples = 0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.thread: Optional[threading.Thread] = None
+
+    def start(self) -> None:
+        self.thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+        self.thread.start()
+
+    def stop(self, wait: bool = True) -> None:
+        self.stopped.set()
+        if self.thread is not None:
+            if wait:
+                self.thread.join()
+            self.thread = None
+
+    def _run(self) -> None:
+        while not self.stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.threadId)
+            if frame is None:
+                continue
+            stack = captureStack(frame)
+            del frame
+            with self.lock:
+                if stack not in self.counts and len(self.counts) >= self.maxStacks:
+                    stack = TRUNCATED_STACK
+                self.counts[stack] += 1
+                self.samples += 1
+
+    def snapshot(self) -> Counter:
+        with self.lock:
+            return Counter(self.counts)
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed format, one `frame;frame;frame count` line per stack."""
+        lines = []
+        for stack, count in self.snapshot().most_common():
+            lines.append(";".join(f"{name} ({os.path.basename(path)}:{line})" for name, path, line in stack) + f" {count}")
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str) -> dict:
+        frames: List[dict] = []
+        frameIndex: Dict[Frame, int] = {}
+        samples, weights = [], []
+        for stack, count in self.snapshot().items():
+            indexes = []
+            for frame in stack:
+                index = frameIndex.get(frame)
+                if index is None:
+                    index = frameIndex[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                indexes.append(index)
+            samples.append(indexes)
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": settings.API_TITLE,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+
+def requestedFormat(scope) -> Optional[str]:
+    for name, value in scope.get(AuthConstants.HEADERS, ()):
+        if name == PROFILE_HEADER:
+            return value.decode("latin-1").strip().lower()
+    if scope.get("query_string"):
+        values = parse_qs(scope["query_string"].decode("latin-1")).get(PROFILE_QUERY)
+        if values:
+            return values[0].strip().lower()
+    return None
+
+
+def errorResponse(statusCode: int, detail: str):
+    return statusCode, [(b"content-type", b"application/json")], json.dumps({"detail": detail}).encode()
+
+
+class ProfilingMiddleware:
+    """
+    Pure ASGI middleware: only admins can trigger it, and other requests pay
+    one header scan. A single profile runs at a time,
+    because cProfile cannot be nested and overlapping samplers would count
+    each other's requests.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self.lock = asyncio.Lock()
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profileFormat = requestedFormat(scope)
+        if profileFormat is None:
+            await self.app(scope, receive, send)
+            return
+        # Public routes skip token checks, but profiling them still needs an admin token
+        _, user = userAuthentication(getAuthorizationHeader(scope))
+        if not user.is_authenticated or user.role != AuthConstants.ADMIN:
+            await self.app(scope, receive, send)
+            return
+
+        if profileFormat not in PROFILE_FORMATS:
+            statusCode, headers, body = errorResponse(400, f"Unknown profile format, use one of {', '.join(PROFILE_FORMATS)}")
+        elif self.lock.locked():
+            statusCode, headers, body = errorResponse(409, "Another request is being profiled, please retry")
+        else:
+            async with self.lock:
+                statusCode, headers, body = await self.profile(scope, receive, profileFormat)
+
+        await send({"type": "http.response.start", "status": statusCode, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
+
+    async def profile(self, scope, receive, profileFormat: str):
+        responseStatus = [500]
+
+        async def discard(message) -> None:
+            if message["type"] == "http.response.start":
+                responseStatus[0] = message["status"]
+
+        name = f"{scope['method']} {scope['path']}"
+        if profileFormat == PSTATS:
+            profiler = cProfile.Profile()
+            profiler.enable()
+            try:
+                await self.app(scope, receive, discard)
+            finally:
+                profiler.disable()
+            profiler.create_stats()
+            body = marshal.dumps(profiler.stats)
+            extension, contentType = "prof", b"application/octet-stream"
+        else:
+            sampler = StackSampler(threading.get_ident(), settings.PROFILING_SAMPLE_INTERVAL_MS / 1000, settings.PROFILING_MAX_STACKS)
+            sampler.start()
+            try:
+                await self.app(scope, receive, discard)
+            finally:
+                sampler.stop()
+            body = json.dumps(sampler.speedscope(name)).encode()
+            extension, contentType = "speedscope.json", b"application/json"
+
+        filename = f"profile-{time.strftime('%Y%m%dT%H%M%S')}-{uuid.uuid4().hex[:8]}.{extension}"
+        if settings.PROFILING_OUTPUT_DIR:
+            os.makedirs(settings.PROFILING_OUTPUT_DIR, exist_ok=True)
+            with open(os.path.join(settings.PROFILING_OUTPUT_DIR, filename), "wb") as artifact:
+                artifact.write(body)
+        headers = [
+            (b"content-type", contentType),
+            (b"content-disposition", f'attachment; filename="{filename}"'.encode()),
+            (b"x-profiled-status", str(responseStatus[0]).encode()),
+        ]
+        return 200, headers, body
+
+
+class BackgroundSampler:
+    """
+    Always-on, low-rate (PROFILING_BACKGROUND_INTERVAL_MS) sampling of the
+    event-loop thread, aggregated into hot stacks since start or the last
+    reset. At the default 10 Hz, one stack walk every 100 ms is negligible
+    next to request work.
+    """
+
+    def __init__(self) -> None:
+        self.sampler: Optional[StackSampler] = None
+
+    @property
+    def running(self) -> bool:
+        return self.sampler is not None
+
+    def start(self) -> None:
+        if settings.PROFILING_BACKGROUND_SAMPLER and self.sampler is None:
+            self.reset()
+
+    def reset(self) -> None:
+        self.stop()
+        self.sampler = StackSampler(
+            threading.get_ident(),
+            settings.PROFILING_BACKGROUND_INTERVAL_MS / 1000,
+            settings.PROFILING_MAX_STACKS
+        )
+        self.sampler.start()
+
+    def stop(self) -> None:
+        if self.sampler is not None:
+            # Don't block the event loop for up to one interval waiting on the thread
+            self.sampler.stop(wait=False)
+            self.sampler = None
+
+
+backgroundSampler = BackgroundSampler()
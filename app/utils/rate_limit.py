@@ -0,0 +1,168 @@
+import asyncio
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from starlette.responses import JSONResponse
+
+from app.config import settings
+
+# (method, path) -> route group that gets a per-client token bucket
+routeGroups = {
+    ("POST", "/v1/auth/login"): "login",
+    ("POST", "/v1/darshan"): "darshan",
+}
+
+# Long-lived streams would hold a concurrency slot for their whole lifetime
+exemptPaths = {
+    "/v1/darshan/stream",
+}
+
+X_FORWARDED_FOR = b"x-forwarded-for"
+
+
+class TokenBucketLimiter:
+    """
+    Token buckets keyed by (client, group). Each bucket is a single
+    (tokens, timestamp) tuple in an LRU ordered dict capped at `maxKeys`, so a
+    flood of distinct clients evicts the least recently seen ones instead of
+    growing memory. An evicted bucket simply starts full again, which is the
+    state an idle client would have reached anyway.
+    """
+
+    def __init__(self, ratePerMinute: float, burst: int, maxKeys: int) -> None:
+        self.rate = ratePerMinute / 60.0
+        self.burst = float(burst)
+        self.maxKeys = maxKeys
+        self.buckets: "OrderedDict[Tuple[str, str], Tuple[float, float]]" = OrderedDict()
+
+    def acquire(self, key: Tuple[str, str], now: Optional[float] = None) -> float:
+        """Take one token. Returns 0 when allowed, else seconds until a token is available."""
+        now = time.monotonic() if now is None else now
+        bucket = self.buckets.pop(key, None)
+        if bucket is None:
+            tokens = self.burst
+        else:
+            tokens = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+        if tokens >= 1.0:
+            self.buckets[key] = (tokens - 1.0, now)
+            retryAfter = 0.0
+        else:
+            self.buckets[key] = (tokens, now)
+            retryAfter = (1.0 - tokens) / self.rate if self.rate > 0 else 60.0
+        while len(self.buckets) > self.maxKeys:
+            self.buckets.popitem(last=False)
+        return retryAfter
+
+
+class ConcurrencyLimiter:
+    """
+    Global admission control: at most `maxConcurrent` requests run, at most
+    `maxQueued` more wait up to `queueTimeout` seconds, the rest are shed.
+    """
+
+    def __init__(self, maxConcurrent: int, maxQueued: int, queueTimeout: float) -> None:
+        self.maxConcurrent = maxConcurrent
+        self.maxQueued = maxQueued
+        self.queueTimeout = queueTimeout
+        self.running = 0
+        self.queued = 0
+        self.semaphore: Optional[asyncio.Semaphore] = None
+
+    async def acquire(self) -> bool:
+        if self.semaphore is None:
+            self.semaphore = asyncio.Semaphore(self.maxConcurrent)
+        if self.semaphore.locked():
+            if self.queued >= self.maxQueued:
+                return False
+            self.queued += 1
+            try:
+                await asyncio.wait_for(self.semaphore.acquire(), self.queueTimeout)
+            except asyncio.TimeoutError:
+                return False
+            finally:
+                self.queued -= 1
+        else:
+            await self.semaphore.acquire()
+        self.running += 1
+        return True
+
+    def release(self) -> None:
+        self.running -= 1
+        self.semaphore.release()
+
+
+def getClientIp(scope) -> str:
+    """
+    The peer address, or behind proxies the X-Forwarded-For entry appended by
+    the outermost trusted proxy. Entries left of that are client-supplied and
+    could be varied per request to get a fresh bucket each time.
+    """
+    if settings.RATE_LIMIT_TRUST_FORWARDED_FOR:
+        entries = [
+            entry.strip()
+            for name, value in scope.get("headers", ())
+            if name == X_FORWARDED_FOR
+            for entry in value.decode("latin-1").split(",")
+        ]
+        hops = settings.RATE_LIMIT_TRUSTED_PROXY_HOPS
+        if hops > 0 and len(entries) >= hops and entries[-hops]:
+            return entries[-hops]
+    client = scope.get("client")
+    return client[0] if client else ""
+
+
+def limitedResponse(statusCode: int, detail: str, retryAfter: float) -> JSONResponse:
+    return JSONResponse(
+        {"detail": detail},
+        status_code=statusCode,
+        headers={"Retry-After": str(max(1, math.ceil(retryAfter)))}
+    )
+
+
+class RateLimitMiddleware:
+    """
+    Per-client token buckets for the public write routes in `routeGroups`,
+    followed by the global concurrency limiter. Authenticated requests skip
+    admission control so admin, lead and PA work keeps flowing during public
+    bursts. Must sit inside ApiAuthMiddleware so scope["user"] is set.
+    """
+
+    def __init__(self, app) -> None:
+        self.app = app
+        self.enabled = settings.RATE_LIMIT_ENABLED
+        self.limiters: Dict[str, TokenBucketLimiter] = {
+            "login": TokenBucketLimiter(settings.RATE_LIMIT_LOGIN_PER_MINUTE, settings.RATE_LIMIT_LOGIN_BURST, settings.RATE_LIMIT_MAX_CLIENTS),
+            "darshan": TokenBucketLimiter(settings.RATE_LIMIT_DARSHAN_PER_MINUTE, settings.RATE_LIMIT_DARSHAN_BURST, settings.RATE_LIMIT_MAX_CLIENTS),
+        }
+        self.concurrency = ConcurrencyLimiter(
+            settings.MAX_CONCURRENT_REQUESTS,
+            settings.MAX_QUEUED_REQUESTS,
+            settings.REQUEST_QUEUE_TIMEOUT_SECONDS,
+        )
+
+    async def __call__(self, scope, receive, send) -> None:
+        if not self.enabled or scope["type"] != "http" or scope["path"] in exemptPaths:
+            await self.app(scope, receive, send)
+            return
+
+        group = routeGroups.get((scope["method"], scope["path"]))
+        if group is not None:
+            retryAfter = self.limiters[group].acquire((getClientIp(scope), group))
+            if retryAfter:
+                await limitedResponse(429, "Too many requests, please retry later", retryAfter)(scope, receive, send)
+                return
+
+        user = scope.get("user")
+        if user is not None and user.is_authenticated:
+            await self.app(scope, receive, send)
+            return
+
+        if not await self.concurrency.acquire():
+            await limitedResponse(503, "Server is busy, please retry later", settings.REQUEST_RETRY_AFTER_SECONDS)(scope, receive, send)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.concurrency.release()
@@ -1,31 +1,66 @@
-import boto3
-from botocore.exceptions import ClientError
-from botocore.config import Config
-import magic
 from fastapi import UploadFile, HTTPException
-from typing import List
+from collections import OrderedDict
+from typing import Iterable, List
+import asyncio
+import logging
 import os
+import time
+import uuid
 
 from app.config import settings
+from app.utils.metrics import s3Latency, timeDependency
+from app.utils.jobs import enqueueJob, jobHandler, jobRunner
+from app.utils.singleflight import singleFlightCalls, LEADER, SHARED
+
+DELETE_FILES_JOB = "s3.delete_files"
+
+logger = logging.getLogger(__name__)
 
 class S3Client:
+    """
+    boto3 and python-magic take a large share of cold-start import time, so
+    both are imported and the boto3 client is built on first use instead of
+    at import.
+
+    Presigned URLs are reused for PRESIGNED_URL_REUSE_SECONDS. Signing is
+    synchronous, so there is never an in-flight call to join; a short reuse
+    window is the equivalent, and a list page hit by many clients at once
+    signs each key once. A reused URL still has at least S3_URL_EXPIRY minus
+    the window left to live.
+    """
+
     def __init__(self):
-        # Configure boto3 to use signature version 4
-        self.config = Config(
-            region_name=settings.AWS_REGION,
-            signature_version='s3v4'
-        )
-        
-        self.s3_client = boto3.client(
-            's3',
-            aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
-            aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
-            config=self.config
-        )
+        self._s3_client = None
         self.bucket_name = settings.S3_BUCKET_NAME
+        self._presigned_urls = OrderedDict()  # file key -> (url, signed at)
+
+    @property
+    def s3_client(self):
+        if self._s3_client is None:
+            import boto3
+            from botocore.config import Config
+
+            # Configure boto3 to use signature version 4
+            config = Config(
+                region_name=settings.AWS_REGION,
+                signature_version='s3v4'
+            )
+            self._s3_client = boto3.client(
+                's3',
+                aws_access_key_id=settings.AWS_ACCESS_KEY_ID,
+                aws_secret_access_key=settings.AWS_SECRET_ACCESS_KEY,
+                config=config
+            )
+        return self._s3_client
 
-    async def upload_file(self, file: UploadFile, folder_path: str) -> str:
-        """Upload a file to S3 bucket"""
+    async def upload_file(self, file: UploadFile, folder_path: str, unique: bool = False) -> str:
+        """
+        Upload a file to S3 bucket. With `unique` the key gets a random
+        prefix, so a replacement never overwrites an object that a document
+        still points to.
+        """
+        import magic
+        from botocore.exceptions import ClientError
         try:
             content_type = magic.from_buffer(await file.read(1024), mime=True)
             await file.seek(0)
@@ -39,42 +74,62 @@ class S3Client:
                 file_key = f"{folder_path}/{file.filename}"
             else:
                 file_key = f"{folder_path}/{file.filename}"
+            if unique:
+                file_key = f"{folder_path}/{uuid.uuid4().hex[:12]}-{file.filename}"
             
-            self.s3_client.upload_fileobj(
-                file.file,
-                self.bucket_name,
-                file_key,
-                ExtraArgs={
-                    'ContentType': content_type
-                }
-            )
+            with timeDependency(s3Latency, "upload"):
+                self.s3_client.upload_fileobj(
+                    file.file,
+                    self.bucket_name,
+                    file_key,
+                    ExtraArgs={
+                        'ContentType': content_type
+                    }
+                )
             return file_key
         except ClientError as e:
             raise HTTPException(status_code=500, detail=str(e))
 
     def get_presigned_url(self, file_key: str) -> str:
         """Generate a presigned URL for the file"""
+        from botocore.exceptions import ClientError
+        reuse_seconds = settings.PRESIGNED_URL_REUSE_SECONDS
+        if reuse_seconds > 0:
+            cached = self._presigned_urls.get(file_key)
+            if cached is not None and time.monotonic() - cached[1] < reuse_seconds:
+                self._presigned_urls.move_to_end(file_key)
+                singleFlightCalls.inc("s3_presign", SHARED)
+                return cached[0]
         try:
-            url = self.s3_client.generate_presigned_url(
-                ClientMethod='get_object',
-                Params={
-                    'Bucket': self.bucket_name,
-                    'Key': file_key
-                },
-                ExpiresIn=3600,  # URL expires in 1 hour
-                HttpMethod='GET'
-            )
-            return url
+            with timeDependency(s3Latency, "presign"):
+                url = self.s3_client.generate_presigned_url(
+                    ClientMethod='get_object',
+                    Params={
+                        'Bucket': self.bucket_name,
+                        'Key': file_key
+                    },
+                    ExpiresIn=settings.S3_URL_EXPIRY,
+                    HttpMethod='GET'
+                )
         except ClientError as e:
             raise HTTPException(status_code=500, detail=str(e))
+        if reuse_seconds > 0:
+            singleFlightCalls.inc("s3_presign", LEADER)
+            self._presigned_urls[file_key] = (url, time.monotonic())
+            self._presigned_urls.move_to_end(file_key)
+            while len(self._presigned_urls) > settings.PRESIGNED_URL_CACHE_SIZE:
+                self._presigned_urls.popitem(last=False)
+        return url
 
     def delete_file(self, file_key: str):
         """Delete a file from S3 bucket"""
+        from botocore.exceptions import ClientError
         try:
-            self.s3_client.delete_object(
-                Bucket=self.bucket_name,
-                Key=file_key
-            )
+            with timeDependency(s3Latency, "delete"):
+                self.s3_client.delete_object(
+                    Bucket=self.bucket_name,
+                    Key=file_key
+                )
         except ClientError as e:
             raise HTTPException(status_code=500, detail=str(e))
 
@@ -85,3 +140,29 @@ s3_client = S3Client()
 upload_file = s3_client.upload_file
 get_presigned_url = s3_client.get_presigned_url
 delete_file = s3_client.delete_file
+
+
+@jobHandler(DELETE_FILES_JOB)
+async def delete_files_job(payload: dict):
+    """Delete `payload["keys"]`; deleting a missing key succeeds, so a retry after a partial run is safe."""
+    for file_key in payload["keys"]:
+        await asyncio.to_thread(delete_file, file_key)
+
+
+async def delete_files_later(file_keys: Iterable[str]):
+    """
+    Queue S3 deletes as one background job instead of a blocking call per key.
+    When this process runs no job workers (on Lambda by default) the deletes
+    run inline, and only a failed delete is queued for a jobs-worker, so
+    nothing piles up in S3 when no worker is deployed.
+    """
+    keys = [key for key in file_keys if key]
+    if not keys:
+        return
+    if not jobRunner.running:
+        try:
+            await delete_files_job({"keys": keys})
+            return
+        except Exception:
+            logger.warning("Deleting %d S3 objects failed, queueing them for a jobs-worker", len(keys), exc_info=True)
+    await enqueueJob(DELETE_FILES_JOB, {"keys": keys})
@@ -0,0 +1,132 @@
+import asyncio
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+
+from pymongo.errors import DuplicateKeyError
+
+from app.config import settings
+from app.core.models.Darshan import Darshan
+from app.core.models.DarshanSlot import DarshanSlot
+from app.core.schemas.Darshan import DarshanStatus
+
+
+def slotStart(scheduledDateTime: datetime) -> datetime:
+    """Floor a schedule to the start of its slot, as naive UTC like the rest of the models."""
+    if scheduledDateTime.tzinfo is not None:
+        scheduledDateTime = scheduledDateTime.astimezone(timezone.utc).replace(tzinfo=None)
+    minutes = scheduledDateTime.hour * 60 + scheduledDateTime.minute
+    minutes -= minutes % settings.DARSHAN_SLOT_MINUTES
+    return scheduledDateTime.replace(hour=minutes // 60, minute=minutes % 60, second=0, microsecond=0)
+
+
+def slotKey(location: str, start: datetime) -> str:
+    # Escape the separator so a location containing "|" can't collide with another slot
+    location = location.replace("\\", "\\\\").replace("|", "\\|")
+    return f"{location}|{start.isoformat()}"
+
+
+def slotCapacity(location: str) -> int:
+    return settings.DARSHAN_LOCATION_CAPACITIES.get(location, settings.DARSHAN_DEFAULT_SLOT_CAPACITY)
+
+
+async def reserveSlot(location: str, scheduledDateTime: datetime, people: int) -> bool:
+    """
+    Atomically add `people` to the slot if it still has room. The conditional
+    upsert either increments an existing slot with enough free capacity,
+    creates the slot, or hits the unique _id of a full slot and fails.
+    """
+    capacity = slotCapacity(location)
+    if people > capacity:
+        return False
+    start = slotStart(scheduledDateTime)
+    try:
+        await DarshanSlot.get_motor_collection().update_one(
+            {"_id": slotKey(location, start), "reserved": {"$lte": capacity - people}},
+            {
+                "$inc": {"reserved": people},
+                "$set": {"updatedAt": datetime.utcnow()},
+                "$setOnInsert": {"location": location, "slotStart": start}
+            },
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+
+async def releaseSlot(location: str, scheduledDateTime: datetime, people: int) -> None:
+    await DarshanSlot.get_motor_collection().update_one(
+        {"_id": slotKey(location, slotStart(scheduledDateTime))},
+        {"$inc": {"reserved": -people}, "$set": {"updatedAt": datetime.utcnow()}}
+    )
+
+
+async def reserveSlots(reservations: Dict[str, Tuple[str, datetime, int]]) -> Dict[str, bool]:
+    """Reserve many (location, scheduledDateTime, people) entries concurrently."""
+    requestIds = list(reservations)
+    reserved = await asyncio.gather(*[reserveSlot(*reservations[requestId]) for requestId in requestIds])
+    return dict(zip(requestIds, reserved))
+
+
+async def releaseSlots(reservations: List[Tuple[str, datetime, int]]) -> None:
+    await asyncio.gather(*[releaseSlot(*reservation) for reservation in reservations])
+
+
+async def getAvailability(location: str, start: datetime, end: datetime) -> List[dict]:
+    """
+    Free capacity of every slot of `location` between `start` and `end` that
+    falls within the configured darshan hours. Only the slot documents in range
+    are read, through the (location, slotStart) index.
+    """
+    capacity = slotCapacity(location)
+    first = slotStart(start)
+    if end.tzinfo is not None:
+        end = end.astimezone(timezone.utc).replace(tzinfo=None)
+    reserved = {
+        slot.slotStart: slot.reserved
+        async for slot in DarshanSlot.find(
+            DarshanSlot.location == location,
+            DarshanSlot.slotStart >= first,
+            DarshanSlot.slotStart < end
+        )
+    }
+    step = timedelta(minutes=settings.DARSHAN_SLOT_MINUTES)
+    slots = []
+    current = first
+    while current < end:
+        if settings.DARSHAN_DAY_START_HOUR <= current.hour < settings.DARSHAN_DAY_END_HOUR:
+            taken = reserved.get(current, 0)
+            slots.append({
+                "slotStart": current,
+                "slotEnd": current + step,
+                "capacity": capacity,
+                "reserved": taken,
+                "free": max(0, capacity - taken)
+            })
+        current += step
+    return slots
+
+
+async def rebuildSlots() -> int:
+    """
+    Recompute every slot from the approved, scheduled darshan requests.
+    Returns the number of slots written.
+    """
+    totals: Dict[Tuple[str, datetime], int] = {}
+    cursor = Darshan.get_motor_collection().find(
+        {"status": DarshanStatus.APPROVED.value, "scheduledDateTime": {"$ne": None}, "scheduledLocation": {"$ne": None}},
+        {"scheduledDateTime": 1, "scheduledLocation": 1, "numberOfPeople": 1}
+    )
+    async for document in cursor:
+        key = (document["scheduledLocation"], slotStart(document["scheduledDateTime"]))
+        totals[key] = totals.get(key, 0) + document["numberOfPeople"]
+
+    collection = DarshanSlot.get_motor_collection()
+    await collection.delete_many({})
+    if totals:
+        now = datetime.utcnow()
+        await collection.insert_many([
+            {"_id": slotKey(location, start), "location": location, "slotStart": start, "reserved": people, "updatedAt": now}
+            for (location, start), people in totals.items()
+        ])
+    return len(totals)
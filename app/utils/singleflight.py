@@ -0,0 +1,52 @@
+"""
+Single-flight request coalescing. Concurrent calls with the same key share
+one in-flight computation: the first caller (the leader) starts it, and
+callers arriving before it finishes await the same result or exception
+instead of repeating the work. Nothing is cached once it completes.
+
+The computation runs in its own task and every caller awaits it through
+asyncio.shield, so a client disconnecting (cancelling its request) never
+cancels the work other callers are waiting on. Callers share the result
+object itself and must treat it as read-only.
+"""
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+from app.config import settings
+from app.utils.metrics import registry, Counter
+
+T = TypeVar("T")
+
+LEADER = "leader"
+SHARED = "shared"
+
+singleFlightCalls = registry.register(Counter(
+    "singleflight_calls_total",
+    "Coalesced calls by group and role: leader ran the work, shared reused an in-flight or recent result.",
+    ("group", "role")
+))
+
+
+class SingleFlight:
+    def __init__(self, group: str) -> None:
+        self.group = group
+        self.calls: Dict[Hashable, asyncio.Task] = {}
+
+    def finished(self, key: Hashable, task: asyncio.Task) -> None:
+        self.calls.pop(key, None)
+        if not task.cancelled():
+            # Mark the exception retrieved in case every caller was cancelled
+            task.exception()
+
+    async def do(self, key: Hashable, function: Callable[[], Awaitable[T]]) -> T:
+        if not settings.SINGLE_FLIGHT_ENABLED:
+            return await function()
+        task = self.calls.get(key)
+        if task is None:
+            singleFlightCalls.inc(self.group, LEADER)
+            task = asyncio.ensure_future(function())
+            self.calls[key] = task
+            task.add_done_callback(lambda done, key=key: self.finished(key, done))
+        else:
+            singleFlightCalls.inc(self.group, SHARED)
+        return await asyncio.shield(task)
@@ -0,0 +1,248 @@
+"""
+Slow-query log. A Motor command listener flags reads and writes slower than
+SLOW_QUERY_THRESHOLD_MS and groups them by normalized shape: the command,
+its collection, and the filter/sort/pipeline with every value replaced by
+its type. The first slow occurrence of a shape runs `explain` with
+executionStats once in the background. The plan summary (COLLSCAN, indexes
+used, docs examined per doc returned) is logged and kept with the shape's
+counters for GET /v1/profiling/slow-queries.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from pymongo import monitoring
+
+from app.config import settings
+from app.utils.metrics import registry, Counter
+
+logger = logging.getLogger(__name__)
+
+mongoSlowQueries = registry.register(Counter(
+    "mongodb_slow_queries_total", "MongoDB commands slower than SLOW_QUERY_THRESHOLD_MS by collection and command.", ("collection", "command")
+))
+
+# Commands worth explaining, and the fields explain accepts for each
+EXPLAINABLE = {
+    "find": ("filter", "sort", "projection", "hint", "skip", "limit", "collation"),
+    "aggregate": ("pipeline", "hint", "collation"),
+    "count": ("query", "hint", "skip", "limit", "collation"),
+    "distinct": ("key", "query", "collation"),
+    "findAndModify": ("query", "sort", "update", "remove", "new", "upsert", "fields", "arrayFilters", "hint", "collation"),
+    "update": ("updates",),
+    "delete": ("deletes",),
+}
+# Parts of a command that decide its plan, and so its shape
+SHAPE_FIELDS = {
+    "find": ("filter", "sort", "projection"),
+    "aggregate": ("pipeline",),
+    "count": ("query",),
+    "distinct": ("key", "query"),
+    "findAndModify": ("query", "sort"),
+    "update": ("updates",),
+    "delete": ("deletes",),
+}
+BATCH_FIELDS = {"updates": ("q", "multi"), "deletes": ("q", "limit")}
+
+
+def valueShape(value):
+    """Replace values by type names, keeping operators and field names."""
+    if isinstance(value, dict):
+        return {key: valueShape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        # $in: [...] and $and: [...] of any length share a shape
+        shapes = []
+        for item in value:
+            shape = valueShape(item)
+            if shape not in shapes:
+                shapes.append(shape)
+        return shapes
+    return type(value).__name__
+
+
+def commandShape(commandName: str, command: dict) -> dict:
+    shape = {}
+    for fieldName in SHAPE_FIELDS[commandName]:
+        if fieldName not in command:
+            continue
+        value = command[fieldName]
+        if fieldName in BATCH_FIELDS:
+            # Only the first statement of a write batch; bulk writes repeat one shape
+            value = {key: value[0].get(key) for key in BATCH_FIELDS[fieldName]} if value else {}
+        if fieldName in ("sort", "projection", "key"):
+            shape[fieldName] = value
+        else:
+            shape[fieldName] = valueShape(value)
+    return shape
+
+
+def explainCommand(commandName: str, command: dict) -> dict:
+    explained = {commandName: command[commandName]}
+    for fieldName in EXPLAINABLE[commandName]:
+        if fieldName in command:
+            value = command[fieldName]
+            explained[fieldName] = value[:1] if fieldName in BATCH_FIELDS else value
+    if commandName == "aggregate":
+        explained["cursor"] = {}
+    return explained
+
+
+def findKey(document, key: str):
+    """First value stored under `key` anywhere in a nested explain document."""
+    if isinstance(document, dict):
+        if key in document:
+            return document[key]
+        values = document.values()
+    elif isinstance(document, list):
+        values = document
+    else:
+        return None
+    for value in values:
+        found = findKey(value, key)
+        if found is not None:
+            return found
+    return None
+
+
+def planStages(plan, stages: List[str], indexes: List[str]) -> None:
+    if isinstance(plan, dict):
+        if "stage" in plan:
+            stages.append(plan["stage"])
+            if plan.get("indexName"):
+                indexes.append(plan["indexName"])
+        for key in ("inputStage", "queryPlan", "inputStages"):
+            if key in plan:
+                planStages(plan[key], stages, indexes)
+    elif isinstance(plan, list):
+        for item in plan:
+            planStages(item, stages, indexes)
+
+
+def summarizeExplain(explain: dict) -> dict:
+    stages: List[str] = []
+    indexes: List[str] = []
+    planStages(findKey(explain, "winningPlan"), stages, indexes)
+    executionStats = findKey(explain, "executionStats") or {}
+    docsExamined = executionStats.get("totalDocsExamined", 0)
+    returned = executionStats.get("nReturned", 0)
+    return {
+        "stages": stages,
+        "collscan": "COLLSCAN" in stages,
+        "indexes": indexes,
+        "keysExamined": executionStats.get("totalKeysExamined", 0),
+        "docsExamined": docsExamined,
+        "returned": returned,
+        "examinedPerReturned": round(docsExamined / max(returned, 1), 1),
+        "executionTimeMs": executionStats.get("executionTimeMillis"),
+    }
+
+
+class SlowQueryLog(monitoring.CommandListener):
+    """
+    Per-shape records in an ordered dict capped at SLOW_QUERY_MAX_SHAPES,
+    evicting the least recently seen shape. Commands under the threshold
+    cost one dict insert and pop. Explain runs on the event loop with the
+    managed client and is never itself recorded.
+    """
+
+    def __init__(self) -> None:
+        self.threshold = settings.SLOW_QUERY_THRESHOLD_MS * 1000  # microseconds, as events report
+        self.pending: Dict[Tuple[int, int], dict] = {}
+        self.shapes: "OrderedDict[str, dict]" = OrderedDict()
+        self.lock = threading.Lock()
+        self.client = None
+        self.loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def attach(self, client) -> None:
+        """Use `client` and the running loop for explain."""
+        self.client = client
+        self.loop = asyncio.get_running_loop()
+
+    def reset(self) -> None:
+        with self.lock:
+            self.shapes.clear()
+
+    def list(self) -> List[dict]:
+        with self.lock:
+            records = [dict(record) for record in self.shapes.values()]
+        return sorted(records, key=lambda record: record["totalMs"], reverse=True)
+
+    def started(self, event) -> None:
+        if event.command_name in EXPLAINABLE:
+            self.pending[(event.request_id, event.operation_id or 0)] = event.command
+
+    def succeeded(self, event) -> None:
+        command = self.pending.pop((event.request_id, event.operation_id or 0), None)
+        if command is not None and event.duration_micros >= self.threshold:
+            self.record(event, command)
+
+    def failed(self, event) -> None:
+        self.pending.pop((event.request_id, event.operation_id or 0), None)
+
+    def record(self, event, command: dict) -> None:
+        commandName = event.command_name
+        collection = command.get(commandName)
+        if not isinstance(collection, str):
+            return
+        shape = commandShape(commandName, command)
+        key = json.dumps([event.database_name, collection, commandName, shape], sort_keys=True, default=str)
+        durationMs = event.duration_micros / 1000
+        mongoSlowQueries.inc(collection, commandName)
+        with self.lock:
+            record = self.shapes.pop(key, None)
+            isNew = record is None
+            if isNew:
+                record = {
+                    "collection": collection,
+                    "command": commandName,
+                    "shape": shape,
+                    "count": 0,
+                    "totalMs": 0.0,
+                    "maxMs": 0.0,
+                    "firstSeen": time.time(),
+                    "plan": None,
+                    "explainError": None,
+                }
+            record["count"] += 1
+            record["totalMs"] = round(record["totalMs"] + durationMs, 3)
+            record["maxMs"] = max(record["maxMs"], durationMs)
+            record["lastSeen"] = time.time()
+            self.shapes[key] = record
+            while len(self.shapes) > settings.SLOW_QUERY_MAX_SHAPES:
+                self.shapes.popitem(last=False)
+        if not isNew:
+            return
+        if settings.SLOW_QUERY_EXPLAIN and self.client is not None and self.loop is not None and not self.loop.is_closed():
+            asyncio.run_coroutine_threadsafe(self.explain(record, event.database_name, commandName, command), self.loop)
+        else:
+            logger.warning("Slow %s on %s took %.1f ms, shape %s", commandName, collection, durationMs, json.dumps(shape, default=str))
+
+    async def explain(self, record: dict, databaseName: str, commandName: str, command: dict) -> None:
+        try:
+            explain = await self.client[databaseName].command(
+                {"explain": explainCommand(commandName, command), "verbosity": "executionStats"}
+            )
+            record["plan"] = plan = summarizeExplain(explain)
+        except Exception as error:
+            record["explainError"] = str(error)
+            logger.warning("Slow %s on %s took %.1f ms; explain failed: %s", commandName, record["collection"], record["maxMs"], error)
+            return
+        warn = plan["collscan"] or plan["examinedPerReturned"] >= settings.SLOW_QUERY_EXAMINED_RATIO_WARN
+        logger.log(
+            logging.WARNING if warn else logging.INFO,
+            "Slow %s on %s took %.1f ms: plan %s%s, %d docs examined for %d returned, shape %s",
+            commandName, record["collection"], record["maxMs"], " > ".join(plan["stages"]),
+            f" (indexes {', '.join(plan['indexes'])})" if plan["indexes"] else "",
+            plan["docsExamined"], plan["returned"], json.dumps(record["shape"], default=str)
+        )
+
+
+slowQueryLog = SlowQueryLog()
+
+
+def slowQueryListeners() -> list:
+    return [slowQueryLog] if settings.SLOW_QUERY_ENABLED else []
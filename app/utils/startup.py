@@ -0,0 +1,47 @@
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimings:
+    """
+    Wall-clock duration of each cold-start phase (import, settings, Mongo
+    connect, Beanie init). Kept import-light so app/app.py can load it first.
+    """
+
+    def __init__(self) -> None:
+        self.phases: Dict[str, float] = {}
+        self.reported = False
+
+    @contextmanager
+    def phase(self, name: str):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(name, time.perf_counter() - started)
+
+    def record(self, name: str, seconds: float) -> None:
+        self.phases[name] = self.phases.get(name, 0.0) + seconds
+
+    def asDict(self) -> Dict[str, float]:
+        """Phase durations in milliseconds, plus their total."""
+        timings = {name: round(seconds * 1000, 2) for name, seconds in self.phases.items()}
+        timings["total"] = round(sum(self.phases.values()) * 1000, 2)
+        return timings
+
+    def report(self) -> None:
+        """Log the timings once per process; warm invocations have nothing new to say."""
+        if self.reported:
+            return
+        self.reported = True
+        logger.info(
+            "Cold start: %s",
+            ", ".join(f"{name}={ms:.1f}ms" for name, ms in self.asDict().items())
+        )
+
+
+startupTimings = StartupTimings()
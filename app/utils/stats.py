@@ -0,0 +1,175 @@
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+from app.core.models.Darshan import Darshan
+from app.core.models.DarshanArchive import DarshanArchive
+from app.core.models.DarshanStat import DarshanStat
+from app.core.schemas.Darshan import DarshanStatus
+
+# Day counters recorded for these transitions; terminal statuses are never
+# updated again, so a rebuild can recover their day from updatedAt.
+DAY_EVENTS = {
+    DarshanStatus.APPROVED.value: "approved",
+    DarshanStatus.REJECTED.value: "rejected",
+}
+
+
+class StatCounters:
+    """Accumulates counter deltas keyed by stat _id before they are written in one bulk_write."""
+
+    def __init__(self) -> None:
+        self.deltas: Dict[str, dict] = {}
+
+    def add(self, key: str, fields: dict, count: int = 0, people: int = 0) -> None:
+        delta = self.deltas.setdefault(key, {"fields": fields, "requests": 0, "people": 0})
+        delta["requests"] += count
+        delta["people"] += people
+
+    def status(self, status: str, count: int) -> None:
+        self.add(f"status|{status}", {"kind": "status", "status": status}, count)
+
+    def lead(self, leadId: str, status: str, count: int) -> None:
+        self.add(f"lead|{leadId}|{status}", {"kind": "lead", "leadId": leadId, "status": status}, count)
+
+    def day(self, day: str, event: str, count: int) -> None:
+        self.add(f"day|{day}|{event}", {"kind": "day", "day": day, "event": event}, count)
+
+    def location(self, location: str, count: int, people: int) -> None:
+        self.add(f"location|{location}", {"kind": "location", "location": location}, count, people)
+
+    def document(self, document: dict, sign: int) -> None:
+        """Add (sign=1) or remove (sign=-1) a darshan document from the status, lead and location counters."""
+        status = getattr(document["status"], "value", document["status"])
+        self.status(status, sign)
+        self.lead(document["leadId"], status, sign)
+        if status == DarshanStatus.APPROVED.value and document.get("scheduledLocation"):
+            self.location(document["scheduledLocation"], sign, sign * document["numberOfPeople"])
+
+    def operations(self) -> List[UpdateOne]:
+        return [
+            UpdateOne(
+                {"_id": key},
+                {"$inc": {"requests": delta["requests"], "people": delta["people"]}, "$setOnInsert": delta["fields"]},
+                upsert=True
+            )
+            for key, delta in self.deltas.items()
+            if delta["requests"] or delta["people"]
+        ]
+
+    async def save(self) -> None:
+        operations = self.operations()
+        if operations:
+            await DarshanStat.get_motor_collection().bulk_write(operations, ordered=False)
+
+
+def dayKey(value: datetime) -> str:
+    return value.strftime("%Y-%m-%d")
+
+
+def _document(darshan) -> dict:
+    return darshan if isinstance(darshan, dict) else darshan.dict()
+
+
+async def recordCreate(darshan) -> None:
+    await recordCreates([darshan])
+
+
+async def recordCreates(darshans: Iterable) -> None:
+    counters = StatCounters()
+    for darshan in darshans:
+        document = _document(darshan)
+        counters.document(document, 1)
+        counters.day(dayKey(document["createdAt"]), "created", 1)
+    await counters.save()
+
+
+async def recordTransitions(transitions: Iterable[Tuple[dict, str]]) -> None:
+    """Record (updated document, previous status) pairs in one write."""
+    counters = StatCounters()
+    for document, fromStatus in transitions:
+        counters.document({**document, "status": fromStatus}, -1)
+        counters.document(document, 1)
+        event = DAY_EVENTS.get(document["status"])
+        if event:
+            counters.day(dayKey(document["updatedAt"]), event, 1)
+    await counters.save()
+
+
+async def recordDelete(darshan) -> None:
+    document = _document(darshan)
+    counters = StatCounters()
+    counters.document(document, -1)
+    counters.day(dayKey(document["createdAt"]), "created", -1)
+    event = DAY_EVENTS.get(getattr(document["status"], "value", document["status"]))
+    if event:
+        counters.day(dayKey(document["updatedAt"]), event, -1)
+    await counters.save()
+
+
+async def getStats(start: Optional[str] = None, end: Optional[str] = None) -> dict:
+    """Shape the counters for the dashboard. `start`/`end` (YYYY-MM-DD) bound the per-day series."""
+    stats = {"byStatus": {}, "byLead": {}, "byDay": {}, "byLocation": {}}
+    async for stat in DarshanStat.get_motor_collection().find({"$or": [{"requests": {"$ne": 0}}, {"people": {"$ne": 0}}]}):
+        kind = stat["kind"]
+        if kind == "status":
+            stats["byStatus"][stat["status"]] = stat["requests"]
+        elif kind == "lead":
+            stats["byLead"].setdefault(stat["leadId"], {})[stat["status"]] = stat["requests"]
+        elif kind == "day":
+            if (start and stat["day"] < start) or (end and stat["day"] > end):
+                continue
+            stats["byDay"].setdefault(stat["day"], {})[stat["event"]] = stat["requests"]
+        elif kind == "location":
+            stats["byLocation"][stat["location"]] = {"requests": stat["requests"], "people": stat["people"]}
+    stats["byDay"] = dict(sorted(stats["byDay"].items()))
+    return stats
+
+
+async def computeStats() -> Dict[str, dict]:
+    """
+    Recompute every counter with a single streamed pass over darshan_requests
+    and its archive. Archived requests stay counted until the archive TTL
+    purges them.
+    """
+    counters = StatCounters()
+    projection = {"status": 1, "leadId": 1, "numberOfPeople": 1, "scheduledLocation": 1, "createdAt": 1, "updatedAt": 1}
+    for model in (Darshan, DarshanArchive):
+        async for document in model.get_motor_collection().find({}, projection):
+            counters.document(document, 1)
+            counters.day(dayKey(document["createdAt"]), "created", 1)
+            event = DAY_EVENTS.get(document["status"])
+            if event:
+                counters.day(dayKey(document["updatedAt"]), event, 1)
+    return {
+        key: {"_id": key, **delta["fields"], "requests": delta["requests"], "people": delta["people"]}
+        for key, delta in counters.deltas.items()
+    }
+
+
+async def rebuildStats(verifyOnly: bool = False) -> List[str]:
+    """
+    Recompute the counters from scratch and compare them with the stored
+    ones. Returns a description of every mismatch; unless `verifyOnly`, the
+    stored counters are then replaced with the recomputed ones.
+    """
+    expected = await computeStats()
+    collection = DarshanStat.get_motor_collection()
+    stored = {document["_id"]: document async for document in collection.find({})}
+
+    mismatches = []
+    for key in sorted(set(expected) | set(stored)):
+        want = expected.get(key, {"requests": 0, "people": 0})
+        have = stored.get(key, {"requests": 0, "people": 0})
+        if (want["requests"], want["people"]) != (have.get("requests", 0), have.get("people", 0)):
+            mismatches.append(
+                f"{key}: stored requests={have.get('requests', 0)} people={have.get('people', 0)}, "
+                f"expected requests={want['requests']} people={want['people']}"
+            )
+
+    if not verifyOnly:
+        await collection.delete_many({})
+        if expected:
+            await collection.insert_many(list(expected.values()))
+    return mismatches
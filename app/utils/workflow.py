@@ -0,0 +1,124 @@
+from datetime import datetime
+from typing import Dict, List, Optional
+from uuid import uuid4
+
+from pymongo import ReturnDocument, UpdateOne
+
+from app.core.models.Darshan import Darshan
+from app.core.schemas.Darshan import DarshanStatus
+from app.utils.stats import recordTransitions
+from app.utils.notifications import darshanEvents, TRANSITION
+from app.utils.duplicates import recentSubmissions, OPEN_STATUSES
+
+# Darshan workflow: A1 --lead--> A2 --pa--> A3, either step can reject to A4
+LEAD_DECISIONS = {True: DarshanStatus.PENDING_PA, False: DarshanStatus.REJECTED}
+PA_DECISIONS = {True: DarshanStatus.APPROVED, False: DarshanStatus.REJECTED}
+
+
+def forgetDecided(document: dict) -> None:
+    if document["status"] not in OPEN_STATUSES:
+        recentSubmissions.forget(document["phoneNumber"], document["_id"])
+
+
+def transitionFilter(fromStatus: DarshanStatus, leadId: Optional[str] = None) -> dict:
+    query = {"status": fromStatus.value}
+    if leadId is not None:
+        query["leadId"] = leadId
+    return query
+
+
+async def transitionDarshan(
+    requestId: str,
+    fromStatus: DarshanStatus,
+    toStatus: DarshanStatus,
+    update: dict,
+    leadId: Optional[str] = None
+) -> Optional[dict]:
+    """
+    Move a darshan request from `fromStatus` to `toStatus` in one conditional
+    find_one_and_update. Returns the updated document, or None when the
+    request does not exist, belongs to another lead or is no longer in
+    `fromStatus` (e.g. a concurrent action won).
+    """
+    query = transitionFilter(fromStatus, leadId)
+    query["_id"] = requestId
+    document = await Darshan.get_motor_collection().find_one_and_update(
+        query,
+        {"$set": {**update, "status": toStatus.value, "updatedAt": datetime.utcnow()}},
+        return_document=ReturnDocument.AFTER
+    )
+    if document is not None:
+        await recordTransitions([(document, fromStatus.value)])
+        darshanEvents.publish(TRANSITION, document, fromStatus.value)
+        forgetDecided(document)
+    return document
+
+
+async def bulkTransitionDarshan(
+    updates: Dict[str, dict],
+    fromStatus: DarshanStatus,
+    toStatus: DarshanStatus,
+    leadId: Optional[str] = None
+) -> List[dict]:
+    """
+    Apply the same transition to many requests. `updates` maps each request ID
+    to the extra fields to set on it. Identical updates go out as one
+    update_many, per-item updates as one unordered bulk_write; both only match
+    documents still in `fromStatus`. Every write is tagged with a fresh
+    lastActionId, so a single read-back tells which IDs this call moved and
+    provides the documents for stats and notifications. A request that is
+    already past `toStatus` at the read-back was moved on by a concurrent
+    transitionDarshan, so only this call's own step is recorded for it.
+    Returns one outcome dict per request ID, in input order.
+    """
+    if not updates:
+        return []
+    actionId = str(uuid4())
+    base = {"status": toStatus.value, "updatedAt": datetime.utcnow(), "lastActionId": actionId}
+    query = transitionFilter(fromStatus, leadId)
+    requestIds = list(updates)
+    collection = Darshan.get_motor_collection()
+
+    values = list(updates.values())
+    if all(value == values[0] for value in values):
+        await collection.update_many(
+            {**query, "_id": {"$in": requestIds}},
+            {"$set": {**values[0], **base}}
+        )
+    else:
+        await collection.bulk_write(
+            [UpdateOne({**query, "_id": requestId}, {"$set": {**update, **base}}) for requestId, update in updates.items()],
+            ordered=False
+        )
+
+    current = {
+        document["_id"]: document
+        async for document in collection.find({"_id": {"$in": requestIds}})
+    }
+    results = []
+    transitions = []
+    superseded = []
+    for requestId in requestIds:
+        document = current.get(requestId)
+        if document is None or (leadId is not None and document.get("leadId") != leadId):
+            results.append({"id": requestId, "success": False, "detail": "Darshan request not found"})
+        elif document.get("lastActionId") == actionId:
+            results.append({"id": requestId, "success": True, "status": toStatus.value})
+            if document["status"] == toStatus.value:
+                transitions.append((document, fromStatus.value))
+            else:
+                # A single-item transition moved it on before the read-back and recorded
+                # its own step; record this one as written and leave the event to it
+                superseded.append(({**document, **updates[requestId], **base}, fromStatus.value))
+        else:
+            results.append({
+                "id": requestId,
+                "success": False,
+                "status": document["status"],
+                "detail": f"Cannot perform action on request with status {document['status']}"
+            })
+    await recordTransitions(transitions + superseded)
+    for document, previousStatus in transitions:
+        darshanEvents.publish(TRANSITION, document, previousStatus)
+        forgetDecided(document)
+    return results
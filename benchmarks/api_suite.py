@@ -0,0 +1,414 @@
+"""
+Offline latency/throughput benchmark for every router.
+
+    python -m benchmarks.api_suite [--mongodb-url URL] [--darshans N] [--events N]
+        [--gallery N] [--requests N] [--concurrency N] [--only ROUTER ...]
+        [--output FILE] [--compare BASELINE.json] [--threshold PCT]
+
+Boots the FastAPI app in-process through httpx's ASGI transport. MongoDB is
+a local server given with --mongodb-url, or mongomock-motor without one. S3
+is the in-memory stand-in from benchmarks.common. The database is seeded
+with users, --darshans darshan requests (1k to 1M) spread over the workflow
+statuses, and --events events whose galleries hold --gallery images each.
+Enough extra A1 requests are added that every lead action gets its own.
+Each scenario then runs with the given concurrency.
+
+The JSON result records the commit, environment, seed sizes, and for each
+scenario the throughput, status counts, and latency percentiles of 2xx
+responses ("latencyMs", the ones --compare uses) and of the rest
+("errorLatencyMs"). It goes to --output or to stdout, and the
+human-readable table goes to stderr. With --compare, p50/p99 are compared
+to a previous result. The exit status is 1 when any scenario is slower by
+more than --threshold percent. mongomock numbers show the app's own CPU
+cost, not database costs, so compare results from the same setup only.
+
+Requires benchmarks/requirements.txt on top of the app's requirements.
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Optional
+from uuid import uuid4
+
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("DARSHAN_DUPLICATE_WINDOW_MINUTES", "0")
+os.environ.setdefault("LOOP_MONITOR_ENABLED", "false")
+
+from benchmarks import common
+
+import httpx
+
+from app.app import app
+from app.core.models.Darshan import Darshan
+from app.core.models.Event import Event
+from app.core.models.SpiritualEvent import SpiritualEvent
+from app.core.models.TeamMember import TeamMember
+from app.core.models.User import User
+from app.core.schemas.Event import EventType
+from app.utils.authorization import signJWT
+from app.utils.leads import leadDirectory
+from app.utils.passwords import passwordHasher
+from app.utils.scheduling import rebuildSlots, slotStart
+from app.utils.stats import rebuildStats
+
+LOCATIONS = ["Main Hall", "Temple Courtyard", "Ashram Office"]
+STATUS_MIX = [("A1", 0.4), ("A2", 0.2), ("A3", 0.3), ("A4", 0.1)]
+BENCHMARK_PASSWORD = "benchmark-password"
+PNG = b"\x89PNG\r\n\x1a\n" + bytes(2048)
+SEED_BATCH = 10000
+
+
+@dataclass
+class Seed:
+    leads: List[str] = field(default_factory=list)
+    pendingByLead: List[tuple] = field(default_factory=list)  # (requestId, leadId) still at A1
+    extraPending: int = 0  # A1 requests added beyond --darshans so no lead action repeats
+    darshanIds: List[str] = field(default_factory=list)
+    eventIds: List[str] = field(default_factory=list)
+    spiritualEventIds: List[str] = field(default_factory=list)
+    teamIds: List[str] = field(default_factory=list)
+    tokens: Dict[str, dict] = field(default_factory=dict)
+
+
+@dataclass
+class Scenario:
+    router: str
+    name: str
+    method: str
+    route: str
+    request: Callable[[int], dict]  # index -> httpx request kwargs, including "url"
+    share: float = 1.0  # fraction of --requests, for expensive calls
+
+
+def authHeader(seed: Seed, userName: str) -> dict:
+    return {"Authorization": seed.tokens[userName]["accessToken"]}
+
+
+async def seedDatabase(args) -> Seed:
+    seed = Seed()
+    random.seed(args.random_seed)
+    now = datetime.utcnow().replace(microsecond=0)
+    hashed = await passwordHasher.hash(BENCHMARK_PASSWORD)
+
+    users = [User(name="Admin", userName="admin", phoneNumber="+919000000001", role="admin", password=hashed)]
+    users.append(User(name="PA", userName="pa", phoneNumber="+919000000002", role="pa", password=hashed))
+    for index in range(args.leads):
+        seed.leads.append(f"lead-{index}")
+        users.append(User(name=f"Lead {index}", userName=f"lead-{index}", phoneNumber=f"+9191{index:08d}", role="lead", password=hashed))
+    await User.insert_many(users)
+    for user in users:
+        seed.tokens[user.userName] = signJWT(user.userName, user.role)
+    await leadDirectory.load()
+
+    collection = Darshan.get_motor_collection()
+    statuses = [status for status, _ in STATUS_MIX]
+    weights = [weight for _, weight in STATUS_MIX]
+    batch = []
+
+    async def addDarshan(index: int, status: str) -> None:
+        nonlocal batch
+        leadId = seed.leads[index % len(seed.leads)]
+        createdAt = now - timedelta(minutes=random.randint(0, 60 * 24 * 60))
+        document = {
+            "_id": str(uuid4()),
+            "name": f"Devotee {index}",
+            "phoneNumber": f"+91{8000000000 + index}",
+            "address": f"{index} Benchmark Street",
+            "reasonToVisit": "Darshan",
+            "numberOfPeople": random.randint(1, 6),
+            "status": status,
+            "scheduledDateTime": None,
+            "scheduledLocation": None,
+            "reason": None,
+            "leadId": leadId,
+            "lastActionId": None,
+            "createdAt": createdAt,
+            "updatedAt": createdAt,
+        }
+        if status == "A3":
+            document["scheduledDateTime"] = slotStart(now + timedelta(minutes=random.randint(0, 60 * 24 * 30)))
+            document["scheduledLocation"] = random.choice(LOCATIONS)
+        elif status == "A1":
+            seed.pendingByLead.append((document["_id"], leadId))
+        seed.darshanIds.append(document["_id"])
+        batch.append(document)
+        if len(batch) >= SEED_BATCH:
+            await collection.insert_many(batch, ordered=False)
+            batch = []
+
+    for index in range(args.darshans):
+        await addDarshan(index, random.choices(statuses, weights)[0])
+    # Every lead action takes a request out of A1, so each one needs its own
+    seed.extraPending = max(0, args.requests - len(seed.pendingByLead))
+    for index in range(args.darshans, args.darshans + seed.extraPending):
+        await addDarshan(index, "A1")
+    if batch:
+        await collection.insert_many(batch, ordered=False)
+    await rebuildStats()
+    await rebuildSlots()
+
+    def gallery(prefix: str) -> List[str]:
+        return [f"{prefix}/images/photo-{image}.jpg" for image in range(args.gallery)]
+
+    events = []
+    for index in range(args.events):
+        eventId = str(uuid4())
+        seed.eventIds.append(eventId)
+        events.append(Event(
+            id=eventId, eventTitle=f"Event {index}", shortDescription="Short description",
+            longDescription="Long description " * 50, eventType=random.choice(list(EventType)),
+            eventDate=now + timedelta(days=index), mainImage=f"events/{index}/main.jpg",
+            additionalImages=gallery(f"events/{index}"), videos=[]
+        ))
+    if events:
+        await Event.insert_many(events)
+
+    spiritualEvents = []
+    for index in range(args.events):
+        eventId = str(uuid4())
+        seed.spiritualEventIds.append(eventId)
+        spiritualEvents.append(SpiritualEvent(
+            id=eventId, eventTitle=f"Spiritual event {index}", shortDescription="Short description",
+            longDescription="Long description " * 50, eventDate=now + timedelta(days=index),
+            mainImage=f"spiritual_events/{index}/main.jpg", additionalImages=gallery(f"spiritual_events/{index}"), videos=[]
+        ))
+    if spiritualEvents:
+        await SpiritualEvent.insert_many(spiritualEvents)
+
+    members = []
+    for index in range(args.team):
+        memberId = str(uuid4())
+        seed.teamIds.append(memberId)
+        members.append(TeamMember(id=memberId, name=f"Member {index}", role="Seva", description="About " * 40, image=f"team/{index}.jpg"))
+    if members:
+        await TeamMember.insert_many(members)
+    return seed
+
+
+def buildScenarios(seed: Seed) -> List[Scenario]:
+    admin, pa = authHeader(seed, "admin"), authHeader(seed, "pa")
+    firstLead = seed.leads[0]
+    today = datetime.utcnow().date()
+    pick = lambda ids, index: ids[index % len(ids)]
+    submissionRun = uuid4().hex[:6]
+
+    def leadAction(index: int) -> dict:
+        requestId, leadId = seed.pendingByLead[index]
+        return {"url": f"/v1/darshan/{requestId}/lead-action", "json": {"status": index % 2 == 0, "reason": "Benchmark"}, "headers": authHeader(seed, leadId)}
+
+    def createEvent(index: int) -> dict:
+        return {
+            "url": "/v1/events",
+            "data": {"eventTitle": f"Benchmark event {index}", "shortDescription": "Short", "longDescription": "Long",
+                     "eventType": EventType.cultural.value, "eventDate": today.isoformat()},
+            "files": [("mainImage", ("main.png", PNG, "image/png"))] + [("additionalImages", (f"photo-{image}.png", PNG, "image/png")) for image in range(5)],
+            "headers": admin,
+        }
+
+    return [
+        Scenario("auth", "login", "POST", "/v1/auth/login",
+                 lambda index: {"url": "/v1/auth/login", "json": {"userName": "admin", "password": BENCHMARK_PASSWORD}}, share=0.1),
+        Scenario("auth", "list leads", "GET", "/v1/auth/leads", lambda index: {"url": "/v1/auth/leads"}),
+        Scenario("auth", "list users", "GET", "/v1/auth/users", lambda index: {"url": "/v1/auth/users"}),
+
+        Scenario("events", "list", "GET", "/v1/events", lambda index: {"url": "/v1/events"}, share=0.25),
+        Scenario("events", "get", "GET", "/v1/events/{event_id}", lambda index: {"url": f"/v1/events/{pick(seed.eventIds, index)}"}),
+        Scenario("events", "update text", "PUT", "/v1/events/{event_id}",
+                 lambda index: {"url": f"/v1/events/{pick(seed.eventIds, index)}", "data": {"shortDescription": f"Edit {index}"}, "headers": admin}),
+        Scenario("events", "create with images", "POST", "/v1/events", createEvent, share=0.25),
+
+        Scenario("spiritual_events", "list", "GET", "/v1/spiritual-events", lambda index: {"url": "/v1/spiritual-events"}, share=0.25),
+        Scenario("spiritual_events", "get", "GET", "/v1/spiritual-events/{event_id}",
+                 lambda index: {"url": f"/v1/spiritual-events/{pick(seed.spiritualEventIds, index)}"}),
+        Scenario("spiritual_events", "update text", "PUT", "/v1/spiritual-events/{event_id}",
+                 lambda index: {"url": f"/v1/spiritual-events/{pick(seed.spiritualEventIds, index)}", "data": {"shortDescription": f"Edit {index}"}, "headers": admin}),
+
+        Scenario("team", "list", "GET", "/v1/team", lambda index: {"url": "/v1/team"}),
+        Scenario("team", "get", "GET", "/v1/team/{member_id}", lambda index: {"url": f"/v1/team/{pick(seed.teamIds, index)}"}),
+        Scenario("team", "update text", "PUT", "/v1/team/{member_id}",
+                 lambda index: {"url": f"/v1/team/{pick(seed.teamIds, index)}", "data": {"description": f"Edit {index}"}, "headers": admin}),
+
+        Scenario("darshan", "submit", "POST", "/v1/darshan", lambda index: {"url": "/v1/darshan", "json": {
+            "name": f"Visitor {index}", "phoneNumber": f"+917{int(submissionRun, 16) % 1000:03d}{index:06d}",
+            "address": "Benchmark Road", "reasonToVisit": "Darshan", "numberOfPeople": 2, "leadId": firstLead}}),
+        Scenario("darshan", "accepted list", "GET", "/v1/darshan/accepted-darshan", lambda index: {"url": "/v1/darshan/accepted-darshan"}, share=0.05),
+        Scenario("darshan", "lead queue", "GET", "/v1/darshan",
+                 lambda index: {"url": "/v1/darshan", "params": {"status": "A1"}, "headers": authHeader(seed, pick(seed.leads, index))}, share=0.25),
+        Scenario("darshan", "admin list", "GET", "/v1/darshan", lambda index: {"url": "/v1/darshan", "headers": admin}, share=0.05),
+        Scenario("darshan", "get", "GET", "/v1/darshan/{request_id}", lambda index: {"url": f"/v1/darshan/{pick(seed.darshanIds, index)}", "headers": admin}),
+        Scenario("darshan", "availability", "GET", "/v1/darshan/availability", lambda index: {"url": "/v1/darshan/availability", "params": {
+            "location": LOCATIONS[index % len(LOCATIONS)], "start": today.isoformat(), "end": (today + timedelta(days=7)).isoformat()}, "headers": pa}),
+        Scenario("darshan", "stats", "GET", "/v1/darshan/stats", lambda index: {"url": "/v1/darshan/stats", "headers": admin}),
+        Scenario("darshan", "export day", "GET", "/v1/darshan/export",
+                 lambda index: {"url": "/v1/darshan/export", "params": {"date": (today + timedelta(days=index % 30)).isoformat()}, "headers": pa}, share=0.1),
+        Scenario("darshan", "lead action", "PUT", "/v1/darshan/{request_id}/lead-action", leadAction),
+    ]
+
+
+def percentile(sortedValues: List[float], fraction: float) -> float:
+    return sortedValues[min(len(sortedValues) - 1, int(fraction * len(sortedValues)))]
+
+
+def latencySummary(latencies: List[float]) -> Optional[dict]:
+    if not latencies:
+        return None
+    latencies = sorted(latencies)
+    return {
+        "mean": round(statistics.fmean(latencies) * 1e3, 3),
+        "p50": round(percentile(latencies, 0.5) * 1e3, 3),
+        "p90": round(percentile(latencies, 0.9) * 1e3, 3),
+        "p99": round(percentile(latencies, 0.99) * 1e3, 3),
+        "max": round(latencies[-1] * 1e3, 3),
+    }
+
+
+async def runScenario(client: httpx.AsyncClient, scenario: Scenario, requests: int, concurrency: int) -> dict:
+    requests = max(1, int(requests * scenario.share))
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    errorLatencies: List[float] = []
+    statuses: Dict[str, int] = {}
+
+    async def send(index: int) -> None:
+        kwargs = scenario.request(index)
+        async with semaphore:
+            started = time.perf_counter()
+            response = await client.request(scenario.method, **kwargs)
+            await response.aread()
+            (latencies if response.is_success else errorLatencies).append(time.perf_counter() - started)
+        statuses[str(response.status_code)] = statuses.get(str(response.status_code), 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*[send(index) for index in range(requests)])
+    elapsed = time.perf_counter() - started
+    return {
+        "router": scenario.router,
+        "name": scenario.name,
+        "method": scenario.method,
+        "route": scenario.route,
+        "requests": requests,
+        "concurrency": min(concurrency, requests),
+        "statuses": statuses,
+        "throughput": round(requests / elapsed, 2),
+        "latencyMs": latencySummary(latencies),  # 2xx responses only
+        "errorLatencyMs": latencySummary(errorLatencies),
+    }
+
+
+def gitCommit() -> Dict[str, Optional[str]]:
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+        dirty = bool(subprocess.run(["git", "status", "--porcelain", "--untracked-files=no"], capture_output=True, text=True, check=True).stdout.strip())
+        return {"commit": commit, "dirty": dirty}
+    except (OSError, subprocess.CalledProcessError):
+        return {"commit": None, "dirty": None}
+
+
+def scenarioKey(result: dict) -> str:
+    return f"{result['router']}/{result['name']}"
+
+
+def compare(results: List[dict], baselinePath: str, threshold: float) -> bool:
+    """Print p50/p99 changes against a previous run. Returns True if anything regressed past `threshold` percent."""
+    with open(baselinePath) as baselineFile:
+        baseline = {scenarioKey(result): result for result in json.load(baselineFile)["scenarios"]}
+    regressed = False
+    print(f"\nCompared with {baselinePath} (regression threshold {threshold:.0f}%):", file=sys.stderr)
+    for result in results:
+        previous = baseline.get(scenarioKey(result))
+        if previous is None:
+            print(f"  {scenarioKey(result):<36} new scenario", file=sys.stderr)
+            continue
+        if not previous["latencyMs"] or not result["latencyMs"]:
+            print(f"  {scenarioKey(result):<36} no 2xx responses to compare", file=sys.stderr)
+            continue
+        changes = []
+        for metric in ("p50", "p99"):
+            before, after = previous["latencyMs"][metric], result["latencyMs"][metric]
+            change = (after - before) / before * 100 if before else 0.0
+            changes.append(f"{metric} {before:8.2f} -> {after:8.2f} ms ({change:+6.1f}%)")
+            if change > threshold:
+                regressed = True
+                changes[-1] += " REGRESSED"
+        print(f"  {scenarioKey(result):<36} " + "  ".join(changes), file=sys.stderr)
+    return regressed
+
+
+async def main(args) -> int:
+    common.useMemoryS3()
+    await common.initDatabase(args.mongodb_url, "benchmark_api_suite")
+    for model in (User, Darshan, Event, SpiritualEvent, TeamMember):
+        await model.get_motor_collection().delete_many({})
+
+    seedStarted = time.perf_counter()
+    seed = await seedDatabase(args)
+    print(f"Seeded {args.darshans + seed.extraPending} darshans, {args.events} events with {args.gallery}-image galleries "
+          f"in {time.perf_counter() - seedStarted:.1f}s", file=sys.stderr)
+
+    scenarios = [scenario for scenario in buildScenarios(seed) if not args.only or scenario.router in args.only]
+    results = []
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for scenario in scenarios:
+            result = await runScenario(client, scenario, args.requests, args.concurrency)
+            results.append(result)
+            latency = result["latencyMs"] or {"p50": math.nan, "p99": math.nan}
+            print(f"{scenarioKey(result):<36} {result['throughput']:9.1f} req/s  p50 {latency['p50']:8.2f} ms  "
+                  f"p99 {latency['p99']:8.2f} ms  {result['statuses']}", file=sys.stderr)
+    passwordHasher.shutdown()
+
+    report = {
+        "suite": "api",
+        "createdAt": datetime.utcnow().isoformat() + "Z",
+        **gitCommit(),
+        "environment": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "mongodb": "server" if args.mongodb_url else "mongomock",
+            "s3": "memory",
+        },
+        "parameters": {
+            "darshans": args.darshans, "events": args.events, "gallery": args.gallery, "team": args.team,
+            "leads": args.leads, "requests": args.requests, "concurrency": args.concurrency, "randomSeed": args.random_seed,
+        },
+        "scenarios": results,
+    }
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, "w") as outputFile:
+            outputFile.write(output + "\n")
+        print(f"Wrote {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+    if args.compare and compare(results, args.compare, args.threshold):
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongodb-url", default="")
+    parser.add_argument("--darshans", type=int, default=1000)
+    parser.add_argument("--events", type=int, default=50)
+    parser.add_argument("--gallery", type=int, default=50, help="images per event gallery")
+    parser.add_argument("--team", type=int, default=20)
+    parser.add_argument("--leads", type=int, default=10)
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario, scaled down for expensive ones")
+    parser.add_argument("--concurrency", type=int, default=20)
+    parser.add_argument("--only", nargs="*", choices=["auth", "events", "spiritual_events", "team", "darshan"])
+    parser.add_argument("--output", help="write the JSON result here instead of stdout")
+    parser.add_argument("--compare", help="previous JSON result to compare p50/p99 against")
+    parser.add_argument("--threshold", type=float, default=10.0, help="regression threshold in percent for --compare")
+    parser.add_argument("--random-seed", type=int, default=1)
+    sys.exit(asyncio.run(main(parser.parse_args())))
@@ -0,0 +1,107 @@
+"""
+Cold-start benchmark: how long a fresh interpreter takes to import the app.
+
+    python -m benchmarks.cold_start [--runs N] [--top N] [--mongodb-url URL]
+
+Each run starts a new Python process (no warm module cache), imports
+app.app and prints the startup phases recorded by startupTimings. The
+median over the runs is reported alongside the modules with the largest
+cumulative import time from `python -X importtime`. With --mongodb-url the
+child also runs the startup hook, adding the mongo_connect and beanie_init
+phases; set MONGODB_SYNC_INDEXES=false to measure the boot without index
+creation. Compare numbers from the same machine only.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+from benchmarks import common
+
+CHILD = """
+import asyncio, json, sys, time, warnings
+warnings.simplefilter("ignore")
+started = time.perf_counter()
+import app.app
+imported = time.perf_counter() - started
+from app.utils.startup import startupTimings
+if sys.argv[1]:
+    asyncio.run(app.app.startup_event())
+timings = startupTimings.asDict()
+timings["import_app"] = round(imported * 1000, 2)
+print(json.dumps(timings))
+"""
+
+
+def childEnvironment(mongodbUrl: str) -> dict:
+    env = dict(os.environ)
+    env["PYTHONDONTWRITEBYTECODE"] = "1"
+    if mongodbUrl:
+        env["MONGODB_URL"] = mongodbUrl
+    return env
+
+
+def measure(runs: int, mongodbUrl: str) -> dict:
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(
+            [sys.executable, "-c", CHILD, mongodbUrl],
+            capture_output=True, text=True, check=True, env=childEnvironment(mongodbUrl)
+        ).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {
+        phase: {
+            "median": round(statistics.median(sample[phase] for sample in samples), 2),
+            "min": min(sample[phase] for sample in samples),
+            "max": max(sample[phase] for sample in samples),
+        }
+        for phase in samples[0]
+    }
+
+
+def slowestImports(top: int) -> list:
+    """Top-level-ish modules by cumulative import time, in milliseconds."""
+    stderr = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import app.app"],
+        capture_output=True, text=True, check=True, env=childEnvironment("")
+    ).stderr
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        modules.append((int(cumulative) / 1000, name.rstrip()))
+    modules.sort(reverse=True)
+    return [
+        {"module": name.strip(), "depth": (len(name) - len(name.lstrip()) - 1) // 2, "ms": round(ms, 1)}
+        for ms, name in modules[:top]
+    ]
+
+
+def main(args) -> None:
+    result = {
+        "python": sys.version.split()[0],
+        "runs": args.runs,
+        "phases_ms": measure(args.runs, args.mongodb_url),
+        "slowest_imports": slowestImports(args.top),
+    }
+    if args.json:
+        print(json.dumps(result, indent=2))
+        return
+    print(f"Cold start over {args.runs} fresh interpreters (Python {result['python']}), milliseconds:")
+    for phase, stats in result["phases_ms"].items():
+        print(f"  {phase:<14} median {stats['median']:8.1f}  min {stats['min']:8.1f}  max {stats['max']:8.1f}")
+    print("Slowest imports (cumulative):")
+    for module in result["slowest_imports"]:
+        print(f"  {module['ms']:8.1f}  {'  ' * module['depth']}{module['module']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--top", type=int, default=15)
+    parser.add_argument("--mongodb-url", default="")
+    parser.add_argument("--json", action="store_true", help="print the result as JSON")
+    main(parser.parse_args())
@@ -0,0 +1,77 @@
+"""
+Shared setup for the benchmark scripts. Import this module before anything
+from `app` so the required Settings have values outside a deployment.
+"""
+import inspect
+import os
+
+for key, value in {
+    "API_TITLE": "benchmark",
+    "API_DESCRIPTION": "benchmark",
+    "VERSION": "/v1",
+    "OPEN_API_JSON_FILENAME": "openapi.json",
+    "DEBUG": "false",
+    "DB_NAME": "benchmark",
+}.items():
+    os.environ.setdefault(key, value)
+
+
+def patchMongomock() -> None:
+    """
+    Bridge gaps between mongomock-motor and what the app calls. Read
+    preferences mean nothing in-process, and newer PyMongo passes `sort` to
+    bulk updates.
+    """
+    import mongomock.collection
+    from mongomock_motor import AsyncMongoMockCollection
+
+    AsyncMongoMockCollection.with_options = lambda self, **options: self
+    addUpdate = mongomock.collection.BulkOperationBuilder.add_update
+    if "sort" not in inspect.signature(addUpdate).parameters:
+        mongomock.collection.BulkOperationBuilder.add_update = (
+            lambda self, *args, sort=None, **kwargs: addUpdate(self, *args, **kwargs)
+        )
+
+
+class MemoryS3:
+    """In-memory stand-in for the boto3 S3 client calls S3Client makes."""
+
+    def __init__(self) -> None:
+        self.objects = {}
+
+    def upload_fileobj(self, fileobj, bucket, key, ExtraArgs=None):
+        self.objects[(bucket, key)] = fileobj.read()
+
+    def generate_presigned_url(self, ClientMethod, Params, ExpiresIn, HttpMethod):
+        return f"https://{Params['Bucket']}.s3.local/{Params['Key']}?X-Amz-Expires={ExpiresIn}"
+
+    def delete_object(self, Bucket, Key):
+        self.objects.pop((Bucket, Key), None)
+
+
+def useMemoryS3() -> MemoryS3:
+    """Point the app's S3Client at a fresh MemoryS3, skipping boto3 entirely."""
+    from app.utils.s3 import s3_client
+
+    s3_client._s3_client = MemoryS3()
+    return s3_client._s3_client
+
+
+async def initDatabase(mongodbUrl: str = "", dbName: str = "benchmark"):
+    """
+    Initialise Beanie against `mongodbUrl`, or against an in-process
+    mongomock-motor client when no URL is given.
+    """
+    from beanie import init_beanie
+    from app.core.models.models import __all__
+
+    if mongodbUrl:
+        from motor.motor_asyncio import AsyncIOMotorClient
+        client = AsyncIOMotorClient(mongodbUrl)
+    else:
+        from mongomock_motor import AsyncMongoMockClient
+        patchMongomock()
+        client = AsyncMongoMockClient()
+    database = client[dbName]
+    await init_beanie(database=database, document_models=__all__)
+    return database
@@ -0,0 +1,89 @@
+"""
+Load test of public darshan submission: direct inserts vs write-behind batching.
+
+    python -m benchmarks.darshan_ingest [--mongodb-url URL] [--requests N] [--concurrency N]
+
+Sends N POST /v1/darshan requests through the ASGI app with the given
+concurrency, once per DARSHAN_INGEST_MODE, and prints throughput and latency
+percentiles. Rate limiting and duplicate detection are switched off so only
+the insert path is measured. Without --mongodb-url it runs against
+mongomock-motor, which exercises the code path but not real write costs.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import time
+
+os.environ.setdefault("RATE_LIMIT_ENABLED", "false")
+os.environ.setdefault("DARSHAN_DUPLICATE_WINDOW_MINUTES", "0")
+
+from benchmarks import common
+
+import httpx
+
+from app.app import app
+from app.config import settings
+from app.core.models.Darshan import Darshan
+from app.core.models.DarshanStat import DarshanStat
+from app.core.models.User import User
+from app.utils.ingest import darshanIngest
+from app.utils.leads import leadDirectory
+
+
+async def run(client: httpx.AsyncClient, requests: int, concurrency: int) -> dict:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def submit(index: int) -> None:
+        body = {
+            "name": f"Devotee {index}",
+            "phoneNumber": f"+91{9000000000 + index}",
+            "address": "Benchmark Street",
+            "reasonToVisit": "Benchmark",
+            "numberOfPeople": 2,
+            "leadId": "lead-benchmark",
+        }
+        async with semaphore:
+            start = time.perf_counter()
+            response = await client.post("/v1/darshan", json=body)
+            latencies.append(time.perf_counter() - start)
+            response.raise_for_status()
+
+    start = time.perf_counter()
+    await asyncio.gather(*[submit(index) for index in range(requests)])
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "throughput": requests / elapsed,
+        "p50": statistics.median(latencies) * 1e3,
+        "p99": latencies[int(len(latencies) * 0.99) - 1] * 1e3,
+    }
+
+
+async def main(args) -> None:
+    await common.initDatabase(args.mongodb_url, "benchmark_darshan_ingest")
+    await User.find(User.userName == "lead-benchmark").delete()
+    await User(name="Benchmark Lead", userName="lead-benchmark", phoneNumber="+919999999999", role="lead", password="-").insert()
+    await leadDirectory.load()
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark") as client:
+        for mode in ("direct", "batched"):
+            await Darshan.delete_all()
+            await DarshanStat.delete_all()
+            settings.DARSHAN_INGEST_MODE = mode
+            result = await run(client, args.requests, args.concurrency)
+            print(f"{mode:<8} {result['throughput']:9.1f} req/s  p50 {result['p50']:7.2f} ms  p99 {result['p99']:7.2f} ms")
+            assert await Darshan.count() == args.requests
+    await darshanIngest.close()
+    await Darshan.delete_all()
+    await User.find(User.userName == "lead-benchmark").delete()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongodb-url", default="")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=200)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,102 @@
+"""
+Concurrency check and latency comparison for darshan state transitions.
+
+    python -m benchmarks.darshan_transitions [--mongodb-url URL] [--parallel N] [--iterations N]
+
+Fires N parallel PA approvals and N parallel lead approvals at the same
+request and fails unless exactly one of each wins. Then compares the mean
+latency of the previous find_one + set path with the single conditional
+find_one_and_update. Without --mongodb-url it runs against mongomock-motor,
+which checks correctness but says little about latency.
+"""
+import argparse
+import asyncio
+import time
+from datetime import datetime
+
+from benchmarks import common
+
+from app.core.models.Darshan import Darshan
+from app.core.schemas.Darshan import DarshanStatus
+from app.utils.workflow import transitionDarshan
+
+
+def newDarshan(status: DarshanStatus) -> Darshan:
+    return Darshan(
+        name="Benchmark Devotee",
+        phoneNumber="+919876543210",
+        address="Benchmark Street",
+        reasonToVisit="Benchmark",
+        numberOfPeople=2,
+        leadId="lead-benchmark",
+        status=status.value,
+    )
+
+
+async def checkParallelApprovals(parallel: int) -> None:
+    darshan = newDarshan(DarshanStatus.PENDING_PA)
+    await darshan.insert()
+    results = await asyncio.gather(*[
+        transitionDarshan(
+            darshan.id,
+            DarshanStatus.PENDING_PA,
+            DarshanStatus.APPROVED,
+            {"reason": f"pa-{i}", "scheduledDateTime": datetime.utcnow(), "scheduledLocation": "Main hall"}
+        )
+        for i in range(parallel)
+    ])
+    winners = [result for result in results if result is not None]
+    assert len(winners) == 1, f"{len(winners)} of {parallel} parallel PA approvals succeeded"
+
+    darshan = newDarshan(DarshanStatus.PENDING_LEAD)
+    await darshan.insert()
+    results = await asyncio.gather(*[
+        transitionDarshan(
+            darshan.id,
+            DarshanStatus.PENDING_LEAD,
+            DarshanStatus.PENDING_PA if i % 2 else DarshanStatus.REJECTED,
+            {"reason": f"lead-{i}"},
+            leadId="lead-benchmark"
+        )
+        for i in range(parallel)
+    ])
+    winners = [result for result in results if result is not None]
+    assert len(winners) == 1, f"{len(winners)} of {parallel} parallel lead actions succeeded"
+    print(f"parallel approvals: exactly one of {parallel} won for both PA and lead actions")
+
+
+async def legacyTransition(requestId: str) -> None:
+    darshan = await Darshan.find_one(Darshan.id == requestId)
+    if darshan and darshan.status == DarshanStatus.PENDING_LEAD:
+        await darshan.set({"status": DarshanStatus.PENDING_PA.value, "updatedAt": datetime.utcnow(), "reason": "ok"})
+
+
+async def atomicTransition(requestId: str) -> None:
+    await transitionDarshan(requestId, DarshanStatus.PENDING_LEAD, DarshanStatus.PENDING_PA, {"reason": "ok"})
+
+
+async def compareLatency(iterations: int) -> None:
+    for name, transition in [("find_one + set", legacyTransition), ("find_one_and_update", atomicTransition)]:
+        darshans = [newDarshan(DarshanStatus.PENDING_LEAD) for _ in range(iterations)]
+        await Darshan.insert_many(darshans)
+        start = time.perf_counter()
+        for darshan in darshans:
+            await transition(darshan.id)
+        elapsed = (time.perf_counter() - start) / iterations * 1e3
+        print(f"{name:<22} {elapsed:8.3f} ms/transition")
+
+
+async def main(args) -> None:
+    await common.initDatabase(args.mongodb_url, "benchmark_darshan_transitions")
+    await Darshan.delete_all()
+    await checkParallelApprovals(args.parallel)
+    await compareLatency(args.iterations)
+    await Darshan.delete_all()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--mongodb-url", default="")
+    parser.add_argument("--parallel", type=int, default=20)
+    parser.add_argument("--iterations", type=int, default=500)
+    asyncio.run(main(parser.parse_args()))